@@ -0,0 +1 @@
+"""Performance benchmarks for smartmoneyconcepts (run with ``python -m benchmarks.<name>``)."""
@@ -0,0 +1,54 @@
+"""
+Throughput of smc.batch over many symbols against the number of worker processes.
+
+Usage:
+  python -m benchmarks.batch [--symbols 64] [--bars 20000] [--workers 1 2 4 8]
+
+Every run computes the default indicator set on the same random walk candles, one frame
+per symbol. "task s" is the sum of the per-frame times reported by the workers, so
+wall s close to task s / workers means the pool scales linearly; the gap is the process
+start-up and the results sent back. Workers above the number of cores only add overhead.
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PROJECT_ROOT)
+from smartmoneyconcepts.smc import smc
+from benchmarks.synthetic import random_walk_ohlc
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--symbols", type=int, default=64)
+    parser.add_argument("--bars", type=int, default=20_000)
+    cores = os.cpu_count() or 1
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=sorted({1, *(w for w in (2, 4, 8, 16, 32) if w <= cores), cores})
+    )
+    args = parser.parse_args()
+
+    frames = {f"SYM{i:03d}": random_walk_ohlc(args.bars, seed=i) for i in range(args.symbols)}
+    print(f"{args.symbols} symbols x {args.bars} bars, {cores} cores")
+    print(f"{'workers':>7} {'wall s':>8} {'task s':>8} {'symbols/s':>10} {'speedup':>8}")
+    baseline = reference = None
+    for workers in args.workers:
+        start = time.perf_counter()
+        results = smc.batch(frames, workers=workers)
+        wall = time.perf_counter() - start
+        if reference is None:
+            baseline, reference = wall, results
+        else:
+            for key, result in results.items():
+                for name, data in result.indicators.items():
+                    pd.testing.assert_frame_equal(data, reference[key].indicators[name])
+        task = sum(result.seconds for result in results.values())
+        print(f"{workers:>7} {wall:>8.2f} {task:>8.2f} {args.symbols / wall:>10.1f} {baseline / wall:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
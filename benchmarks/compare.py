@@ -0,0 +1,83 @@
+"""
+Regression gate between two benchmarks.suite result files.
+
+Usage:
+  python -m benchmarks.compare BASE.json NEW.json [--threshold 0.15] [--min-seconds 0.005]
+                               [--memory-threshold 0.15] [--min-mib 1]
+
+Every case present in both files is listed with its time and peak memory ratio (new /
+base). The new times are first scaled by the ratio of the two files' calibration times
+(--no-normalize keeps them as measured), so a slower or busier machine does not show up as
+a regression of every case. A case regresses when it is slower by more than --threshold
+and by more than --min-seconds, or when its peak memory grew by more than
+--memory-threshold and by more than --min-mib; the absolute floors keep the millisecond
+cases from failing on noise.
+Exits with status 1 when any case regressed.
+"""
+import argparse
+import json
+import sys
+
+
+def regressions(base: dict, new: dict, args) -> list:
+    """(key, base result, new result, reasons) of every case in both files, slowest first."""
+    scale = 1.0
+    if not args.no_normalize and base.get("calibration_seconds") and new.get("calibration_seconds"):
+        scale = base["calibration_seconds"] / new["calibration_seconds"]
+    rows = []
+    for key in base["results"].keys() & new["results"].keys():
+        b = base["results"][key]
+        n = {**new["results"][key], "seconds": new["results"][key]["seconds"] * scale}
+        reasons = []
+        if n["seconds"] > b["seconds"] * (1 + args.threshold) and n["seconds"] - b["seconds"] > args.min_seconds:
+            reasons.append("time")
+        if n["peak_mib"] > b["peak_mib"] * (1 + args.memory_threshold) and n["peak_mib"] - b["peak_mib"] > args.min_mib:
+            reasons.append("memory")
+        rows.append((key, b, n, reasons))
+    rows.sort(key=lambda row: row[2]["seconds"] / max(row[1]["seconds"], 1e-12), reverse=True)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed slowdown (default: 0.15 = 15%%)")
+    parser.add_argument("--min-seconds", type=float, default=0.005, help="Ignore slowdowns below this (default: 0.005)")
+    parser.add_argument("--memory-threshold", type=float, default=0.15, help="Allowed peak memory growth (default: 0.15)")
+    parser.add_argument("--min-mib", type=float, default=1.0, help="Ignore memory growth below this (default: 1)")
+    parser.add_argument("--no-normalize", action="store_true", help="Compare the times as measured")
+    parser.add_argument("--all", action="store_true", help="List every case, not only the regressions")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    for name in ("backend", "cpu_count", "numpy", "pandas", "numba"):
+        if base["environment"].get(name) != new["environment"].get(name):
+            print(
+                f"warning: {name} differs ({base['environment'].get(name)} -> {new['environment'].get(name)})",
+                file=sys.stderr,
+            )
+    for key in sorted(base["results"].keys() ^ new["results"].keys()):
+        print(f"only in {'base' if key in base['results'] else 'new'}: {key}", file=sys.stderr)
+
+    rows = regressions(base, new, args)
+    failed = [row for row in rows if row[3]]
+    print(f"{'case':<58} {'base s':>9} {'new s':>9} {'ratio':>6} {'base MiB':>9} {'new MiB':>9}")
+    for key, b, n, reasons in rows if args.all else failed:
+        print(
+            f"{key:<58} {b['seconds']:>9.4f} {n['seconds']:>9.4f} {n['seconds'] / max(b['seconds'], 1e-12):>6.2f}"
+            f" {b['peak_mib']:>9.1f} {n['peak_mib']:>9.1f} {' '.join(reasons)}"
+        )
+    print(
+        f"{len(failed)} of {len(rows)} cases regressed "
+        f"({base['environment'].get('commit') or 'base'} -> {new['environment'].get('commit') or 'new'})"
+    )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Time and peak memory of run_indicators.run_all_indicators with and without SMCContext.
+
+Usage:
+  python -m benchmarks.context [--sizes 100000 1000000] [--repeat 3]
+
+Without a context every call validates the frame again (renaming the columns when they
+are not all lowercase, which copies it) and previous_high_low copied the frame on top.
+With a context the columns are normalized once and the swing candidates, session
+minutes and resampled periods are shared between calls. Peak memory is measured with
+tracemalloc, so it counts NumPy and pandas allocations made by the calls.
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PROJECT_ROOT)
+from smartmoneyconcepts.smc import SMCContext, smc
+from benchmarks.synthetic import random_walk_ohlc
+from run_indicators import SWING_LENGTH
+
+
+def run_all(ohlc):
+    """The calls of run_indicators.run_all_indicators on a DataFrame or a context."""
+    swing = smc.swing_highs_lows(ohlc, swing_length=SWING_LENGTH)
+    return {
+        "fvg": smc.fvg(ohlc),
+        "fvg_consecutive": smc.fvg(ohlc, join_consecutive=True),
+        "swing_highs_lows": swing,
+        "bos_choch": smc.bos_choch(ohlc, swing),
+        "ob": smc.ob(ohlc, swing),
+        "liquidity": smc.liquidity(ohlc, swing),
+        "previous_high_low_4h": smc.previous_high_low(ohlc, time_frame="4h"),
+        "previous_high_low_1D": smc.previous_high_low(ohlc, time_frame="1D"),
+        "previous_high_low_W": smc.previous_high_low(ohlc, time_frame="W"),
+        "sessions_London": smc.sessions(ohlc, session="London"),
+        "retracements": smc.retracements(ohlc, swing),
+    }
+
+
+def measure(func, repeat):
+    """Best wall time over repeat runs, then the peak traced memory of one more run."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, best, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'bars':>9} {'frame s':>8} {'context s':>10} {'frame MiB':>10} {'context MiB':>12}")
+    for n in args.sizes:
+        # capitalized columns, as loaded from most CSV exports
+        df = random_walk_ohlc(n).rename(columns=str.capitalize)
+        frame_result, frame_time, frame_peak = measure(lambda: run_all(df), args.repeat)
+        context_result, context_time, context_peak = measure(lambda: run_all(SMCContext(df)), args.repeat)
+        for name, data in frame_result.items():
+            pd.testing.assert_frame_equal(context_result[name], data)
+        print(f"{n:>9} {frame_time:>8.3f} {context_time:>10.3f} {frame_peak:>10.1f} {context_peak:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
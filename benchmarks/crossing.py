@@ -0,0 +1,122 @@
+"""
+Scaling of the first-crossing query behind fvg MitigatedIndex and bos_choch BrokenIndex.
+
+Usage:
+  python -m benchmarks.crossing [--sizes 10000 100000 1000000] [--check-max 100000]
+
+For every size a random walk is generated and smc.fvg / smc.bos_choch are timed on
+each available backend. Up to --check-max bars the mitigation indices are also
+recomputed with one boolean mask per gap (the previous O(n^2) scan), checked to be
+identical and timed against the sparse table query.
+
+Every backend is also timed on steadily rising candles, where no gap is ever mitigated and
+a forward scan per gap is quadratic. The script exits with 1 when the time per bar on them
+grows more than --max-growth times from one size to the next.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PROJECT_ROOT)
+from smartmoneyconcepts.smc import BACKENDS, _crossing_table, _first_crossing, _numba_kernels, set_backend, smc
+from benchmarks.synthetic import random_walk_ohlc
+
+
+def mask_scan(values, starts, levels):
+    """First index at or after each start with values <= level, one mask per query."""
+    result = np.full(len(starts), len(values))
+    for q, (start, level) in enumerate(zip(starts, levels)):
+        mask = values[start:] <= level
+        if np.any(mask):
+            result[q] = start + np.argmax(mask)
+    return result
+
+
+def rising_ohlc(n: int) -> pd.DataFrame:
+    """Candles rising by more than their range, so every one leaves an unmitigated bullish gap."""
+    close = np.arange(n, dtype=np.float64) * 2.0
+    return pd.DataFrame(
+        {"open": close - 0.5, "high": close + 0.6, "low": close - 0.6, "close": close, "volume": 1.0},
+        index=pd.date_range("2024-01-01", periods=n, freq="15min"),
+    )
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--check-max", type=int, default=100_000, help="Largest size compared with the mask scan")
+    parser.add_argument("--swing-length", type=int, default=5)
+    parser.add_argument(
+        "--max-growth", type=float, default=4.0, help="Largest growth of the time per bar on rising candles between sizes"
+    )
+    args = parser.parse_args()
+
+    backends = [b for b in BACKENDS if b != "numba" or _numba_kernels is not None]
+    print(f"{'bars':>9} {'gaps':>7} {'mask s':>8} {'table s':>8} {'speedup':>8}", end="")
+    for backend in backends:
+        print(f" {'fvg ' + backend:>11} {'bos ' + backend:>11}", end="")
+    print()
+
+    for n in args.sizes:
+        df = random_walk_ohlc(n)
+        low = df["low"].values
+        fvg = smc.fvg(df)
+        gaps = np.flatnonzero(fvg["FVG"].values == 1)
+        starts, levels = gaps + 2, fvg["Top"].values[gaps]
+
+        table_result, table_time = timed(
+            lambda: _first_crossing(_crossing_table(low, "<="), starts, levels, "<=")
+        )
+        if n <= args.check_max:
+            mask_result, mask_time = timed(mask_scan, low, starts, levels)
+            if not np.array_equal(mask_result, table_result):
+                sys.exit(f"{n} bars: sparse table query differs from the mask scan")
+            print(f"{n:>9} {len(gaps):>7} {mask_time:>8.3f} {table_time:>8.3f} {mask_time / table_time:>7.1f}x", end="")
+        else:
+            print(f"{n:>9} {len(gaps):>7} {'-':>8} {table_time:>8.3f} {'-':>8}", end="")
+
+        swing_highs_lows = smc.swing_highs_lows(df, swing_length=args.swing_length)
+        for backend in backends:
+            set_backend(backend)
+            smc.fvg(df.iloc[:100])  # compile the numba kernels outside the timings
+            smc.bos_choch(df.iloc[:100], swing_highs_lows.iloc[:100])
+            _, fvg_time = timed(smc.fvg, df)
+            _, bos_time = timed(smc.bos_choch, df, swing_highs_lows)
+            print(f" {fvg_time:>11.3f} {bos_time:>11.3f}", end="")
+        print()
+
+    # the worst case of a forward scan: no gap is ever mitigated
+    failed = False
+    print(f"{'rising':>9}", *(f"{'fvg ' + backend:>11}" for backend in backends))
+    per_bar = {}
+    for n in sorted(args.sizes):
+        df = rising_ohlc(n)
+        print(f"{n:>9}", end="")
+        for backend in backends:
+            set_backend(backend)
+            smc.fvg(df.iloc[:100])
+            seconds = min(timed(smc.fvg, df)[1] for _ in range(3))
+            print(f" {seconds:>11.3f}", end="")
+            previous = per_bar.get(backend)
+            per_bar[backend] = seconds / n
+            if previous is not None and per_bar[backend] > args.max_growth * previous:
+                failed = True
+                print(f" ({backend} time per bar grew {per_bar[backend] / previous:.1f}x)", end="")
+        print()
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Compare the incremental FrameEngine against recomputing every window.
+
+Usage:
+  python -m benchmarks.export_frames [--csv PATH] [--frames N] [--windows 50 100 200 400]
+
+For each window size the same number of frames is exported with both engines; the
+output is checked to be byte-identical and the speedup is printed.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "scripts"))
+sys.path.insert(0, PROJECT_ROOT)
+from export_smc_frames import DEFAULT_CSV, build_frames, build_frames_full, load_csv_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--csv", default=DEFAULT_CSV, help="OHLCV CSV (default: KCEX ETHUSDT 23m)")
+    parser.add_argument("--frames", type=int, default=100, help="Frames per run (default: 100)")
+    parser.add_argument("--windows", type=int, nargs="+", default=[50, 100, 200, 400])
+    parser.add_argument("--timeframe", default="23")
+    args = parser.parse_args()
+
+    df = load_csv_data(args.csv)
+    print(f"{'window':>8} {'full s':>10} {'incremental s':>14} {'speedup':>9}")
+    for window in args.windows:
+        data = df.iloc[-(window + args.frames) :]
+
+        start = time.perf_counter()
+        full = build_frames_full(data, window, args.timeframe)
+        full_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        incremental = build_frames(data, window, args.timeframe)
+        incremental_time = time.perf_counter() - start
+
+        if json.dumps(full, separators=(",", ":")) != json.dumps(incremental, separators=(",", ":")):
+            sys.exit(f"window {window}: incremental output differs from full recompute")
+        print(f"{window:>8} {full_time:>10.3f} {incremental_time:>14.3f} {full_time / incremental_time:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
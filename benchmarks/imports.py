@@ -0,0 +1,77 @@
+"""
+Cold import time of the package modules against their budgets.
+
+Usage:
+  python -m benchmarks.imports [--repeat 5]
+
+Each module is imported in a fresh interpreter (best of --repeat), which also reports
+whether pandas, numpy and numba were pulled in. The package itself and the Supabase
+loader must not import pandas or NumPy: the scripts and the viewer's export route import
+them in every child process they spawn, before any indicator runs. Exits with status 1
+when a module is over its budget or one of those two imports them. The unit tests only
+check the imports, as the times depend on the machine.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# seconds; generous enough for a slow CI machine, far below what importing pandas costs
+BUDGETS = {
+    "smartmoneyconcepts": 0.1,
+    "smartmoneyconcepts.load_supabase": 0.3,
+    "smartmoneyconcepts.smc": 3.0,
+}
+HEAVY = ("pandas", "numpy", "numba")
+# modules that must not import any of HEAVY
+LIGHT = ("smartmoneyconcepts", "smartmoneyconcepts.load_supabase")
+
+_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def cold_import(module: str, repeat: int = 3) -> dict:
+    """{seconds (best of repeat), heavy (the HEAVY modules it imported)} of importing module in a new interpreter."""
+    env = {**os.environ, "SMC_CREDIT": "0", "SMC_PROFILE": "0", "PYTHONPATH": PROJECT_ROOT}
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", _SCRIPT.format(module=module, heavy=HEAVY)],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        runs.append(json.loads(out.strip().splitlines()[-1]))
+    return {"seconds": min(run["seconds"] for run in runs), "heavy": runs[0]["heavy"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    failed = 0
+    print(f"{'module':<36} {'ms':>8} {'budget':>8}  imports")
+    for module, budget in BUDGETS.items():
+        result = cold_import(module, args.repeat)
+        over = result["seconds"] > budget
+        heavy = module in LIGHT and bool(result["heavy"])
+        failed += over or heavy
+        print(
+            f"{module:<36} {result['seconds'] * 1e3:>8.1f} {budget * 1e3:>8.0f}  "
+            f"{', '.join(result['heavy']) or '-'}{'  OVER BUDGET' if over else ''}{'  TOO HEAVY' if heavy else ''}"
+        )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
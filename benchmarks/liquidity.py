@@ -0,0 +1,53 @@
+"""
+Scaling of smc.liquidity on synthetic random walks.
+
+Usage:
+  python -m benchmarks.liquidity [--sizes 100000 1000000] [--swing-length 5]
+
+smc.liquidity is timed on every available backend. When numba is installed its
+kernel (a compiled version of the original candidate loops) is used as the
+reference and the NumPy level sweep is checked to give identical output.
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PROJECT_ROOT)
+from smartmoneyconcepts.smc import BACKENDS, _numba_kernels, set_backend, smc
+from benchmarks.synthetic import random_walk_ohlc
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--swing-length", type=int, default=5)
+    parser.add_argument("--range-percent", type=float, default=0.01)
+    args = parser.parse_args()
+
+    backends = [b for b in BACKENDS if b != "numba" or _numba_kernels is not None]
+    print(f"{'bars':>9} {'swings':>7}" + "".join(f" {b + ' s':>10}" for b in backends))
+    for n in args.sizes:
+        df = random_walk_ohlc(n)
+        swing_highs_lows = smc.swing_highs_lows(df, swing_length=args.swing_length)
+        swings = int(swing_highs_lows["HighLow"].notna().sum())
+
+        results = {}
+        print(f"{n:>9} {swings:>7}", end="")
+        for backend in backends:
+            set_backend(backend)
+            smc.liquidity(df.iloc[:100], swing_highs_lows.iloc[:100])  # compile outside the timing
+            start = time.perf_counter()
+            results[backend] = smc.liquidity(df, swing_highs_lows, range_percent=args.range_percent)
+            print(f" {time.perf_counter() - start:>10.3f}", end="")
+        print()
+
+        if len(results) > 1:
+            pd.testing.assert_frame_equal(results["numpy"], results["numba"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Time and peak memory of every smc indicator and of the indicator and export pipelines.
+
+Usage:
+  python -m benchmarks.suite [--sizes 1000 10000 100000 1000000] [--regimes calm normal ...]
+                             [--cases 'smc.*'] [--datasets 'synthetic/*'] [--out results.json]
+
+The datasets are the synthetic regimes of benchmarks.synthetic at every size, and the
+bundled KCEX ETHUSDT 23m and 1D CSVs replayed as they are. On each one the suite times
+every smc method (the swing highs/lows the other indicators take are computed beforehand),
+run_indicators.run_all_indicators and the incremental export of export_smc_frames, whose
+input is cut to --export-frames frames of --window bars. A case's time is the best of
+--repeat runs; its peak memory is traced with tracemalloc on one more run, so it counts the
+NumPy and pandas allocations but not the memory of numba kernels.
+
+The results are written as JSON with the commit, versions and backend they were measured
+with, and the time of a fixed NumPy and Python calibration workload taken before and after
+the cases; python -m benchmarks.compare checks one file against another, scaling the times
+by the calibration so results from a slower or busier machine stay comparable.
+"""
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "scripts"))
+sys.path.insert(0, PROJECT_ROOT)
+from smartmoneyconcepts.smc import BACKENDS, get_backend, set_backend, smc
+from benchmarks.synthetic import REGIMES, regime_ohlc
+from export_smc_frames import export_data, load_csv_data
+from run_indicators import SWING_LENGTH, run_all_indicators
+
+REPLAY = {
+    "kcex_ethusdt_23m": ("KCEX_ETHUSDT.P, 23_ce49b.csv", "23"),
+    "kcex_ethusdt_1d": ("KCEX_ETHUSDT.P, 1D_42991.csv", "1D"),
+}
+
+
+def datasets(args):
+    """Yield (name, candles, timeframe) of the synthetic regimes and the replayed CSVs."""
+    for regime in args.regimes:
+        for n in args.sizes:
+            yield f"synthetic/{regime}/{n}", lambda regime=regime, n=n: regime_ohlc(n, regime), "15"
+    if not args.no_replay:
+        for name, (csv, timeframe) in REPLAY.items():
+            yield f"replay/{name}", lambda csv=csv: load_csv_data(os.path.join(PROJECT_ROOT, csv)), timeframe
+
+
+def cases(ohlc: pd.DataFrame, timeframe: str, args, out_path: str) -> dict:
+    """The timed calls on one dataset by case name."""
+    swing = smc.swing_highs_lows(ohlc, swing_length=SWING_LENGTH)
+    export_input = ohlc.iloc[-(args.window + args.export_frames) :]
+    calls = {
+        "smc.fvg": lambda: smc.fvg(ohlc),
+        "smc.fvg(join_consecutive)": lambda: smc.fvg(ohlc, join_consecutive=True),
+        "smc.swing_highs_lows": lambda: smc.swing_highs_lows(ohlc, swing_length=SWING_LENGTH),
+        "smc.bos_choch": lambda: smc.bos_choch(ohlc, swing),
+        "smc.ob": lambda: smc.ob(ohlc, swing),
+        "smc.liquidity": lambda: smc.liquidity(ohlc, swing),
+        "smc.previous_high_low(4h)": lambda: smc.previous_high_low(ohlc, time_frame="4h"),
+        "smc.previous_high_low(1D)": lambda: smc.previous_high_low(ohlc, time_frame="1D"),
+        "smc.previous_high_low(W)": lambda: smc.previous_high_low(ohlc, time_frame="W"),
+        "smc.sessions(London)": lambda: smc.sessions(ohlc, session="London"),
+        "smc.sessions_multi": lambda: smc.sessions_multi(ohlc),
+        "smc.retracements": lambda: smc.retracements(ohlc, swing),
+        "run_all_indicators": lambda: run_all_indicators(ohlc),
+    }
+    if len(export_input) > args.window:
+        calls["export_smc_frames"] = lambda: export_data(
+            export_input, "BENCH", timeframe, args.window, "incremental", out_path
+        )
+    return calls
+
+
+def measure(func, repeat: int) -> dict:
+    """Best and all wall times over repeat runs, then the peak traced memory of one more run."""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": min(runs), "runs": runs, "peak_mib": peak / 2**20}
+
+
+def calibration() -> float:
+    """Time of a fixed workload mixing NumPy kernels and a Python loop, like the indicators do."""
+    values = np.random.default_rng(0).normal(size=200_000)
+    start = time.perf_counter()
+    np.sort(values)
+    np.cumsum(values)
+    np.maximum.accumulate(values)
+    total = 0.0
+    for v in values[:50_000].tolist():
+        total += v
+    return time.perf_counter() - start
+
+
+def environment() -> dict:
+    """What the results were measured with."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(
+            subprocess.run(
+                ["git", "status", "--porcelain", "--untracked-files=no"],
+                cwd=PROJECT_ROOT,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+    try:
+        import numba
+
+        numba_version = numba.__version__
+    except ImportError:
+        numba_version = None
+    return {
+        "commit": commit,
+        "dirty": dirty,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "backend": get_backend(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "numba": numba_version,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--regimes", nargs="+", choices=REGIMES, default=list(REGIMES))
+    parser.add_argument("--no-replay", action="store_true", help="Skip the bundled KCEX CSVs")
+    parser.add_argument("--cases", nargs="+", default=["*"], help="Only the cases matching these patterns")
+    parser.add_argument("--datasets", nargs="+", default=["*"], help="Only the datasets matching these patterns")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--window", type=int, default=100, help="Export window in bars (default: 100)")
+    parser.add_argument("--export-frames", type=int, default=400, help="Frames per export (default: 400)")
+    parser.add_argument("--backend", choices=BACKENDS, default=None)
+    parser.add_argument("--out", default="benchmark_results.json", help="JSON results (default: benchmark_results.json)")
+    args = parser.parse_args()
+    if args.backend:
+        set_backend(args.backend)
+
+    results = {}
+    calibration_runs = [calibration() for _ in range(args.repeat)]
+    print(f"{'dataset':<28} {'case':<28} {'best s':>9} {'peak MiB':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        out_path = os.path.join(tmp, "smc_frames.json")
+        for name, load, timeframe in datasets(args):
+            if not any(fnmatch.fnmatch(name, pattern) for pattern in args.datasets):
+                continue
+            ohlc = load()
+            for case, func in cases(ohlc, timeframe, args, out_path).items():
+                if not any(fnmatch.fnmatch(case, pattern) for pattern in args.cases):
+                    continue
+                result = {"dataset": name, "case": case, "bars": len(ohlc), **measure(func, args.repeat)}
+                results[f"{name}:{case}"] = result
+                print(f"{name:<28} {case:<28} {result['seconds']:>9.4f} {result['peak_mib']:>9.1f}")
+
+    calibration_runs += [calibration() for _ in range(args.repeat)]
+    with open(args.out, "w") as f:
+        json.dump(
+            {
+                "environment": environment(),
+                "repeat": args.repeat,
+                "calibration_seconds": min(calibration_runs),
+                "results": results,
+            },
+            f,
+            indent=1,
+        )
+    print(f"Wrote {len(results)} results to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
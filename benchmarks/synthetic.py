@@ -0,0 +1,53 @@
+"""Synthetic OHLCV data for the scaling benchmarks."""
+import numpy as np
+import pandas as pd
+
+
+def random_walk_ohlc(n: int, seed: int = 0, freq: str = "15min") -> pd.DataFrame:
+    """n candles of a Gaussian random walk with wicks on both sides, indexed every freq."""
+    rng = np.random.default_rng(seed)
+    close = 1000 + np.cumsum(rng.normal(0, 1, n))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    high = np.maximum(open_, close) + np.abs(rng.normal(0, 0.5, n))
+    low = np.minimum(open_, close) - np.abs(rng.normal(0, 0.5, n))
+    volume = rng.integers(1, 1000, n).astype(np.float64)
+    return pd.DataFrame(
+        {"open": open_, "high": high, "low": low, "close": close, "volume": volume},
+        index=pd.date_range("2020-01-01", periods=n, freq=freq),
+    )
+
+
+REGIMES = ("calm", "normal", "volatile", "trending", "clustered")
+
+
+def regime_ohlc(n: int, regime: str = "normal", seed: int = 0, freq: str = "15min") -> pd.DataFrame:
+    """
+    n candles of a geometric random walk in one of REGIMES, indexed every freq:
+    calm, normal and volatile differ in the per-bar volatility, trending alternates up and
+    down drifts every 5000 bars and clustered switches between calm and volatile stretches
+    of about 500 bars. Wicks and volume scale with the volatility.
+    """
+    rng = np.random.default_rng(seed)
+    sigma = np.full(n, 0.001)
+    drift = np.zeros(n)
+    if regime == "calm":
+        sigma[:] = 0.0002
+    elif regime == "volatile":
+        sigma[:] = 0.005
+    elif regime == "trending":
+        drift = np.where(np.arange(n) // 5000 % 2 == 0, 0.0003, -0.0003)
+    elif regime == "clustered":
+        switches = np.cumsum(rng.geometric(1 / 500, n // 100 + 1))
+        sigma = np.where(np.searchsorted(switches, np.arange(n), side="right") % 2 == 0, 0.0003, 0.004)
+    elif regime != "normal":
+        raise ValueError(f"Unknown regime {regime!r}, expected one of {REGIMES}")
+    close = 1000 * np.exp(np.cumsum(rng.normal(drift, sigma)))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    wick = close * sigma / 2
+    high = np.maximum(open_, close) + np.abs(rng.normal(0, 1, n)) * wick
+    low = np.minimum(open_, close) - np.abs(rng.normal(0, 1, n)) * wick
+    volume = rng.integers(1, 1000, n) * sigma / 0.001
+    return pd.DataFrame(
+        {"open": open_, "high": high, "low": low, "close": close, "volume": volume},
+        index=pd.date_range("2020-01-01", periods=n, freq=freq),
+    )
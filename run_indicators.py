@@ -20,7 +20,8 @@ import pandas as pd
 # project root
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, SCRIPT_DIR)
-from smartmoneyconcepts.smc import smc
+from smartmoneyconcepts.smc import smc, SMCContext
+from smartmoneyconcepts.profiling import Profiler
 
 OHLCV = ["open", "high", "low", "close", "volume"]
 SWING_LENGTH = 5
@@ -55,20 +56,23 @@ def load_and_prepare(csv_path: str) -> pd.DataFrame:
 
 def run_all_indicators(df: pd.DataFrame) -> dict[str, pd.DataFrame]:
     """Run all smc indicators used in the test suite; return dict of name -> DataFrame."""
-    swing = smc.swing_highs_lows(df, swing_length=SWING_LENGTH)
+    # validate and normalize the candles once for all the calls below
+    context = SMCContext(df)
+    swing = smc.swing_highs_lows(context, swing_length=SWING_LENGTH)
+    previous_high_low = smc.previous_high_low_multi(context, time_frames=["4h", "1D", "W"])
 
     return {
-        "fvg": smc.fvg(df),
-        "fvg_consecutive": smc.fvg(df, join_consecutive=True),
+        "fvg": smc.fvg(context),
+        "fvg_consecutive": smc.fvg(context, join_consecutive=True),
         "swing_highs_lows": swing,
-        "bos_choch": smc.bos_choch(df, swing),
-        "ob": smc.ob(df, swing),
-        "liquidity": smc.liquidity(df, swing),
-        "previous_high_low_4h": smc.previous_high_low(df, time_frame="4h"),
-        "previous_high_low_1D": smc.previous_high_low(df, time_frame="1D"),
-        "previous_high_low_W": smc.previous_high_low(df, time_frame="W"),
-        "sessions_London": smc.sessions(df, session="London"),
-        "retracements": smc.retracements(df, swing),
+        "bos_choch": smc.bos_choch(context, swing),
+        "ob": smc.ob(context, swing),
+        "liquidity": smc.liquidity(context, swing),
+        "previous_high_low_4h": previous_high_low["4h"],
+        "previous_high_low_1D": previous_high_low["1D"],
+        "previous_high_low_W": previous_high_low["W"],
+        "sessions_London": smc.sessions(context, session="London"),
+        "retracements": smc.retracements(context, swing),
     }
 
 
@@ -118,11 +122,28 @@ def main():
         default=None,
         help="Output directory for result CSVs",
     )
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="Candle cache directory for --source supabase (default: SMC_CACHE_DIR or ~/.cache/smartmoneyconcepts)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Load every candle from Supabase instead of only the bars newer than the cache",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print the calls, p50/p99 time, bars/s and events of every indicator at the end",
+    )
     args = parser.parse_args()
+    profiler = Profiler().start() if args.profile else None
 
     if args.source == "supabase":
         if not args.symbol:
             sys.exit("--symbol is required when --source supabase")
+        from smartmoneyconcepts.candle_cache import CandleCache
         from smartmoneyconcepts.load_supabase import load_candles
         print("Loading from Supabase (market.market_candles)...")
         df = load_candles(
@@ -130,6 +151,7 @@ def main():
             args.timeframe,
             from_date=args.from_date,
             to_date=args.to_date,
+            cache=None if args.no_cache else CandleCache(args.cache_dir),
         )
         if len(df) == 0:
             sys.exit("No rows from Supabase; check symbol, timeframe, and date range")
@@ -158,6 +180,8 @@ def main():
         print(f"  {out_path}")
 
     print(f"Done. {len(results)} result files in {out_dir}")
+    if profiler is not None:
+        print(profiler.summary())
 
 
 if __name__ == "__main__":
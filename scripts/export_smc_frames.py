@@ -1,21 +1,42 @@
 """
 Export SMC indicator frames to JSON for the interactive viewer.
 Supports CSV or Supabase (market.market_candles_ewo) as data source.
+The JSON is streamed to the output file one frame at a time (smartmoneyconcepts.frame_json).
+With --format compact the frames are written to the binary container of
+smartmoneyconcepts.frame_format instead.
 """
+from __future__ import annotations
+
 import argparse
-import json
+import multiprocessing
 import os
 import sys
+import urllib.error
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 
-import numpy as np
 import pandas as pd
 
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.insert(0, PROJECT_ROOT)
-from smartmoneyconcepts.smc import smc
+from smartmoneyconcepts.smc import smc, SMCContext, dtype_policy
+from smartmoneyconcepts.frames import DAILY_TIMEFRAMES, FrameEngine, event_lists
+from smartmoneyconcepts.frame_format import decode_frames, encode_frames
+from smartmoneyconcepts.frame_json import iter_frames_json, iter_payload_json, json_lists, write_chunks
+from smartmoneyconcepts.profiling import Profiler, timed
 
 DEFAULT_CSV = os.path.join(PROJECT_ROOT, "KCEX_ETHUSDT.P, 23_ce49b.csv")
 
+# timeframes refreshed by --all-timeframes and their viewer data file
+ALL_TIMEFRAMES = {
+    "23": "smc_frames.json",
+    "90": "smc_frames_90.json",
+    "360": "smc_frames_360.json",
+    "1D": "smc_frames_1d.json",
+    "1W": "smc_frames_1w.json",
+    "1M": "smc_frames_1m.json",
+}
+
 
 def load_csv_data(csv_path: str) -> pd.DataFrame:
     """Load OHLCV CSV (time=Unix seconds, open/high/low/close/Volume); return DataFrame ready for smc."""
@@ -34,27 +55,406 @@ def load_csv_data(csv_path: str) -> pd.DataFrame:
     return df
 
 
-def nan_to_none(obj):
-    """Recursively replace NaN/NaT with None for JSON serialization."""
-    if isinstance(obj, dict):
-        return {k: nan_to_none(v) for k, v in obj.items()}
-    if isinstance(obj, list):
-        return [nan_to_none(v) for v in obj]
-    if isinstance(obj, (float, np.floating)) and np.isnan(obj):
+def dataframe_to_list_dict(df: pd.DataFrame) -> dict:
+    """Convert DataFrame to dict of lists, with NaN -> null and index handled."""
+    return json_lists(df)
+
+
+def frame_engine(
+    df: pd.DataFrame,
+    window: int,
+    timeframe: str,
+    *,
+    timestamp_str_list=None,
+    ewo_list=None,
+    sma5_list=None,
+    sma35_list=None,
+) -> FrameEngine:
+    """The incremental FrameEngine of one timeframe with the wave series as extras."""
+    return FrameEngine(
+        df,
+        window,
+        timeframe=timeframe,
+        timestamps=timestamp_str_list,
+        extras={"ewo": ewo_list, "sma5": sma5_list, "sma35": sma35_list},
+    )
+
+
+def build_frames(
+    df: pd.DataFrame,
+    window: int,
+    timeframe: str,
+    *,
+    timestamp_str_list=None,
+    ewo_list=None,
+    sma5_list=None,
+    sma35_list=None,
+) -> list[dict]:
+    """Build one frame per sliding window with the incremental FrameEngine."""
+    engine = frame_engine(
+        df,
+        window,
+        timeframe,
+        timestamp_str_list=timestamp_str_list,
+        ewo_list=ewo_list,
+        sma5_list=sma5_list,
+        sma35_list=sma35_list,
+    )
+    return list(engine.frames())
+
+
+def build_frames_full(df: pd.DataFrame, window: int, timeframe: str, **series) -> list[dict]:
+    """Build one frame per sliding window by recomputing every indicator on each window."""
+    return list(iter_frames_full(df, window, timeframe, **series))
+
+
+def iter_frames_full(
+    df: pd.DataFrame,
+    window: int,
+    timeframe: str,
+    *,
+    timestamp_str_list=None,
+    ewo_list=None,
+    sma5_list=None,
+    sma35_list=None,
+):
+    """Yield the frames of build_frames_full one at a time."""
+    # the per-bar series are encoded like the ohlc columns, NaN as None
+    extras = pd.DataFrame(
+        {
+            name: pd.Series(values, dtype="float64")
+            for name, values in (("ewo", ewo_list), ("sma5", sma5_list), ("sma35", sma35_list))
+            if values is not None
+        }
+    )
+    for index, pos in enumerate(range(window, len(df))):
+        window_df = df.iloc[pos - window : pos]
+
+        context = SMCContext(window_df)
+        # the viewer data keeps the dtypes of the mixed policy, as FrameEngine does
+        with dtype_policy("mixed"):
+            fvg_events = smc.fvg(context, join_consecutive=True, sparse=True)
+            swing_highs_lows_data = smc.swing_highs_lows(context, swing_length=5)
+            bos_choch_events = smc.bos_choch(context, swing_highs_lows_data, sparse=True)
+            ob_events = smc.ob(context, swing_highs_lows_data, sparse=True)
+            liquidity_events = smc.liquidity(context, swing_highs_lows_data, sparse=True)
+            previous_high_low_data = smc.previous_high_low(context, time_frame="4h")
+            sessions_asia = smc.sessions(context, session="Asia")
+            sessions_london = smc.sessions(context, session="London")
+            sessions_nyam = smc.sessions(context, session="NYAM")
+            sessions_nypm = smc.sessions(context, session="NYPM")
+            retracements_data = smc.retracements(context, swing_highs_lows_data)
+
+        # Sessions use time-of-day; daily+ bars are at midnight, so all fall into
+        # overnight sessions (e.g. NYPM 19:00-01:00). Disable sessions for daily+.
+        if timeframe in DAILY_TIMEFRAMES:
+            sessions_asia["Active"] = 0
+            sessions_london["Active"] = 0
+            sessions_nyam["Active"] = 0
+            sessions_nypm["Active"] = 0
+
+        # Use raw timestamp strings from API when available (no conversion); matches wave_engine_state format
+        start = pos - window
+        if timestamp_str_list is not None:
+            x_list = timestamp_str_list[start:pos]
+            frame_ts = timestamp_str_list[pos - 1] if pos <= len(timestamp_str_list) else window_df.index[-1].isoformat()
+        else:
+            x_list = [t.isoformat() for t in window_df.index]
+            frame_ts = window_df.index[-1].isoformat()
+
+        frame = {
+            "index": index,
+            "timestamp": frame_ts,
+            "ohlc": {"x": x_list, **json_lists(window_df[["open", "high", "low", "close"]])},
+            "fvg": event_lists(fvg_events, window),
+            "swingHighsLows": dataframe_to_list_dict(swing_highs_lows_data),
+            "bosChoch": event_lists(bos_choch_events, window),
+            "ob": event_lists(ob_events, window),
+            "liquidity": event_lists(liquidity_events, window),
+            "previousHighLow": dataframe_to_list_dict(previous_high_low_data),
+            "sessions": {
+                "asia": dataframe_to_list_dict(sessions_asia),
+                "london": dataframe_to_list_dict(sessions_london),
+                "nyam": dataframe_to_list_dict(sessions_nyam),
+                "nypm": dataframe_to_list_dict(sessions_nypm),
+            },
+            "retracements": dataframe_to_list_dict(retracements_data),
+        }
+        frame.update(json_lists(extras.iloc[start:pos]))
+        yield frame
+
+
+def viewer_data_dir() -> str:
+    """Directory the viewer reads its frame files from."""
+    if os.path.isdir(os.path.join(PROJECT_ROOT, "smc-viewer")):
+        return os.path.join(PROJECT_ROOT, "smc-viewer", "public", "data")
+    return os.path.join(PROJECT_ROOT, "public", "data")
+
+
+def frame_meta(df: pd.DataFrame, symbol: str, timeframe: str, window: int) -> dict:
+    """The meta block of one timeframe's frames."""
+    return {
+        "symbol": symbol,
+        "timeframe": timeframe,
+        "windowSize": window,
+        "barCount": max(len(df) - window, 0),
+    }
+
+
+def build_compact(
+    df: pd.DataFrame,
+    symbol: str,
+    timeframe: str,
+    window: int,
+    *,
+    timestamp_str_list=None,
+    ewo_list=None,
+    sma5_list=None,
+    sma35_list=None,
+) -> bytes:
+    """Frames of one timeframe as a compact container (see smartmoneyconcepts.frame_format)."""
+    engine = frame_engine(
+        df,
+        window,
+        timeframe,
+        timestamp_str_list=timestamp_str_list,
+        ewo_list=ewo_list,
+        sma5_list=sma5_list,
+        sma35_list=sma35_list,
+    )
+    return encode_frames(engine, frame_meta(df, symbol, timeframe, window))
+
+
+def export_data(
+    df: pd.DataFrame,
+    symbol: str,
+    timeframe: str,
+    window: int,
+    engine: str,
+    out_path: str,
+    output_format: str = "json",
+    *,
+    save_to_db: bool = False,
+    **series,
+) -> int:
+    """
+    Write the frames of one timeframe to out_path in output_format ("json" or "compact")
+    and return the number of frames. JSON is streamed to the file one frame at a time.
+    With save_to_db the frames are also upserted into public.smc_results as JSON.
+    """
+    with timed("export_data", bars=len(df)):
+        meta = frame_meta(df, symbol, timeframe, window)
+        if output_format == "compact":
+            data = build_compact(df, symbol, timeframe, window, **series)
+            write_payload(data, out_path)
+            if save_to_db:
+                frames = list(decode_frames(data)[1])
+        elif engine == "incremental" and not save_to_db:
+            write_payload(iter_frames_json(frame_engine(df, window, timeframe, **series), meta), out_path)
+        else:
+            build = build_frames if engine == "incremental" else iter_frames_full
+            frames = build(df, window, timeframe, **series)
+            if save_to_db:
+                frames = list(frames)
+            write_payload(iter_payload_json(meta, frames), out_path)
+        if save_to_db:
+            from smartmoneyconcepts.load_supabase import upsert_smc_results
+
+            upsert_smc_results(symbol, timeframe, meta, frames)
+        return meta["barCount"]
+
+
+def append_start(engine: FrameEngine, meta: dict, stored: tuple | None) -> int | None:
+    """
+    Index of the first frame of engine that is not stored yet, given the (meta, last frame)
+    of the stored smc_results row, or None if the stored frames cannot be kept: there are
+    none, they were made with other settings, they do not reach back to engine's first frame,
+    or the stored last frame differs from the one engine computes for the same window.
+    """
+    if stored is None:
         return None
-    if pd.isna(obj):
+    stored_meta, last = stored
+    if any(stored_meta.get(key) != meta[key] for key in ("symbol", "timeframe", "windowSize")):
         return None
-    if isinstance(obj, (np.integer, np.int64)):
-        return int(obj)
-    if isinstance(obj, pd.Timestamp):
-        return obj.isoformat()
-    return obj
+    index = engine.frame_index(last.get("timestamp"))
+    if index is None or index > stored_meta["barCount"] - 1:
+        return None
+    if {**next(engine.frames(index)), "index": last.get("index")} != last:
+        return None
+    return index + 1
 
 
-def dataframe_to_list_dict(df: pd.DataFrame) -> dict:
-    """Convert DataFrame to dict of lists, with NaN -> null and index handled."""
-    d = df.to_dict(orient="list")
-    return nan_to_none(d)
+def append_to_db(df: pd.DataFrame, symbol: str, timeframe: str, window: int, **series) -> int:
+    """
+    Bring the public.smc_results row of one timeframe up to date with df by computing and
+    sending only the frames after its stored last frame, and return how many were sent. All
+    frames are computed and upserted when the stored ones cannot be kept (see append_start)
+    or the database lacks the append_smc_frames function.
+    """
+    from smartmoneyconcepts.load_supabase import append_smc_results, fetch_smc_results_tail, upsert_smc_results
+
+    with timed("append_to_db", bars=len(df)):
+        meta = frame_meta(df, symbol, timeframe, window)
+        engine = frame_engine(df, window, timeframe, **series)
+        stored = fetch_smc_results_tail(symbol, timeframe)
+        first = append_start(engine, meta, stored)
+        if first is not None:
+            frames = list(engine.frames(first))
+            if not frames and stored[0] == meta:
+                return 0
+            try:
+                result = append_smc_results(symbol, timeframe, meta, frames, after=stored[1]["timestamp"])
+            except urllib.error.HTTPError as e:
+                if e.code != 404:
+                    raise
+            else:
+                expected = {"count": meta["barCount"], "last": (frames or [stored[1]])[-1]["timestamp"]}
+                if result != expected:
+                    raise RuntimeError(f"smc_results append for {symbol} {timeframe} left {result}, expected {expected}")
+                return len(frames)
+        frames = list(engine.frames())
+        upsert_smc_results(symbol, timeframe, meta, frames)
+        return len(frames)
+
+
+def output_name(name: str, output_format: str) -> str:
+    """Output file name of a .json name in output_format."""
+    return os.path.splitext(name)[0] + ".smcf" if output_format == "compact" else name
+
+
+def write_payload(data, out_path: str) -> None:
+    """
+    Write str, bytes or an iterable of bytes chunks to out_path. The file is written next to
+    out_path and moved over it when complete, so readers never see a partial export.
+    """
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    if isinstance(data, str):
+        data = data.encode()
+    tmp = f"{out_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            write_chunks([data] if isinstance(data, bytes) else data, f)
+        os.replace(tmp, out_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def load_timeframe(symbol: str, timeframe: str, from_date, to_date, last: int, cache=None):
+    """Candles and wave series of one timeframe from Supabase, cut to the last bars."""
+    from smartmoneyconcepts.load_supabase import load_candles_ewo
+
+    with timed("load_candles_ewo"):
+        df, ewo_list, sma5_list, sma35_list, timestamp_str_list = load_candles_ewo(
+            symbol, timeframe, from_date=from_date, to_date=to_date, cache=cache
+        )
+    return df.iloc[-last:], ewo_list, sma5_list, sma35_list, timestamp_str_list
+
+
+def export_timeframe_job(
+    symbol: str,
+    timeframe: str,
+    window: int,
+    engine: str,
+    loaded: tuple,
+    save_to_db: bool,
+    out_path: str,
+    output_format: str = "json",
+    profile: bool = False,
+    append: bool = False,
+) -> tuple[int, str | None]:
+    """
+    Worker process job: write the frames of one loaded timeframe to out_path, optionally
+    upsert them, and return the frame count and, with profile, the profiler summary. With
+    append (and save_to_db) only the new frames are sent to the database and no file is written.
+    """
+    df, ewo_list, sma5_list, sma35_list, timestamp_str_list = loaded
+    series = dict(timestamp_str_list=timestamp_str_list, ewo_list=ewo_list, sma5_list=sma5_list, sma35_list=sma35_list)
+    with Profiler() if profile else nullcontext() as profiler:
+        if append and save_to_db:
+            count = append_to_db(df, symbol, timeframe, window, **series)
+        else:
+            count = export_data(
+                df,
+                symbol,
+                timeframe,
+                window,
+                engine,
+                out_path,
+                output_format,
+                save_to_db=save_to_db,
+                **series,
+            )
+    return count, profiler.summary() if profile else None
+
+
+def candle_cache(args):
+    """The CandleCache of the --cache-dir/--no-cache arguments, or None."""
+    from smartmoneyconcepts.candle_cache import CandleCache
+
+    return None if args.no_cache else CandleCache(args.cache_dir)
+
+
+def export_all_timeframes(args, load=load_timeframe) -> int:
+    """
+    Export every timeframe of ALL_TIMEFRAMES in this process: the timeframes are loaded
+    concurrently on args.load_workers threads, each one is handed to a pool of args.workers
+    processes as soon as it is loaded, and each worker streams its output file as the
+    frames are built. Returns the number of timeframes that had no data.
+    """
+    data_dir = viewer_data_dir()
+    cache = candle_cache(args)
+    missing = 0
+    with ThreadPoolExecutor(args.load_workers) as loaders, ProcessPoolExecutor(
+        args.workers, mp_context=multiprocessing.get_context("spawn")
+    ) as workers:
+        loads = {
+            loaders.submit(load, args.symbol, tf, args.from_date, args.to_date, args.last, cache): tf
+            for tf in ALL_TIMEFRAMES
+        }
+        exports = {}
+        pending = set(loads)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in loads:
+                    tf = loads[future]
+                    loaded = future.result()
+                    if len(loaded[0]) == 0:
+                        print(f"{tf}: no rows returned from Supabase; skipping this timeframe", file=sys.stderr)
+                        missing += 1
+                    elif len(loaded[0]) < args.window:
+                        print(
+                            f"{tf}: need at least {args.window} bars; got {len(loaded[0])}. Skipping this timeframe.",
+                            file=sys.stderr,
+                        )
+                    else:
+                        out_path = os.path.join(data_dir, output_name(ALL_TIMEFRAMES[tf], args.format))
+                        job = workers.submit(
+                            export_timeframe_job,
+                            args.symbol,
+                            tf,
+                            args.window,
+                            args.engine,
+                            loaded,
+                            args.save_to_db,
+                            out_path,
+                            args.format,
+                            args.profile,
+                            args.append,
+                        )
+                        exports[job] = (tf, out_path)
+                        pending.add(job)
+                else:
+                    tf, out_path = exports[future]
+                    count, summary = future.result()
+                    if args.append and args.save_to_db:
+                        print(f"{tf}: sent {count} new frames to public.smc_results")
+                    else:
+                        print(f"{tf}: exported {count} frames to {out_path}")
+                    if summary:
+                        print(summary)
+    return missing
 
 
 def main():
@@ -114,40 +514,75 @@ def main():
         default="23",
         help="Timeframe: use 23 for 23m, 1D, 1M, etc. (default: 23)",
     )
+    parser.add_argument(
+        "--engine",
+        choices=("incremental", "full"),
+        default="incremental",
+        help="Frame engine: carry indicator state between windows (incremental) or recompute every window (full). Both produce identical output (default: incremental)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=("json", "compact"),
+        default="json",
+        help="Output file format: the viewer JSON, or the compact binary container of smartmoneyconcepts.frame_format (.smcf, needs --engine incremental) (default: json)",
+    )
     parser.add_argument(
         "--save-to-db",
         action="store_true",
         help="Upsert result into public.smc_results (only when --source supabase).",
     )
+    parser.add_argument(
+        "--append",
+        action="store_true",
+        help="With --save-to-db, compute and send only the frames after the last one stored in smc_results (all of them when the stored row does not line up with the candles); no output file is written.",
+    )
     parser.add_argument(
         "--all-timeframes",
         action="store_true",
-        help="Export 23, 90, 360, 1D, 1W, 1M in sequence (supabase only). Use with --save-to-db to refresh all live datasets with wave/SMA data.",
+        help="Export 23, 90, 360, 1D, 1W, 1M concurrently in this process (supabase only). Use with --save-to-db to refresh all live datasets with wave/SMA data.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=min(len(ALL_TIMEFRAMES), os.cpu_count() or 1),
+        help="Processes computing frames with --all-timeframes (default: one per timeframe, at most one per core)",
+    )
+    parser.add_argument(
+        "--load-workers",
+        type=int,
+        default=len(ALL_TIMEFRAMES),
+        help="Threads loading timeframes from Supabase with --all-timeframes (default: one per timeframe)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="Candle cache directory for --source supabase (default: SMC_CACHE_DIR or ~/.cache/smartmoneyconcepts)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Load every candle from Supabase instead of only the bars newer than the cache",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print the calls, p50/p99 time, bars/s and events of every indicator and export stage at the end (per timeframe with --all-timeframes)",
     )
     args = parser.parse_args()
+    profiler = Profiler().start() if args.profile else None
+    if args.format == "compact" and args.engine != "incremental":
+        parser.error("--format compact needs --engine incremental")
+    if args.append and not (args.save_to_db and args.source == "supabase"):
+        parser.error("--append needs --source supabase and --save-to-db")
 
     if args.all_timeframes and args.source == "supabase":
         if not args.symbol:
             sys.exit("--symbol is required when --source supabase")
-        import subprocess
-        viewer_public = os.path.join(PROJECT_ROOT, "smc-viewer", "public", "data")
-        if not os.path.isdir(os.path.join(PROJECT_ROOT, "smc-viewer")):
-            viewer_public = os.path.join(PROJECT_ROOT, "public", "data")
-        out_by_tf = {"23": "smc_frames.json", "90": "smc_frames_90.json", "360": "smc_frames_360.json", "1D": "smc_frames_1d.json", "1W": "smc_frames_1w.json", "1M": "smc_frames_1m.json"}
-        for tf in ("23", "90", "360", "1D", "1W", "1M"):
-            cmd = [
-                sys.executable, os.path.join(PROJECT_ROOT, "scripts", "export_smc_frames.py"),
-                "--source", "supabase", "--symbol", args.symbol, "--timeframe", tf,
-                "--last", str(args.last), "--window", str(args.window),
-                "--out", os.path.join(viewer_public, out_by_tf[tf]),
-            ]
-            if args.from_date:
-                cmd.extend(["--from", args.from_date])
-            if args.to_date:
-                cmd.extend(["--to", args.to_date])
-            if args.save_to_db:
-                cmd.append("--save-to-db")
-            subprocess.run(cmd, cwd=PROJECT_ROOT, check=True)
+        missing = export_all_timeframes(args)
+        if profiler is not None:
+            print(profiler.summary())
+        if missing:
+            sys.exit(1)
         return
 
     ewo_list = sma5_list = sma35_list = timestamp_str_list = None
@@ -155,12 +590,14 @@ def main():
         if not args.symbol:
             sys.exit("--symbol is required when --source supabase")
         from smartmoneyconcepts.load_supabase import load_candles_ewo
-        df, ewo_list, sma5_list, sma35_list, timestamp_str_list = load_candles_ewo(
-            args.symbol,
-            args.timeframe,
-            from_date=args.from_date,
-            to_date=args.to_date,
-        )
+        with timed("load_candles_ewo"):
+            df, ewo_list, sma5_list, sma35_list, timestamp_str_list = load_candles_ewo(
+                args.symbol,
+                args.timeframe,
+                from_date=args.from_date,
+                to_date=args.to_date,
+                cache=candle_cache(args),
+            )
         if len(df) == 0:
             sys.exit("No rows returned from Supabase; check symbol, timeframe, and date range")
         symbol = args.symbol
@@ -181,100 +618,44 @@ def main():
     if args.out:
         out_path = args.out
     else:
-        viewer_public = os.path.join(PROJECT_ROOT, "smc-viewer", "public", "data")
-        if os.path.isdir(os.path.join(PROJECT_ROOT, "smc-viewer")):
-            os.makedirs(viewer_public, exist_ok=True)
-            out_path = os.path.join(viewer_public, "smc_frames.json")
-        else:
-            os.makedirs(os.path.join(PROJECT_ROOT, "public", "data"), exist_ok=True)
-            out_path = os.path.join(PROJECT_ROOT, "public", "data", "smc_frames.json")
-
-    frames = []
-    for pos in range(args.window, len(df)):
-        window_df = df.iloc[pos - args.window : pos]
-
-        fvg_data = smc.fvg(window_df, join_consecutive=True)
-        swing_highs_lows_data = smc.swing_highs_lows(window_df, swing_length=5)
-        bos_choch_data = smc.bos_choch(window_df, swing_highs_lows_data)
-        ob_data = smc.ob(window_df, swing_highs_lows_data)
-        liquidity_data = smc.liquidity(window_df, swing_highs_lows_data)
-        previous_high_low_data = smc.previous_high_low(window_df, time_frame="4h")
-        sessions_asia = smc.sessions(window_df, session="Asia")
-        sessions_london = smc.sessions(window_df, session="London")
-        sessions_nyam = smc.sessions(window_df, session="NYAM")
-        sessions_nypm = smc.sessions(window_df, session="NYPM")
+        out_path = os.path.join(viewer_data_dir(), output_name("smc_frames.json", args.format))
 
-        # Sessions use time-of-day; daily+ bars are at midnight, so all fall into
-        # overnight sessions (e.g. NYPM 19:00-01:00). Disable sessions for daily+.
-        daily_timeframes = {"1D", "1d", "1W", "1w", "1M", "1m", "D", "W", "M"}
-        if args.timeframe in daily_timeframes:
-            sessions_asia["Active"] = 0
-            sessions_london["Active"] = 0
-            sessions_nyam["Active"] = 0
-            sessions_nypm["Active"] = 0
-
-        retracements_data = smc.retracements(window_df, swing_highs_lows_data)
-
-        # Use raw timestamp strings from API when available (no conversion); matches wave_engine_state format
-        start = pos - args.window
-        if timestamp_str_list is not None:
-            x_list = timestamp_str_list[start:pos]
-            frame_ts = timestamp_str_list[pos - 1] if pos <= len(timestamp_str_list) else window_df.index[-1].isoformat()
-        else:
-            x_list = [t.isoformat() for t in window_df.index]
-            frame_ts = window_df.index[-1].isoformat()
-
-        frame = {
-            "index": len(frames),
-            "timestamp": frame_ts,
-            "ohlc": {
-                "x": x_list,
-                "open": nan_to_none(window_df["open"].tolist()),
-                "high": nan_to_none(window_df["high"].tolist()),
-                "low": nan_to_none(window_df["low"].tolist()),
-                "close": nan_to_none(window_df["close"].tolist()),
-            },
-            "fvg": dataframe_to_list_dict(fvg_data),
-            "swingHighsLows": dataframe_to_list_dict(swing_highs_lows_data),
-            "bosChoch": dataframe_to_list_dict(bos_choch_data),
-            "ob": dataframe_to_list_dict(ob_data),
-            "liquidity": dataframe_to_list_dict(liquidity_data),
-            "previousHighLow": dataframe_to_list_dict(previous_high_low_data),
-            "sessions": {
-                "asia": dataframe_to_list_dict(sessions_asia),
-                "london": dataframe_to_list_dict(sessions_london),
-                "nyam": dataframe_to_list_dict(sessions_nyam),
-                "nypm": dataframe_to_list_dict(sessions_nypm),
-            },
-            "retracements": dataframe_to_list_dict(retracements_data),
-        }
-        if ewo_list is not None:
-            frame["ewo"] = nan_to_none(ewo_list[start:pos])
-        if sma5_list is not None:
-            frame["sma5"] = nan_to_none(sma5_list[start:pos])
-        if sma35_list is not None:
-            frame["sma35"] = nan_to_none(sma35_list[start:pos])
-        frames.append(frame)
-
-    payload = {
-        "meta": {
-            "symbol": symbol,
-            "timeframe": args.timeframe,
-            "windowSize": args.window,
-            "barCount": len(frames),
-        },
-        "frames": frames,
-    }
-
-    os.makedirs(os.path.dirname(out_path), exist_ok=True)
-    with open(out_path, "w") as f:
-        json.dump(payload, f, separators=(",", ":"))
-    print(f"Exported {len(frames)} frames to {out_path}")
+    save_to_db = args.save_to_db and args.source == "supabase"
+    if args.append:
+        count = append_to_db(
+            df,
+            symbol,
+            args.timeframe,
+            args.window,
+            timestamp_str_list=timestamp_str_list,
+            ewo_list=ewo_list,
+            sma5_list=sma5_list,
+            sma35_list=sma35_list,
+        )
+        print(f"Sent {count} new frames to public.smc_results ({symbol}, {args.timeframe})")
+        if profiler is not None:
+            print(profiler.summary())
+        return
 
-    if args.save_to_db and args.source == "supabase":
-        from smartmoneyconcepts.load_supabase import upsert_smc_results
-        upsert_smc_results(symbol, args.timeframe, payload["meta"], payload["frames"])
+    count = export_data(
+        df,
+        symbol,
+        args.timeframe,
+        args.window,
+        args.engine,
+        out_path,
+        args.format,
+        save_to_db=save_to_db,
+        timestamp_str_list=timestamp_str_list,
+        ewo_list=ewo_list,
+        sma5_list=sma5_list,
+        sma35_list=sma35_list,
+    )
+    print(f"Exported {count} frames to {out_path}")
+    if save_to_db:
         print(f"Saved to public.smc_results ({symbol}, {args.timeframe})")
+    if profiler is not None:
+        print(profiler.summary())
 
 
 if __name__ == "__main__":
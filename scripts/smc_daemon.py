@@ -0,0 +1,313 @@
+"""
+Long-running export service for the viewer's /api/export-smc-frames route.
+
+Usage:
+  python scripts/smc_daemon.py [--host 127.0.0.1] [--port 8765] [--workers 1]
+
+Every POST to the route used to start export_smc_frames.py, paying for the interpreter,
+the pandas and numba imports (and numba's compilation) and a Supabase fetch of the whole
+history. The daemon does all that once: it keeps the candle cache and a process pool with
+warm workers, fetches only the bars after the last cached one, and does not export a
+timeframe again while its candles are unchanged since the previous export with the same
+settings.
+
+HTTP API (JSON):
+  POST /jobs[?wait=1]  {symbol, timeframe?, allTimeframes?, last?, window?, saveToDb?}
+       one job per timeframe; a request for a timeframe that is already queued or running
+       with the same settings joins that job instead of starting another one. Answers 202
+       with {"jobs": [...]} at once, or 200 when all of them are finished with ?wait=1.
+  GET  /jobs/<id>      {id, symbol, timeframe, status, stage, frames, result, error, seconds}
+       status is queued, running, done or failed; stage is loading or exporting while running.
+  GET  /health         {ok, pid, jobs}
+
+The route uses the daemon when SMC_DAEMON_URL is set (e.g. http://127.0.0.1:8765) and
+starts the script as before when it is not or the daemon does not answer.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from export_smc_frames import (
+    ALL_TIMEFRAMES,
+    export_timeframe_job,
+    load_timeframe,
+    output_name,
+    viewer_data_dir,
+)
+from smartmoneyconcepts.candle_cache import CandleCache
+
+DEFAULT_PORT = 8765
+# finished jobs kept for GET /jobs/<id>
+MAX_FINISHED = 1000
+
+
+class Job:
+    """The export of one timeframe with one set of settings."""
+
+    def __init__(self, job_id: int, key: tuple):
+        self.id = job_id
+        self.key = key
+        self.symbol, self.timeframe, self.last, self.window, self.save_to_db, self.out_path = key
+        self.status = "queued"
+        self.stage = None
+        self.frames = None
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.done = threading.Event()
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "symbol": self.symbol,
+            "timeframe": self.timeframe,
+            "last": self.last,
+            "window": self.window,
+            "saveToDb": self.save_to_db,
+            "status": self.status,
+            "stage": self.stage,
+            "frames": self.frames,
+            "result": self.result,
+            "error": self.error,
+            "seconds": (self.finished or time.time()) - self.created,
+        }
+
+
+def _signature(loaded: tuple) -> tuple:
+    """
+    What an export depends on: a hash of every loaded bar and series, so a bar backfilled or
+    corrected anywhere in the history is exported again (hashing is cheap next to an export).
+    """
+    df, *series = loaded
+    digest = hashlib.sha256(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    for values in series:
+        digest.update(repr(values).encode())
+    return len(df), digest.hexdigest()
+
+
+class ExportService:
+    """
+    Runs the export jobs of the HTTP API: jobs are loaded on load_workers threads and
+    exported on a pool of workers processes (in this process with workers=0).
+
+    parameters:
+    cache: CandleCache - candle cache shared by all jobs (None fetches the whole history every time)
+    data_dir: str - directory of the viewer data files
+    load: the loader of one timeframe, load_timeframe(symbol, timeframe, from_date, to_date, last, cache)
+    """
+
+    def __init__(self, cache=None, data_dir: str | None = None, workers: int = 1, load_workers: int = 4, load=load_timeframe):
+        self.cache = cache
+        self.data_dir = data_dir or viewer_data_dir()
+        self.load = load
+        self._loaders = ThreadPoolExecutor(load_workers)
+        self._pool = None
+        if workers > 0:
+            self._pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+            # start the workers now, so the first job does not wait for their imports
+            self._pool.submit(os.getpid)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._active = {}
+        self._exported = {}
+        # single timeframe requests all write smc_frames.json, like the script does
+        self._writing = defaultdict(threading.Lock)
+        # jobs of one timeframe that differ in last or window load its candles one at a time
+        self._loading = defaultdict(threading.Lock)
+
+    def submit(self, symbol: str, timeframes, last: int, window: int, save_to_db: bool) -> list:
+        """The jobs exporting timeframes (a list, or one timeframe to smc_frames.json), started or joined."""
+        if isinstance(timeframes, str):
+            targets = [(timeframes, "smc_frames.json")]
+        else:
+            targets = [(tf, ALL_TIMEFRAMES[tf]) for tf in timeframes]
+        jobs = []
+        with self._lock:
+            for timeframe, name in targets:
+                key = (symbol, timeframe, last, window, save_to_db, os.path.join(self.data_dir, output_name(name, "json")))
+                job = self._active.get(key)
+                if job is None:
+                    job = self._active[key] = Job(next(self._ids), key)
+                    self._jobs[job.id] = job
+                    self._loaders.submit(self._run, job)
+                jobs.append(job)
+        return jobs
+
+    def job(self, job_id: int) -> "Job | None":
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> dict:
+        """Number of jobs by status."""
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return counts
+
+    def _run(self, job: Job) -> None:
+        try:
+            job.status, job.stage = "running", "loading"
+            with self._loading[job.symbol, job.timeframe]:
+                loaded = self.load(job.symbol, job.timeframe, None, None, job.last, self.cache)
+            df = loaded[0]
+            if len(df) == 0:
+                raise ValueError(f"{job.timeframe}: no rows returned from Supabase; check symbol and timeframe")
+            if len(df) < job.window:
+                job.frames = 0
+                job.result = f"{job.timeframe}: need at least {job.window} bars; got {len(df)}. Skipped."
+            else:
+                signature = _signature(loaded)
+                exported = self._exported.get(job.key)
+                if exported is not None and exported[0] == signature and os.path.exists(job.out_path):
+                    job.frames = exported[1]
+                    job.result = f"{job.timeframe}: unchanged, {job.frames} frames in {job.out_path}"
+                else:
+                    job.stage = "exporting"
+                    args = (job.symbol, job.timeframe, job.window, "incremental", loaded, job.save_to_db, job.out_path)
+                    with self._writing[job.out_path]:
+                        if self._pool is None:
+                            job.frames, _ = export_timeframe_job(*args)
+                        else:
+                            job.frames, _ = self._pool.submit(export_timeframe_job, *args).result()
+                    self._exported[job.key] = (signature, job.frames)
+                    job.result = f"{job.timeframe}: exported {job.frames} frames to {job.out_path}"
+            job.status = "done"
+        except Exception as e:
+            job.status, job.error = "failed", f"{type(e).__name__}: {e}"
+        finally:
+            job.stage = None
+            job.finished = time.time()
+            with self._lock:
+                self._active.pop(job.key, None)
+                finished = [j for j in self._jobs.values() if j.finished is not None]
+                for old in finished[: max(len(finished) - MAX_FINISHED, 0)]:
+                    del self._jobs[old.id]
+            job.done.set()
+
+    def close(self) -> None:
+        self._loaders.shutdown(wait=True)
+        if self._pool is not None:
+            self._pool.shutdown()
+
+
+def _request(body: dict) -> dict:
+    """The settings of a POST /jobs body, with the defaults and limits of the route."""
+    symbol = str(body.get("symbol") or "").strip() or "KCEX_ETHUSDT.P"
+    timeframe = str(body.get("timeframe") or "").strip() or "23"
+    return {
+        "symbol": symbol,
+        "timeframes": list(ALL_TIMEFRAMES) if body.get("allTimeframes") else timeframe,
+        "last": min(10_000, max(100, int(body.get("last") or 500))),
+        "window": min(500, max(50, int(body.get("window") or 100))),
+        "save_to_db": bool(body.get("saveToDb", True)),
+    }
+
+
+class Handler(BaseHTTPRequestHandler):
+    service: ExportService = None
+
+    def _send(self, status: int, data: dict) -> None:
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urllib.parse.urlsplit(self.path).path
+        if path == "/health":
+            self._send(200, {"ok": True, "pid": os.getpid(), "jobs": self.service.jobs()})
+        elif path.startswith("/jobs/") and path[len("/jobs/"):].isdigit():
+            job = self.service.job(int(path[len("/jobs/"):]))
+            if job is None:
+                self._send(404, {"error": "Unknown job"})
+            else:
+                self._send(200, job.to_dict())
+        else:
+            self._send(404, {"error": "Not found"})
+
+    def do_POST(self):
+        url = urllib.parse.urlsplit(self.path)
+        if url.path != "/jobs":
+            self._send(404, {"error": "Not found"})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            request = _request(body)
+        except (ValueError, TypeError, AttributeError) as e:
+            self._send(400, {"error": "Bad request", "detail": str(e)})
+            return
+        jobs = self.service.submit(**request)
+        wait = urllib.parse.parse_qs(url.query).get("wait", ["0"])[0] not in ("", "0")
+        if wait:
+            for job in jobs:
+                job.done.wait()
+        self._send(200 if wait else 202, {"jobs": [job.to_dict() for job in jobs]})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(service: ExportService, host: str = "127.0.0.1", port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    """An HTTP server answering the API with service (call serve_forever on it)."""
+    handler = type("ServiceHandler", (Handler,), {"service": service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Processes exporting frames; 0 exports in the daemon itself (default: 1)"
+    )
+    parser.add_argument(
+        "--load-workers", type=int, default=len(ALL_TIMEFRAMES), help="Threads loading timeframes (default: one per timeframe)"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="Candle cache directory (default: SMC_CACHE_DIR or ~/.cache/smartmoneyconcepts)",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Load every candle from Supabase instead of only the bars newer than the cache"
+    )
+    args = parser.parse_args()
+
+    service = ExportService(
+        None if args.no_cache else CandleCache(args.cache_dir),
+        workers=args.workers,
+        load_workers=args.load_workers,
+    )
+    server = serve(service, args.host, args.port)
+    print(f"Serving exports on http://{args.host}:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
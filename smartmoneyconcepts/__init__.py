@@ -1,5 +1,60 @@
 import os
-from smartmoneyconcepts.smc import smc
+import sys
+import types
 
-if os.getenv('SMC_CREDIT', '1') == '1':
-    print("\033[1;33mThank you for using SmartMoneyConcepts! ⭐ Please show your support by giving a star on the GitHub repository: \033[4;34mhttps://github.com/joshyattridge/smart-money-concepts\033[0m")
\ No newline at end of file
+# smc, SMCContext and the backend and dtype policy settings are loaded from smartmoneyconcepts.smc
+# on first use, so importing the package or a module that does not need pandas (load_supabase) stays cheap
+_LAZY = (
+    "smc",
+    "SMCContext",
+    "set_backend",
+    "get_backend",
+    "set_dtype_policy",
+    "get_dtype_policy",
+    "dtype_policy",
+)
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        from importlib import import_module
+
+        import_module(f"{__name__}.smc")  # binds the _LAZY names through _Package.__setattr__
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
+
+
+class _Package(types.ModuleType):
+    def __setattr__(self, name, value):
+        # importing the smartmoneyconcepts.smc module binds it here; the package exports its classes instead
+        if name == "smc" and isinstance(value, types.ModuleType) and value.__name__ == f"{__name__}.smc":
+            for attr in _LAZY:
+                super().__setattr__(attr, getattr(value, attr))
+            return
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _Package
+
+
+def _show_credit() -> bool:
+    """Print the credit message only in an interactive session, not in pipes or worker processes."""
+    if os.getenv('SMC_CREDIT', '1') != '1':
+        return False
+    multiprocessing = sys.modules.get("multiprocessing")
+    if multiprocessing is not None and multiprocessing.parent_process() is not None:
+        return False
+    return sys.stdout is not None and sys.stdout.isatty()
+
+
+if os.getenv('SMC_PROFILE', '0') not in ('', '0'):
+    from smartmoneyconcepts.profiling import enable
+
+    enable(dump=None if os.getenv('SMC_PROFILE') == '1' else os.getenv('SMC_PROFILE'))
+
+if _show_credit():
+    print("\033[1;33mThank you for using SmartMoneyConcepts! ⭐ Please show your support by giving a star on the GitHub repository: \033[4;34mhttps://github.com/joshyattridge/smart-money-concepts\033[0m")
@@ -0,0 +1,502 @@
+"""
+Numba-compiled versions of the per-candle loops in smartmoneyconcepts.smc.
+
+Every function here has the same name, arguments and results as the NumPy kernel in
+smc.py and is selected with smc.set_backend("numba"). Python's max(a, b)/min(a, b)
+return a on ties, which is spelled out below so both backends agree bit for bit.
+Importing this module raises ImportError when numba is not installed.
+"""
+import heapq
+
+import numpy as np
+from numba import njit
+
+
+@njit(cache=True)
+def _fvg_join_kernel(fvg, top, bottom):
+    for i in range(len(fvg) - 1):
+        if fvg[i] == fvg[i + 1]:
+            if not top[i + 1] > top[i]:
+                top[i + 1] = top[i]
+            if not bottom[i + 1] < bottom[i]:
+                bottom[i + 1] = bottom[i]
+            fvg[i] = np.nan
+            top[i] = np.nan
+            bottom[i] = np.nan
+
+
+@njit(cache=True)
+def _first_below(values, starts, levels, strict):
+    """
+    For every start, the index of the first value at or after it that is below its level (or
+    equal to it unless strict), len(values) if there is none: the first_crossing of smc.py.
+    The starts are visited from the last one back while a stack keeps the running minimums
+    from the current candle on, so every query is a binary search on that stack.
+    """
+    n = len(values)
+    result = np.full(len(starts), n, dtype=np.int64)
+    # from the bottom up: later candles with smaller values first, the current candle on top
+    stack_index = np.empty(n, dtype=np.int64)
+    stack_value = np.empty(n, dtype=np.float64)
+    size = 0
+    candle = n
+    for q in np.argsort(-starts, kind="mergesort"):
+        start = max(starts[q], 0)
+        while candle > start:
+            candle -= 1
+            value = values[candle]
+            if np.isnan(value):
+                continue
+            # a later candle that is not below this one is never the first crossing any more
+            while size > 0 and stack_value[size - 1] >= value:
+                size -= 1
+            stack_index[size] = candle
+            stack_value[size] = value
+            size += 1
+        level = levels[q]
+        if np.isnan(level):
+            continue
+        if strict:
+            below = np.searchsorted(stack_value[:size], level, side="left")
+        else:
+            below = np.searchsorted(stack_value[:size], level, side="right")
+        if below > 0:
+            result[q] = stack_index[below - 1]
+    return result
+
+
+@njit(cache=True)
+def _fvg_mitigation_kernel(fvg, top, bottom, _high, _low):
+    n = len(fvg)
+    mitigated_index = np.zeros(n, dtype=np.int32)
+    bullish = np.nonzero(fvg == 1)[0]
+    bearish = np.nonzero(fvg == -1)[0]
+    # the first low at or below the top of a bullish gap, the first high at or above the bottom of a bearish one
+    j = _first_below(_low, bullish + 2, top[bullish].astype(np.float64), False)
+    for q in range(len(bullish)):
+        if j[q] < n:
+            mitigated_index[bullish[q]] = j[q]
+    j = _first_below(-_high, bearish + 2, -bottom[bearish].astype(np.float64), False)
+    for q in range(len(bearish)):
+        if j[q] < n:
+            mitigated_index[bearish[q]] = j[q]
+    return mitigated_index
+
+
+@njit(cache=True)
+def _bos_choch_kernel(swing_hl, swing_level, _high, _low, _close, close_break, dtype):
+    n = len(swing_hl)
+    bos = np.zeros(n, dtype=np.int32)
+    choch = np.zeros(n, dtype=np.int32)
+    level = np.zeros(n, dtype=dtype)
+
+    positions = np.empty(n, dtype=np.int64)
+    highs_lows_order = np.empty(n)
+    level_order = np.empty(n)
+    count = 0
+    for i in range(n):
+        if np.isnan(swing_hl[i]):
+            continue
+        positions[count] = i
+        highs_lows_order[count] = swing_hl[i]
+        level_order[count] = swing_level[i]
+        count += 1
+        if count < 4:
+            continue
+
+        h4, h3, h2, h1 = highs_lows_order[count - 4 : count]
+        l4, l3, l2, l1 = level_order[count - 4 : count]
+        bullish = h4 == -1 and h3 == 1 and h2 == -1 and h1 == 1
+        bearish = h4 == 1 and h3 == -1 and h2 == 1 and h1 == -1
+        target = positions[count - 3]
+
+        b = 0
+        if bullish and l4 < l2 < l3 < l1:
+            b = 1
+        if bearish and l4 > l2 > l3 > l1:
+            b = -1
+        c = 0
+        if bullish and l1 > l3 > l4 > l2:
+            c = 1
+        if bearish and l1 < l3 < l4 < l2:
+            c = -1
+        bos[target] = b
+        choch[target] = c
+        level[target] = l3 if b != 0 or c != 0 else 0.0
+
+    broken = np.zeros(n, dtype=np.int32)
+    bullish = np.nonzero((bos == 1) | (choch == 1))[0]
+    bearish = np.nonzero(((bos != 0) | (choch != 0)) & (bos != 1) & (choch != 1))[0]
+    # the first candle after the next one closing (or trading) above the level of a bullish break, below a bearish one
+    above = _first_below(-(_close if close_break else _high), bullish + 2, -level[bullish].astype(np.float64), True)
+    for q in range(len(bullish)):
+        if above[q] < n:
+            broken[bullish[q]] = above[q]
+    below = _first_below(_close if close_break else _low, bearish + 2, level[bearish].astype(np.float64), True)
+    for q in range(len(bearish)):
+        if below[q] < n:
+            broken[bearish[q]] = below[q]
+
+    # remove the ones broken no earlier than a later one, walking back with the earliest later break
+    first_later_break = n
+    for i in range(n - 1, -1, -1):
+        if bos[i] == 0 and choch[i] == 0:
+            continue
+        if broken[i] == 0:
+            # remove the ones that aren't broken
+            bos[i] = 0
+            choch[i] = 0
+            level[i] = 0
+            continue
+        if broken[i] >= first_later_break:
+            bos[i] = 0
+            choch[i] = 0
+            level[i] = 0
+        else:
+            first_later_break = broken[i]
+
+    return bos, choch, level, broken
+
+
+@njit(cache=True)
+def _ob_kernel(_open, _high, _low, _close, _volume, swing_hl, close_mitigation, dtype):
+    ohlc_len = len(_close)
+
+    crossed = np.full(ohlc_len, False)
+    swing_high_indices = np.nonzero(swing_hl == 1)[0]
+    swing_low_indices = np.nonzero(swing_hl == -1)[0]
+
+    # the blocks of each side (0 bullish, 1 bearish) in the order they are created, with the
+    # candle that mitigates them and the one that then breaks them (ohlc_len if none)
+    blk_index = np.empty((2, ohlc_len), dtype=np.int64)
+    blk_created = np.empty((2, ohlc_len), dtype=np.int64)
+    blk_top = np.empty((2, ohlc_len), dtype=dtype)
+    blk_bottom = np.empty((2, ohlc_len), dtype=dtype)
+    blk_volume = np.empty((2, ohlc_len), dtype=dtype)
+    blk_high_volume = np.empty((2, ohlc_len), dtype=dtype)
+    blk_low_volume = np.empty((2, ohlc_len), dtype=dtype)
+    blk_percentage = np.zeros((2, ohlc_len), dtype=dtype)
+    blk_mitigated = np.full((2, ohlc_len), ohlc_len, dtype=np.int64)
+    blk_broken = np.full((2, ohlc_len), ohlc_len, dtype=np.int64)
+    n_blocks = np.zeros(2, dtype=np.int64)
+
+    # active blocks in heaps keyed on the level the next candles are compared with, so each
+    # candle only pops the blocks it mitigates or breaks: unmitigated bullish blocks on their
+    # bottom (highest first), bullish breakers on their top (lowest first), unmitigated bearish
+    # blocks on their top and bearish breakers on their bottom. A NaN level never compares
+    # true, so those blocks are not kept in a heap at all.
+    bull_active = [(0.0, 0)]
+    bull_breakers = [(0.0, 0)]
+    bear_active = [(0.0, 0)]
+    bear_breakers = [(0.0, 0)]
+    bull_active.pop()
+    bull_breakers.pop()
+    bear_active.pop()
+    bear_breakers.pop()
+
+    pos_high = 0
+    pos_low = 0
+    for close_index in range(ohlc_len):
+        # breakers first, so a block mitigated on this candle is only checked from the next one
+        while len(bull_breakers) and bull_breakers[0][0] < _high[close_index]:
+            blk_broken[0, heapq.heappop(bull_breakers)[1]] = close_index
+        if close_mitigation:
+            mitigation_low = min(_open[close_index], _close[close_index])
+        else:
+            mitigation_low = _low[close_index]
+        while len(bull_active) and -bull_active[0][0] > mitigation_low:
+            b = heapq.heappop(bull_active)[1]
+            blk_mitigated[0, b] = close_index
+            if not np.isnan(blk_top[0, b]):
+                heapq.heappush(bull_breakers, (np.float64(blk_top[0, b]), b))
+
+        while len(bear_breakers) and -bear_breakers[0][0] > _low[close_index]:
+            blk_broken[1, heapq.heappop(bear_breakers)[1]] = close_index
+        if close_mitigation:
+            mitigation_high = max(_open[close_index], _close[close_index])
+        else:
+            mitigation_high = _high[close_index]
+        while len(bear_active) and bear_active[0][0] < mitigation_high:
+            b = heapq.heappop(bear_active)[1]
+            blk_mitigated[1, b] = close_index
+            if not np.isnan(blk_bottom[1, b]):
+                heapq.heappush(bear_breakers, (-np.float64(blk_bottom[1, b]), b))
+
+        vol_cur = _volume[close_index]
+        vol_prev1 = _volume[close_index - 1] if close_index >= 1 else 0.0
+        vol_prev2 = _volume[close_index - 2] if close_index >= 2 else 0.0
+
+        # a bullish block when this candle closes above the last swing high
+        while pos_high < len(swing_high_indices) and swing_high_indices[pos_high] < close_index:
+            pos_high += 1
+        if pos_high > 0:
+            last_top_index = swing_high_indices[pos_high - 1]
+            if _close[close_index] > _high[last_top_index] and not crossed[last_top_index]:
+                crossed[last_top_index] = True
+                obIndex = close_index - 1
+                obBtm = _high[obIndex]
+                obTop = _low[obIndex]
+                # lowest low between the swing high and this candle, last one on ties; none
+                # when a low in between is NaN, as its min() is NaN
+                best = -1
+                for j in range(last_top_index + 1, close_index):
+                    if np.isnan(_low[j]):
+                        best = -1
+                        break
+                    if best < 0 or _low[j] <= _low[best]:
+                        best = j
+                if best >= 0:
+                    obBtm = _low[best]
+                    obTop = _high[best]
+                    obIndex = best
+                b = n_blocks[0]
+                n_blocks[0] += 1
+                blk_index[0, b] = obIndex
+                blk_created[0, b] = close_index
+                blk_top[0, b] = obTop
+                blk_bottom[0, b] = obBtm
+                blk_volume[0, b] = vol_cur + vol_prev1 + vol_prev2
+                blk_low_volume[0, b] = vol_prev2
+                blk_high_volume[0, b] = vol_cur + vol_prev1
+                _set_percentage(blk_percentage[0], blk_high_volume[0], blk_low_volume[0], b)
+                if not np.isnan(blk_bottom[0, b]):
+                    heapq.heappush(bull_active, (-np.float64(blk_bottom[0, b]), b))
+
+        # a bearish block when this candle closes below the last swing low
+        while pos_low < len(swing_low_indices) and swing_low_indices[pos_low] < close_index:
+            pos_low += 1
+        if pos_low > 0:
+            last_btm_index = swing_low_indices[pos_low - 1]
+            if _close[close_index] < _low[last_btm_index] and not crossed[last_btm_index]:
+                crossed[last_btm_index] = True
+                obIndex = close_index - 1
+                obTop = _high[obIndex]
+                obBtm = _low[obIndex]
+                # highest high between the swing low and this candle, last one on ties; none
+                # when a high in between is NaN
+                best = -1
+                for j in range(last_btm_index + 1, close_index):
+                    if np.isnan(_high[j]):
+                        best = -1
+                        break
+                    if best < 0 or _high[j] >= _high[best]:
+                        best = j
+                if best >= 0:
+                    obTop = _high[best]
+                    obBtm = _low[best]
+                    obIndex = best
+                b = n_blocks[1]
+                n_blocks[1] += 1
+                blk_index[1, b] = obIndex
+                blk_created[1, b] = close_index
+                blk_top[1, b] = obTop
+                blk_bottom[1, b] = obBtm
+                blk_volume[1, b] = vol_cur + vol_prev1 + vol_prev2
+                blk_low_volume[1, b] = vol_cur + vol_prev1
+                blk_high_volume[1, b] = vol_prev2
+                _set_percentage(blk_percentage[1], blk_high_volume[1], blk_low_volume[1], b)
+                if not np.isnan(blk_top[1, b]):
+                    heapq.heappush(bear_active, (np.float64(blk_top[1, b]), b))
+
+    ob = np.zeros(ohlc_len, dtype=np.int32)
+    top_arr = np.zeros(ohlc_len, dtype=dtype)
+    bottom_arr = np.zeros(ohlc_len, dtype=dtype)
+    obVolume = np.zeros(ohlc_len, dtype=dtype)
+    percentage = np.zeros(ohlc_len, dtype=dtype)
+    mitigated_index = np.zeros(ohlc_len, dtype=np.int32)
+    breaker = np.full(ohlc_len, False)
+
+    for b in range(n_blocks[0]):
+        idx = blk_index[0, b]
+        ob[idx] = 1
+        top_arr[idx] = blk_top[0, b]
+        bottom_arr[idx] = blk_bottom[0, b]
+        obVolume[idx] = blk_volume[0, b]
+        percentage[idx] = blk_percentage[0, b]
+        if blk_mitigated[0, b] < ohlc_len:
+            breaker[idx] = True
+            mitigated_index[idx] = blk_mitigated[0, b] - 1
+        if blk_broken[0, b] < ohlc_len:
+            _reset(idx, ob, top_arr, bottom_arr, obVolume, mitigated_index, percentage)
+
+    # the bearish blocks are laid over the bullish ones: a candle that is both keeps the
+    # bullish breaker state and mitigated index, as when the sides were scanned one after the
+    # other, so such a block is broken by the first candle after it below its bottom
+    for b in range(n_blocks[1]):
+        idx = blk_index[1, b]
+        ob[idx] = -1
+        top_arr[idx] = blk_top[1, b]
+        bottom_arr[idx] = blk_bottom[1, b]
+        obVolume[idx] = blk_volume[1, b]
+        percentage[idx] = blk_percentage[1, b]
+        broken = blk_broken[1, b]
+        if breaker[idx]:
+            broken = ohlc_len
+            for j in range(blk_created[1, b] + 1, ohlc_len):
+                if _low[j] < bottom_arr[idx]:
+                    broken = j
+                    break
+        elif blk_mitigated[1, b] < ohlc_len:
+            mitigated_index[idx] = blk_mitigated[1, b]
+        if broken < ohlc_len:
+            _reset(idx, ob, top_arr, bottom_arr, obVolume, mitigated_index, percentage)
+
+    return ob, top_arr, bottom_arr, obVolume, mitigated_index, percentage
+
+
+@njit(cache=True)
+def _reset(i, ob, top_arr, bottom_arr, obVolume, mitigated_index, percentage):
+    ob[i] = 0
+    top_arr[i] = 0.0
+    bottom_arr[i] = 0.0
+    obVolume[i] = 0.0
+    mitigated_index[i] = 0
+    percentage[i] = 0.0
+
+
+@njit(cache=True)
+def _set_percentage(percentage, highVolume, lowVolume, i):
+    high, low = highVolume[i], lowVolume[i]
+    max_vol = low if low > high else high
+    min_vol = low if low < high else high
+    if max_vol != 0:
+        percentage[i] = min_vol / max_vol * np.float32(100.0)
+    else:
+        percentage[i] = 100.0
+
+
+@njit(cache=True)
+def _liquidity_kernel(ohlc_high, ohlc_low, shl_HL, shl_Level, pip_range, dtype):
+    n = len(ohlc_high)
+    shl_HL = shl_HL.copy()
+
+    liquidity = np.full(n, np.nan, dtype=dtype)
+    liquidity_level = np.full(n, np.nan, dtype=dtype)
+    liquidity_end = np.full(n, np.nan, dtype=dtype)
+    liquidity_swept = np.full(n, np.nan, dtype=dtype)
+
+    for side in (1, -1):
+        indices = np.nonzero(shl_HL == side)[0]
+        for i in indices:
+            if shl_HL[i] != side:
+                continue
+            level = shl_Level[i]
+            range_low = level - pip_range
+            range_high = level + pip_range
+            group_sum = level
+            group_count = 1
+            group_end = i
+
+            # first candle after i that trades through the range
+            swept = 0
+            for j in range(i + 1, n):
+                if (side == 1 and ohlc_high[j] >= range_high) or (side == -1 and ohlc_low[j] <= range_low):
+                    swept = j
+                    break
+
+            for j in indices:
+                if j <= i:
+                    continue
+                if swept and j >= swept:
+                    break
+                if shl_HL[j] == side and range_low <= shl_Level[j] <= range_high:
+                    group_sum += shl_Level[j]
+                    group_count += 1
+                    group_end = j
+                    shl_HL[j] = 0
+            if group_count > 1:
+                liquidity[i] = side
+                liquidity_level[i] = group_sum / group_count
+                liquidity_end[i] = group_end
+                liquidity_swept[i] = swept
+
+    return liquidity, liquidity_level, liquidity_end, liquidity_swept
+
+
+@njit(cache=True)
+def _sessions_kernel(minutes, start, end, _high, _low, dtype):
+    n = len(minutes)
+    active = np.zeros(n, dtype=np.int32)
+    high = np.zeros(n, dtype=dtype)
+    low = np.zeros(n, dtype=dtype)
+
+    for i in range(n):
+        current_time = minutes[i]
+        if (start < end and start <= current_time <= end) or (
+            start >= end and (start <= current_time or current_time <= end)
+        ):
+            active[i] = 1
+            previous_high = high[i - 1] if i > 0 else 0.0
+            high[i] = previous_high if previous_high > _high[i] else _high[i]
+            previous_low = low[i - 1] if i > 0 and low[i - 1] != 0 else np.inf
+            low[i] = previous_low if previous_low < _low[i] else _low[i]
+
+    return active, high, low
+
+
+@njit(cache=True)
+def _round1(x):
+    # same algorithm as numpy's round(x, 1)
+    return np.rint(x * 10.0) / 10.0
+
+
+@njit(cache=True)
+def _retracements_kernel(ohlc_high, ohlc_low, swing_hl, swing_level):
+    n = len(ohlc_high)
+    direction = np.zeros(n, dtype=np.int32)
+    current_retracement = np.zeros(n, dtype=np.float64)
+    deepest_retracement = np.zeros(n, dtype=np.float64)
+
+    top = 0.0
+    bottom = 0.0
+    for i in range(n):
+        if swing_hl[i] == 1:
+            direction[i] = 1
+            top = swing_level[i]
+        elif swing_hl[i] == -1:
+            direction[i] = -1
+            bottom = swing_level[i]
+        else:
+            direction[i] = direction[i - 1] if i > 0 else 0
+
+        if direction[i - 1] == 1:
+            denom = top - bottom
+            if denom != 0:
+                current_retracement[i] = _round1(100 - (((ohlc_low[i] - bottom) / denom) * 100))
+            else:
+                current_retracement[i] = 0.0
+            deepest = deepest_retracement[i - 1] if i > 0 and direction[i - 1] == 1 else 0.0
+            if current_retracement[i] > deepest:
+                deepest = current_retracement[i]
+            deepest_retracement[i] = deepest
+        if direction[i] == -1:
+            denom = bottom - top
+            if denom != 0:
+                current_retracement[i] = _round1(100 - ((ohlc_high[i] - top) / denom) * 100)
+            else:
+                current_retracement[i] = 0.0
+            deepest = deepest_retracement[i - 1] if i > 0 and direction[i - 1] == -1 else 0.0
+            if current_retracement[i] > deepest:
+                deepest = current_retracement[i]
+            deepest_retracement[i] = deepest
+
+    # shift the arrays by 1
+    current_retracement = np.roll(current_retracement, 1)
+    deepest_retracement = np.roll(deepest_retracement, 1)
+    direction = np.roll(direction, 1)
+
+    # remove the first 3 retracements as they get calculated incorrectly due to not enough data
+    remove_first_count = 0
+    for i in range(n - 1):
+        if direction[i] != direction[i + 1]:
+            remove_first_count += 1
+        direction[i] = 0
+        current_retracement[i] = 0
+        deepest_retracement[i] = 0
+        if remove_first_count == 3:
+            direction[i + 1] = 0
+            current_retracement[i + 1] = 0
+            deepest_retracement[i + 1] = 0
+            break
+
+    return direction, current_retracement, deepest_retracement
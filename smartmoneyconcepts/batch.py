@@ -0,0 +1,179 @@
+"""
+Run the smc indicators over many candle frames on a process pool (smc.batch).
+
+The parent copies the OHLCV columns and the datetime index of every frame into one shared
+memory block; each task only carries its key's offsets into it and the indicator list, so
+the workers map the candles instead of unpickling DataFrames. A worker wraps its views in
+an SMCContext, so the swing highs/lows and other derived arrays are computed once per frame
+for all indicators, and sends back the indicator results and the time they took.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from smartmoneyconcepts.smc import smc, SMCContext, get_backend, get_dtype_policy, set_backend, set_dtype_policy
+
+COLUMNS = ("open", "high", "low", "close", "volume")
+DEFAULT_INDICATORS = (
+    "fvg",
+    "swing_highs_lows",
+    "bos_choch",
+    "ob",
+    "liquidity",
+    "previous_high_low",
+    "retracements",
+)
+# indicators taking the result of swing_highs_lows; swing_length in their kwargs picks it
+SWING_INDICATORS = ("bos_choch", "ob", "liquidity", "retracements")
+INDICATORS = (*DEFAULT_INDICATORS, "previous_high_low_multi", "sessions", "sessions_multi")
+DEFAULT_SWING_LENGTH = 50
+
+
+class BatchResult(NamedTuple):
+    """Indicator results of one frame of a batch, with the seconds they took and the worker's pid."""
+
+    indicators: dict
+    seconds: float
+    pid: int
+
+
+def _indicator_specs(indicators) -> dict:
+    """{label: (name, kwargs)} of a list of names or (name, kwargs) pairs, or of a dict of them by label."""
+    items = indicators.items() if isinstance(indicators, dict) else ((None, i) for i in indicators)
+    specs = {}
+    for label, item in items:
+        name, kwargs = (item, {}) if isinstance(item, str) else item
+        if name not in INDICATORS:
+            raise ValueError(f"Unknown indicator {name!r}, expected one of {INDICATORS}")
+        label = name if label is None else label
+        if label in specs:
+            raise ValueError(f"Indicator {label!r} is listed twice; pass a dict to label them")
+        specs[label] = (name, dict(kwargs))
+    return specs
+
+
+def run_indicators(ohlc, specs: dict) -> dict:
+    """
+    Results of the indicator specs ({label: (name, kwargs)}) on one DataFrame or SMCContext.
+    The swing highs/lows are computed once per swing_length for every indicator needing them.
+    """
+    swings = {}
+
+    def swing_highs_lows(swing_length):
+        if swing_length not in swings:
+            swings[swing_length] = smc.swing_highs_lows(ohlc, swing_length=swing_length)
+        return swings[swing_length]
+
+    results = {}
+    for label, (name, kwargs) in specs.items():
+        kwargs = dict(kwargs)
+        if name in SWING_INDICATORS:
+            swing = swing_highs_lows(kwargs.pop("swing_length", DEFAULT_SWING_LENGTH))
+            results[label] = getattr(smc, name)(ohlc, swing, **kwargs)
+        elif name == "swing_highs_lows" and set(kwargs) <= {"swing_length"}:
+            results[label] = swing_highs_lows(kwargs.get("swing_length", DEFAULT_SWING_LENGTH))
+        else:
+            results[label] = getattr(smc, name)(ohlc, **kwargs)
+    return results
+
+
+def _layout(frames: dict) -> tuple[list, int]:
+    """Per frame (columns {name: (source column, offset)}, rows, index spec) and the total bytes."""
+    layout = []
+    offset = 0
+    for frame in frames.values():
+        names = {c.lower(): c for c in frame.columns}
+        columns = {}
+        for name in COLUMNS:
+            if name in names:
+                columns[name] = (names[name], offset)
+                offset += len(frame) * 8
+        if isinstance(frame.index, pd.DatetimeIndex):
+            index = ("datetime", offset, frame.index.dtype, frame.index.name)
+            offset += len(frame) * 8
+        else:
+            # not candle times, so no time-based indicator will use it; it is sent as is
+            index = ("other", frame.index)
+        layout.append((columns, len(frame), index))
+    return layout, offset
+
+
+def _write(buffer, frames: dict, layout: list) -> None:
+    for frame, (columns, n, index) in zip(frames.values(), layout):
+        for source, offset in columns.values():
+            np.ndarray(n, dtype=np.float64, buffer=buffer, offset=offset)[:] = frame[source].to_numpy(np.float64)
+        if index[0] == "datetime":
+            # asi8 is UTC for tz-aware indexes
+            np.ndarray(n, dtype=np.int64, buffer=buffer, offset=index[1])[:] = frame.index.asi8
+
+
+def _context(buffer, columns: dict, n: int, index: tuple) -> SMCContext:
+    """SMCContext over the candles of one frame in buffer."""
+    if index[0] == "datetime":
+        _, offset, dtype, name = index
+        times = np.ndarray(n, dtype=np.int64, buffer=buffer, offset=offset)
+        tz = getattr(dtype, "tz", None)
+        unit = dtype.unit if tz is not None else np.datetime_data(dtype)[0]
+        frame_index = pd.DatetimeIndex(times.view(f"M8[{unit}]"), name=name)
+        if tz is not None:
+            frame_index = frame_index.tz_localize("UTC").tz_convert(tz)
+    else:
+        frame_index = index[1]
+    data = {name: np.ndarray(n, dtype=np.float64, buffer=buffer, offset=offset) for name, (_, offset) in columns.items()}
+    return SMCContext(pd.DataFrame(data, index=frame_index, copy=False))
+
+
+_attached = {}
+
+
+def _run_task(
+    shm_name: str, columns: dict, n: int, index: tuple, specs: dict, backend: str, dtype_policy: str
+) -> BatchResult:
+    """Worker process job: the indicators of one frame of the shared memory block shm_name."""
+    if get_backend() != backend:
+        set_backend(backend)
+    if get_dtype_policy() != dtype_policy:
+        set_dtype_policy(dtype_policy)
+    if shm_name not in _attached:
+        _attached.clear()
+        _attached[shm_name] = shared_memory.SharedMemory(name=shm_name)
+    start = time.perf_counter()
+    results = run_indicators(_context(_attached[shm_name].buf, columns, n, index), specs)
+    return BatchResult(results, time.perf_counter() - start, os.getpid())
+
+
+def batch(frames: dict, indicators=DEFAULT_INDICATORS, workers: int | None = None) -> dict:
+    """See smc.batch."""
+    specs = _indicator_specs(indicators)
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    if workers <= 1 or len(frames) <= 1:
+        results = {}
+        for key, frame in frames.items():
+            start = time.perf_counter()
+            values = run_indicators(SMCContext(frame), specs)
+            results[key] = BatchResult(values, time.perf_counter() - start, os.getpid())
+        return results
+
+    layout, size = _layout(frames)
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    try:
+        _write(shm.buf, frames, layout)
+        with ProcessPoolExecutor(
+            min(workers, len(frames)), mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            futures = {
+                key: pool.submit(_run_task, shm.name, columns, n, index, specs, get_backend(), get_dtype_policy())
+                for key, (columns, n, index) in zip(frames, layout)
+            }
+            return {key: future.result() for key, future in futures.items()}
+    finally:
+        shm.close()
+        shm.unlink()
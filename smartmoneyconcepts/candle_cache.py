@@ -0,0 +1,255 @@
+"""
+On-disk columnar cache for candles loaded from Supabase.
+
+Each (table, symbol, timeframe) entry is a directory with one .npy file per column and a
+meta.json. Columns are memory-mapped when read, and a load only fetches the rows from the
+last cached bar on (the last bar is fetched again, as it may still have been forming).
+
+The cache directory is SMC_CACHE_DIR, or ~/.cache/smartmoneyconcepts. Loads of one entry
+are serialized between threads and, through a lock file next to the entry, between
+processes; files are written to unique temporary names and moved into place, so a column
+another load has memory-mapped is never written over.
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import urllib.parse
+from contextlib import contextmanager
+from typing import Callable
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: loads are only serialized within the process
+    fcntl = None
+
+META_FILE = "meta.json"
+
+
+def default_cache_dir() -> str:
+    return os.environ.get("SMC_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "smartmoneyconcepts")
+
+
+def _stored(values: np.ndarray, dtype=None) -> np.ndarray:
+    """values as saved in the cache: text as fixed width unicode so it can be memory-mapped."""
+    if values.dtype == object:
+        return np.asarray([v or "" for v in values], dtype=str)
+    return values if dtype is None else values.astype(dtype)
+
+
+class CandleCache:
+    """
+    Candle columns cached per (table, symbol, timeframe).
+
+    parameters:
+    path: str - cache directory (default: SMC_CACHE_DIR or ~/.cache/smartmoneyconcepts)
+    max_bytes: int - once the cache grows past this size the least recently used entries are evicted
+    max_age: float - entries not used for this many seconds are evicted
+    refresh_after: float - entries refreshed less than this many seconds ago are returned without a request
+    """
+
+    def __init__(
+        self,
+        path: str | None = None,
+        *,
+        max_bytes: int | None = None,
+        max_age: float | None = None,
+        refresh_after: float = 0.0,
+    ):
+        self.path = path or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.refresh_after = refresh_after
+        self._lock = threading.Lock()
+        self._entry_locks = {}
+        self._entry_locks_lock = threading.Lock()
+
+    def _entry(self, table: str, symbol: str, timeframe: str) -> str:
+        return os.path.join(
+            self.path, *(urllib.parse.quote(part, safe="") for part in (table, symbol, timeframe))
+        )
+
+    @contextmanager
+    def _locked(self, entry: str, wait: bool = True):
+        """Hold the lock of an entry, in this process and, where flock exists, in every other.
+
+        Yields whether the lock is held: with wait=False it is not taken if another load has it.
+        """
+        with self._entry_locks_lock:
+            lock = self._entry_locks.setdefault(entry, threading.Lock())
+        if not lock.acquire(wait):
+            yield False
+            return
+        try:
+            if fcntl is None:
+                yield True
+                return
+            # the lock file sits next to the entry, so removing the entry does not remove it
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            with open(entry + ".lock", "a") as f:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    yield False
+                    return
+                try:
+                    yield True
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+        finally:
+            lock.release()
+
+    def _read(self, entry: str) -> tuple[dict, dict] | None:
+        """meta and memory-mapped columns of an entry, or None if it is missing or incomplete."""
+        try:
+            with open(os.path.join(entry, META_FILE)) as f:
+                meta = json.load(f)
+            columns = {
+                name: np.load(os.path.join(entry, f"{name}.npy"), mmap_mode="r")
+                for name in meta["columns"]
+            }
+        except (OSError, ValueError, KeyError):
+            return None
+        if any(len(values) != meta["rows"] for values in columns.values()):
+            # written over by another process while reading
+            return None
+        return meta, columns
+
+    @staticmethod
+    def _replace(path: str, save: Callable, mode: str = "wb") -> None:
+        """Write path with save(file) through a temporary file of its own, then move it into place."""
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, mode) as f:
+                save(f)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+    def _write_meta(self, entry: str, meta: dict) -> None:
+        self._replace(os.path.join(entry, META_FILE), lambda f: json.dump(meta, f), "w")
+
+    def _write(self, entry: str, columns: dict) -> None:
+        os.makedirs(entry, exist_ok=True)
+        for name, values in columns.items():
+            values = _stored(values)
+            self._replace(os.path.join(entry, f"{name}.npy"), lambda f: np.save(f, values))
+        meta = {
+            "columns": list(columns),
+            "rows": len(next(iter(columns.values()))),
+            "refreshed": time.time(),
+        }
+        self._write_meta(entry, meta)
+
+    def load(
+        self,
+        table: str,
+        symbol: str,
+        timeframe: str,
+        fetch: Callable[[int | None], dict],
+        key: str,
+    ) -> dict:
+        """
+        Cached columns of (table, symbol, timeframe), brought up to date with fetch.
+
+        fetch(since) returns the columns of the rows whose key is at least since (all rows when
+        since is None), in ascending key order, as {column: ndarray}, or {} if there are none.
+        key names the int64 column the rows are ordered by. Returns {} if there are no rows.
+        """
+        entry = self._entry(table, symbol, timeframe)
+        with self._locked(entry):
+            return self._load(entry, fetch, key)
+
+    def _load(self, entry: str, fetch: Callable[[int | None], dict], key: str) -> dict:
+        cached = self._read(entry)
+        if cached is None:
+            columns = fetch(None)
+        else:
+            meta, columns = cached
+            meta_path = os.path.join(entry, META_FILE)
+            if time.time() - meta["refreshed"] < self.refresh_after:
+                os.utime(meta_path)
+                return columns
+            since = int(columns[key][-1])
+            new = fetch(since)
+            if not new:
+                meta["refreshed"] = time.time()
+                self._write_meta(entry, meta)
+                return columns
+            if set(new) != set(columns):
+                # the table's columns changed; load it again
+                columns = fetch(None)
+            else:
+                keep = int(np.searchsorted(columns[key], since))
+                columns = {
+                    name: np.concatenate([values[:keep], _stored(new[name], values.dtype)])
+                    for name, values in columns.items()
+                }
+        if not columns:
+            return {}
+        self._write(entry, columns)
+        self.evict(keep=entry)
+        cached = self._read(entry)
+        return columns if cached is None else cached[1]
+
+    def invalidate(self, table: str | None = None, symbol: str | None = None, timeframe: str | None = None) -> int:
+        """Remove the entries matching the given table, symbol and timeframe (all if None). Returns how many."""
+        removed = 0
+        for entry, parts in self._entries():
+            if all(want is None or want == got for want, got in zip((table, symbol, timeframe), parts)):
+                with self._locked(entry):
+                    shutil.rmtree(entry, ignore_errors=True)
+                removed += 1
+        return removed
+
+    def evict(self, keep: str | None = None) -> int:
+        """Remove entries unused for max_age, then least recently used ones beyond max_bytes. Returns how many."""
+        if self.max_bytes is None and self.max_age is None:
+            return 0
+        with self._lock:
+            entries = []
+            for entry, _ in self._entries():
+                try:
+                    used = os.path.getmtime(os.path.join(entry, META_FILE))
+                    size = sum(e.stat().st_size for e in os.scandir(entry))
+                except OSError:
+                    continue
+                entries.append((used, size, entry))
+            entries.sort()
+            total = sum(size for _, size, _ in entries)
+            now = time.time()
+            removed = 0
+            for used, size, entry in entries:
+                expired = self.max_age is not None and now - used > self.max_age
+                oversized = self.max_bytes is not None and total > self.max_bytes
+                if entry != keep and (expired or oversized):
+                    # an entry being loaded is in use; it is left for a later eviction
+                    with self._locked(entry, wait=False) as held:
+                        if not held:
+                            continue
+                        shutil.rmtree(entry, ignore_errors=True)
+                    total -= size
+                    removed += 1
+            return removed
+
+    def _entries(self):
+        """(directory, (table, symbol, timeframe)) of every cached entry."""
+        if not os.path.isdir(self.path):
+            return
+        for table in os.scandir(self.path):
+            for symbol in (os.scandir(table.path) if table.is_dir() else ()):
+                for timeframe in (os.scandir(symbol.path) if symbol.is_dir() else ()):
+                    if timeframe.is_dir():
+                        yield timeframe.path, tuple(
+                            urllib.parse.unquote(e.name) for e in (table, symbol, timeframe)
+                        )
@@ -0,0 +1,196 @@
+"""
+Compact binary container for the SMC viewer frames.
+
+The JSON export repeats the whole window of every series in every frame. This format
+stores what FrameEngine already knows instead:
+
+- the base series (ohlc.x, open, high, low, close and the extras such as ewo) once, for
+  the whole history; each frame only records its [start, end) bar offsets into them,
+- the indicator columns as deltas: each frame shifts every column of the previous frame
+  left by one bar and lists the window positions whose value changed (the first frame
+  lists every position),
+- every array as a little-endian typed array in its column's own dtype.
+
+Layout: b"SMCF", u32 version, u64 header length, the JSON header (meta, column paths and
+kinds, and the dtype, shape and byte offset of every array), zero padding to a multiple of
+8 bytes, then the arrays at their offsets, each aligned to 8 bytes.
+
+decode_frames turns a container back into the exact frame dicts of FrameEngine.frames(),
+so the JSON payload can always be rebuilt from it.
+"""
+from __future__ import annotations
+
+import json
+import struct
+from typing import Iterator
+
+import numpy as np
+
+from smartmoneyconcepts.frames import FrameEngine
+
+MAGIC = b"SMCF"
+VERSION = 1
+_PREFIX = struct.Struct("<4sIQ")
+
+
+def _encode_list(values: list) -> tuple[str, dict]:
+    """JSON-ready list (numbers or None, or strings) as (kind, {array name: array})."""
+    if any(isinstance(v, str) for v in values):
+        data = [(v or "").encode() for v in values]
+        offsets = np.zeros(len(data) + 1, dtype=np.int64)
+        np.cumsum([len(d) for d in data], out=offsets[1:])
+        return "s", {"offsets": offsets, "text": np.frombuffer(b"".join(data), dtype=np.uint8)}
+    numbers = [v for v in values if v is not None]
+    kind = "i" if numbers and all(isinstance(v, int) and not isinstance(v, bool) for v in numbers) else "f"
+    if kind == "i" and len(numbers) == len(values):
+        return kind, {"values": np.array(values, dtype=np.int64)}
+    return kind, {"values": np.array([np.nan if v is None else v for v in values], dtype=np.float64)}
+
+
+def _decode_list(kind: str, arrays: dict) -> list:
+    if kind == "s":
+        text = arrays["text"].tobytes()
+        offsets = arrays["offsets"].tolist()
+        return [text[a:b].decode() for a, b in zip(offsets[:-1], offsets[1:])]
+    return _json_list(arrays["values"], kind)
+
+
+def _json_list(values: np.ndarray, kind: str) -> list:
+    """values as the JSON-ready list of the frame dicts: NaN as None, ints as int."""
+    out = values.tolist()
+    if values.dtype.kind == "f":
+        out = [None if v != v else v for v in out]
+        if kind == "i":
+            out = [None if v is None else int(v) for v in out]
+    return out
+
+
+def _kind(dtype: np.dtype) -> str:
+    return {"b": "b", "i": "i", "u": "i"}.get(dtype.kind, "f")
+
+
+def encode_frames(engine: FrameEngine, meta: dict) -> bytes:
+    """All frames of engine, with meta, as a compact container."""
+    arrays = {}
+    series = {}
+    for name, values in engine.series().items():
+        kind, parts = _encode_list(values)
+        series[name] = kind
+        for part, array in parts.items():
+            arrays[f"series/{name}/{part}"] = array
+
+    bounds = []
+    timestamps = []
+    positions = {}
+    values = {}
+    counts = []
+    for delta in engine.deltas(json_values=False):
+        bounds.append((delta.start, delta.end))
+        timestamps.append(delta.timestamp)
+        frame_counts = []
+        for path, (pos, vals) in delta.changes.items():
+            positions.setdefault(path, []).append(pos)
+            values.setdefault(path, []).append(vals)
+            frame_counts.append(len(pos))
+        counts.append(frame_counts)
+
+    paths = list(positions)
+    kind, parts = _encode_list(timestamps)
+    for part, array in parts.items():
+        arrays[f"timestamps/{part}"] = array
+    arrays["bounds"] = np.array(bounds, dtype=np.int64).reshape(-1, 2)
+    count_array = np.array(counts, dtype=np.int64).reshape(len(bounds), len(paths))
+    arrays["counts"] = count_array.astype(np.min_scalar_type(int(count_array.max(initial=0))))
+    position_dtype = np.min_scalar_type(max(engine.window - 1, 0))
+    columns = []
+    for k, path in enumerate(paths):
+        column_values = np.concatenate(values[path])
+        arrays[f"positions/{k}"] = np.concatenate(positions[path]).astype(position_dtype)
+        arrays[f"values/{k}"] = column_values
+        columns.append({"path": list(path), "kind": _kind(column_values.dtype)})
+
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        layout[name] = {"dtype": array.dtype.newbyteorder("<").str, "shape": list(array.shape), "offset": offset}
+        offset += -(-array.nbytes // 8) * 8
+
+    header = json.dumps(
+        {
+            "meta": meta,
+            "frames": len(bounds),
+            "timestamps": kind,
+            "series": series,
+            "columns": columns,
+            "arrays": layout,
+        },
+        separators=(",", ":"),
+    ).encode()
+    header += b" " * (-(_PREFIX.size + len(header)) % 8)
+
+    out = bytearray(_PREFIX.pack(MAGIC, VERSION, len(header)) + header)
+    for name, array in arrays.items():
+        data = array.astype(layout[name]["dtype"], copy=False).tobytes()
+        out += data + b"\0" * (-len(data) % 8)
+    return bytes(out)
+
+
+def decode_frames(data: bytes) -> tuple[dict, Iterator[dict]]:
+    """(meta, frames) of a compact container; the frames equal FrameEngine.frames()."""
+    magic, version, header_size = _PREFIX.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not an SMC frames container")
+    if version != VERSION:
+        raise ValueError(f"unsupported SMC frames container version {version}")
+    header = json.loads(bytes(data[_PREFIX.size : _PREFIX.size + header_size]))
+    base = _PREFIX.size + header_size
+
+    def array(name: str) -> np.ndarray:
+        spec = header["arrays"][name]
+        count = int(np.prod(spec["shape"]))
+        return np.frombuffer(data, dtype=spec["dtype"], count=count, offset=base + spec["offset"]).reshape(
+            spec["shape"]
+        )
+
+    def parts(prefix: str) -> dict:
+        return {name[len(prefix) :]: array(name) for name in header["arrays"] if name.startswith(prefix)}
+
+    series = {name: _decode_list(kind, parts(f"series/{name}/")) for name, kind in header["series"].items()}
+    timestamps = _decode_list(header["timestamps"], parts("timestamps/"))
+    bounds = array("bounds").tolist()
+    counts = array("counts")
+    columns = header["columns"]
+    positions = [array(f"positions/{k}").tolist() for k in range(len(columns))]
+    values = [_json_list(array(f"values/{k}"), column["kind"]) for k, column in enumerate(columns)]
+    offsets = np.zeros((len(bounds) + 1, len(columns)), dtype=np.int64)
+    np.cumsum(counts, axis=0, out=offsets[1:])
+    offsets = offsets.tolist()
+
+    x = series.pop("x")
+    ohlc = {name: series.pop(name) for name in ("open", "high", "low", "close")}
+
+    def frames() -> Iterator[dict]:
+        state = [None] * len(columns)
+        for index, (start, end) in enumerate(bounds):
+            n = end - start
+            frame = {"index": index, "timestamp": timestamps[index], "ohlc": {"x": x[start:end]}}
+            for name, data in ohlc.items():
+                frame["ohlc"][name] = data[start:end]
+            for k, column in enumerate(columns):
+                previous = state[k]
+                current = [None] * n if previous is None else previous[1:] + [None]
+                a, b = offsets[index][k], offsets[index + 1][k]
+                for p, v in zip(positions[k][a:b], values[k][a:b]):
+                    current[p] = v
+                state[k] = current
+                node = frame
+                for key in column["path"][:-1]:
+                    node = node.setdefault(key, {})
+                node[column["path"][-1]] = current
+            for name, data in series.items():
+                frame[name] = data[start:end]
+            yield frame
+
+    return header["meta"], frames()
@@ -0,0 +1,147 @@
+"""
+Streaming JSON encoder for the SMC viewer frames.
+
+The viewer JSON repeats every series of a window in every frame. Instead of building the
+frame dicts and a payload holding all of them, the encoder turns each column into JSON
+tokens once, straight from its NumPy array (NaN as null), and writes one frame at a time:
+
+- the base series (ohlc.x, open, high, low, close and the extras such as ewo) are encoded
+  once for the whole history and every frame joins its slice of the tokens,
+- the indicator columns follow FrameEngine's deltas: each frame shifts the previous frame's
+  tokens left by one bar and encodes only the values that changed.
+
+The bytes are exactly those of json.dumps({"meta": meta, "frames": frames},
+separators=(",", ":")), so a file or HTTP body can be written from the chunks as they come.
+"""
+from __future__ import annotations
+
+import json
+import math
+from json.encoder import encode_basestring_ascii
+from typing import IO, Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+from smartmoneyconcepts.frames import FrameEngine
+
+SEPARATORS = (",", ":")
+OHLC = ("open", "high", "low", "close")
+
+
+def _token(value) -> str:
+    if value is None:
+        return "null"
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if type(value) is float and math.isfinite(value):
+        return float.__repr__(value)
+    if type(value) is int:
+        return int.__repr__(value)
+    if type(value) is str:
+        return encode_basestring_ascii(value)
+    return json.dumps(value, separators=SEPARATORS)
+
+
+def json_tokens(values) -> list[str]:
+    """JSON text of every value of a NumPy array or list, with NaN in float arrays as null."""
+    if isinstance(values, np.ndarray):
+        kind = values.dtype.kind
+        if kind == "f":
+            tokens = list(map(float.__repr__, values.tolist()))
+            finite = np.isfinite(values)
+            if finite.all():
+                return tokens
+            for p in np.flatnonzero(~finite).tolist():
+                v = values[p]
+                tokens[p] = "null" if np.isnan(v) else ("Infinity" if v > 0 else "-Infinity")
+            return tokens
+        if kind in "iu":
+            return list(map(int.__repr__, values.tolist()))
+        if kind == "b":
+            return ["true" if v else "false" for v in values.tolist()]
+        values = values.tolist()
+    return [_token(v) for v in values]
+
+
+def json_lists(df: pd.DataFrame) -> dict:
+    """Columns of df as JSON-ready lists with NaN as None, like nan_to_none(df.to_dict(orient="list"))."""
+    columns = {}
+    for name in df.columns:
+        values = df[name].to_numpy()
+        out = values.tolist()
+        if values.dtype.kind == "f":
+            for p in np.flatnonzero(np.isnan(values)).tolist():
+                out[p] = None
+        elif values.dtype == object:
+            out = [None if v is None or v != v else v for v in out]
+        columns[name] = out
+    return columns
+
+
+def _array(tokens: list[str]) -> str:
+    return "[" + ",".join(tokens) + "]"
+
+
+def _object(node: dict) -> str:
+    """JSON object of a dict whose leaves are already JSON text."""
+    return (
+        "{"
+        + ",".join(
+            encode_basestring_ascii(key) + ":" + (value if isinstance(value, str) else _object(value))
+            for key, value in node.items()
+        )
+        + "}"
+    )
+
+
+def iter_frames_json(engine: FrameEngine, meta: dict) -> Iterator[bytes]:
+    """The JSON payload of meta and engine.frames(), one frame per chunk."""
+    series = {name: json_tokens(values) for name, values in engine.series().items()}
+    x = series.pop("x")
+    ohlc = {name: series.pop(name) for name in OHLC}
+
+    yield ('{"meta":' + json.dumps(meta, separators=SEPARATORS) + ',"frames":[').encode()
+    columns = {}
+    for delta in engine.deltas(json_values=False):
+        start, end = delta.start, delta.end
+        frame = {
+            "index": str(delta.index),
+            "timestamp": _token(delta.timestamp),
+            "ohlc": {"x": _array(x[start:end])},
+        }
+        for name, tokens in ohlc.items():
+            frame["ohlc"][name] = _array(tokens[start:end])
+        for path, (positions, values) in delta.changes.items():
+            previous = columns.get(path)
+            column = ["null"] * (end - start) if previous is None else previous[1:] + ["null"]
+            for p, token in zip(positions.tolist(), json_tokens(values)):
+                column[p] = token
+            columns[path] = column
+            node = frame
+            for key in path[:-1]:
+                node = node.setdefault(key, {})
+            node[path[-1]] = _array(column)
+        for name, tokens in series.items():
+            frame[name] = _array(tokens[start:end])
+        yield (("," if delta.index else "") + _object(frame)).encode()
+    yield b"]}"
+
+
+def iter_payload_json(meta: dict, frames: Iterable[dict]) -> Iterator[bytes]:
+    """The JSON payload of meta and already built frame dicts, one frame per chunk."""
+    yield ('{"meta":' + json.dumps(meta, separators=SEPARATORS) + ',"frames":[').encode()
+    for index, frame in enumerate(frames):
+        yield (("," if index else "") + json.dumps(frame, separators=SEPARATORS)).encode()
+    yield b"]}"
+
+
+def write_chunks(chunks: Iterable[bytes], f: IO[bytes]) -> int:
+    """Write chunks to a binary file (or anything with write), returning the byte count."""
+    size = 0
+    for chunk in chunks:
+        f.write(chunk)
+        size += len(chunk)
+    return size
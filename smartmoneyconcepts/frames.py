@@ -0,0 +1,538 @@
+"""
+Sliding-window frame engine for the SMC viewer export.
+
+FrameEngine walks a fixed-size window over a candle history one bar at a time and
+produces exactly what calling the smc indicators on every window slice would. State
+that does not depend on where the window starts is computed once for the whole
+history and carried from frame to frame:
+
+- raw and joined fair value gaps with their mitigation index,
+- swing pivot candidates and the bar that breaks each candidate's level,
+- session membership and running session highs/lows,
+- previous high/low period buckets,
+- the JSON-ready OHLC, timestamp and EWO/SMA series.
+
+Only the parts a window boundary can change (the artificial swing pivots on the first
+and last bar, the pivot runs cut by the window, the liquidity range and the
+retracement warm-up) are recomputed per frame, on plain arrays. Each step is emitted
+as a FrameDelta against the previous frame; FrameAssembler turns deltas back into the
+frame dicts written by scripts/export_smc_frames.py.
+
+The frames keep the dtypes of the "mixed" dtype policy whatever policy is active (see
+smc.set_dtype_policy), so the viewer data does not depend on it.
+"""
+from __future__ import annotations
+
+from typing import Iterator, NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from smartmoneyconcepts.smc import (
+    smc,
+    SMCContext,
+    _crossing_table,
+    _first_crossing,
+    _kernel,
+    _ob_arrays,
+    dtype_policy,
+    _reduce_swings,
+    _swing_candidates,
+)
+
+SESSIONS = (("asia", "Asia"), ("london", "London"), ("nyam", "NYAM"), ("nypm", "NYPM"))
+
+# Sessions use time-of-day; daily+ bars are at midnight, so all fall into
+# overnight sessions (e.g. NYPM 19:00-01:00). Sessions are disabled for these.
+DAILY_TIMEFRAMES = {"1D", "1d", "1W", "1w", "1M", "1m", "D", "W", "M"}
+
+
+def nan_to_none(obj):
+    """Recursively replace NaN/NaT with None for JSON serialization."""
+    if isinstance(obj, dict):
+        return {k: nan_to_none(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [nan_to_none(v) for v in obj]
+    if isinstance(obj, (float, np.floating)) and np.isnan(obj):
+        return None
+    if pd.isna(obj):
+        return None
+    if isinstance(obj, (np.integer, np.int64)):
+        return int(obj)
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    return obj
+
+
+def event_lists(events: np.ndarray, n: int) -> dict:
+    """
+    JSON-ready columns of n candles from sparse indicator events (e.g. smc.fvg(..., sparse=True)),
+    None where there is no event; the same lists as nan_to_none(dense.to_dict(orient="list")).
+    """
+    positions = events["index"].tolist()
+    columns = {}
+    for name in events.dtype.names[1:]:
+        column = [None] * n
+        for p, v in zip(positions, _json_values(events[name])):
+            column[p] = v
+        columns[name] = column
+    return columns
+
+
+class FrameDelta(NamedTuple):
+    """
+    Difference between a frame and the one before it.
+
+    Every indicator column of the new frame equals the previous frame's column shifted
+    left by one bar, except at ``changes[path][0]`` (window positions) where the values
+    in ``changes[path][1]`` apply. The first frame lists every position.
+    """
+
+    index: int
+    start: int
+    end: int
+    timestamp: str
+    changes: dict
+
+
+class FrameAssembler:
+    """Rebuild full frame dicts from a stream of FrameDelta."""
+
+    def __init__(self, x: list, ohlc: dict, extras: dict):
+        self._x = x
+        self._ohlc = ohlc
+        self._extras = extras
+        self._columns = {}
+
+    def apply(self, delta: FrameDelta) -> dict:
+        n = delta.end - delta.start
+        frame = {
+            "index": delta.index,
+            "timestamp": delta.timestamp,
+            "ohlc": {"x": self._x[delta.start : delta.end]},
+        }
+        for name, values in self._ohlc.items():
+            frame["ohlc"][name] = values[delta.start : delta.end]
+
+        for path, (positions, values) in delta.changes.items():
+            previous = self._columns.get(path)
+            column = [None] * n if previous is None else previous[1:] + [None]
+            for p, v in zip(positions.tolist(), values):
+                column[p] = v
+            self._columns[path] = column
+
+            node = frame
+            for key in path[:-1]:
+                node = node.setdefault(key, {})
+            node[path[-1]] = column
+
+        for name, values in self._extras.items():
+            frame[name] = values[delta.start : delta.end]
+        return frame
+
+
+def _same(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Bit-for-bit equality (so 0.0 and -0.0 differ), with NaN equal to NaN."""
+    if a.dtype.kind == "f":
+        bits = np.dtype(f"u{a.dtype.itemsize}")
+        return (a.view(bits) == b.view(bits)) | (np.isnan(a) & np.isnan(b))
+    return a == b
+
+
+def _json_values(values: np.ndarray) -> list:
+    out = values.tolist()
+    if values.dtype.kind == "f":
+        out = [None if v != v else v for v in out]
+    return out
+
+
+def _session_extremes(high: np.ndarray, low: np.ndarray) -> tuple:
+    """
+    Running high/low of a session from its first candle, candle by candle as smc.sessions
+    does when the prices are not all positive: a NaN price stays on its own candle only.
+    """
+    session_high = np.zeros(len(high), dtype=np.float32)
+    session_low = np.zeros(len(low), dtype=np.float32)
+    for i in range(len(high)):
+        session_high[i] = max(high[i], session_high[i - 1] if i > 0 else 0)
+        session_low[i] = min(low[i], session_low[i - 1] if i > 0 and session_low[i - 1] != 0 else float("inf"))
+    return session_high, session_low
+
+
+def _first_true(mask: np.ndarray) -> int:
+    """Index of the first True in mask, or -1."""
+    if mask.size and mask.any():
+        return int(np.argmax(mask))
+    return -1
+
+
+class FrameEngine:
+    """
+    Compute export frames for every window ``df.iloc[end - window : end]``,
+    ``end = window .. len(df) - 1``, with the indicator settings used by the exporter:
+
+    fvg(join_consecutive=True), swing_highs_lows(swing_length), bos_choch, ob,
+    liquidity, previous_high_low(time_frame), the four default sessions and retracements.
+
+    parameters:
+    df: DataFrame - OHLCV candles with a datetime index
+    window: int - number of bars per frame
+    timeframe: str - candle timeframe; sessions are disabled for daily and above
+    timestamps: list - raw timestamp strings to use for ohlc.x instead of the index
+    extras: dict - extra per-bar series (e.g. ewo, sma5, sma35) sliced into every frame
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        window: int,
+        *,
+        timeframe: str = "23",
+        timestamps: list | None = None,
+        extras: dict | None = None,
+        swing_length: int = 5,
+        time_frame: str = "4h",
+    ):
+        df = df.rename(columns={c: c.lower() for c in df.columns})
+        self.df = df
+        self._context = SMCContext(df)
+        self.window = window
+        self.timeframe = timeframe
+        self.swing_length = swing_length
+        self.time_frame = time_frame
+        self._timestamps = timestamps
+        self._extras = {k: nan_to_none(list(v)) for k, v in (extras or {}).items() if v is not None}
+
+        self._open = df["open"].values
+        self._high = df["high"].values
+        self._low = df["low"].values
+        self._close = df["close"].values
+        self._volume = df["volume"].values
+
+        with dtype_policy("mixed"):
+            self._prepare_fvg()
+            self._prepare_swings()
+            self._prepare_sessions()
+            self._prepare_previous_high_low()
+
+    def __len__(self) -> int:
+        return max(len(self.df) - self.window, 0)
+
+    # ----- precomputed, window-independent state -----
+
+    def _prepare_fvg(self):
+        raw = smc.fvg(self._context)
+        joined = smc.fvg(self._context, join_consecutive=True)
+        self._fvg_raw = raw["FVG"].values
+        self._fvg_raw_top = raw["Top"].values
+        self._fvg_raw_bottom = raw["Bottom"].values
+        self._fvg_pos = np.flatnonzero(~np.isnan(self._fvg_raw))
+        self._fvg_joined = joined["FVG"].values
+        self._fvg_joined_top = joined["Top"].values
+        self._fvg_joined_bottom = joined["Bottom"].values
+        self._fvg_joined_mitigated = joined["MitigatedIndex"].values
+
+    def _prepare_swings(self):
+        candidates = _swing_candidates(self._context, self.swing_length)
+        self._swing_pos = np.flatnonzero(~np.isnan(candidates))
+        self._swing_kind = candidates[self._swing_pos]
+
+        # bar that breaks each candidate's level on close (bos_choch with close_break=True)
+        self._swing_broken = np.full(len(self.df), -1, dtype=np.int64)
+        for side, kind, values in ((">", 1, self._high), ("<", -1, self._low)):
+            pos = self._swing_pos[self._swing_kind == kind]
+            j = _first_crossing(_crossing_table(self._close, side), pos + 2, values[pos].astype(np.float32), side)
+            self._swing_broken[pos] = np.where(j < len(self.df), j, -1)
+
+    def _prepare_sessions(self):
+        data = smc.sessions_multi(self._context, [name for _, name in SESSIONS])
+        self._sessions = {
+            key: (data[name]["Active"].values, data[name]["High"].values, data[name]["Low"].values)
+            for key, name in SESSIONS
+        }
+
+    def _prepare_previous_high_low(self):
+        # Bucket boundaries are only shared between windows when every window
+        # resamples onto the same grid: anchored offsets (W, M, ...) or ticks that
+        # divide a day (resample's default origin is midnight of the first day).
+        # candles with a missing price before each position, for the windows that need the full path
+        missing = np.isnan(self._open) | np.isnan(self._high) | np.isnan(self._low) | np.isnan(self._close)
+        self._missing = np.concatenate([[0], np.cumsum(missing)])
+        offset = pd.tseries.frequencies.to_offset(self.time_frame)
+        if isinstance(offset, pd.offsets.Tick) and pd.Timedelta(days=1) % pd.Timedelta(offset):
+            self._period = None
+            return
+
+        index = pd.to_datetime(self.df.index)
+        first = pd.Series(np.arange(len(index)), index=index).resample(self.time_frame).first().dropna()
+        starts = first.values.astype(np.int64)
+        self._period = np.searchsorted(starts, np.arange(len(index)), side="right") - 1
+        self._period_labels = first.index.values
+        self._candle_times = index.values
+
+    # ----- per-window computation -----
+
+    def _fvg(self, s: int, e: int):
+        n = e - s
+        fvg = np.full(n, np.nan)
+        top = np.full(n, np.nan)
+        bottom = np.full(n, np.nan)
+        mitigated_index = np.full(n, np.nan)
+
+        # the first and last bar of a window never have a gap
+        pos = self._fvg_pos
+        pos = pos[np.searchsorted(pos, s + 1) : np.searchsorted(pos, e - 1)]
+        if len(pos):
+            kinds = self._fvg_raw[pos]
+            breaks = (np.diff(pos) != 1) | (np.diff(kinds) != 0)
+            starts = np.concatenate([[0], np.flatnonzero(breaks) + 1])
+            ends = np.concatenate([starts[1:] - 1, [len(pos) - 1]])
+            run_top = np.maximum.reduceat(self._fvg_raw_top[pos], starts)
+            run_bottom = np.minimum.reduceat(self._fvg_raw_bottom[pos], starts)
+
+            for i, kind, t, b in zip(pos[ends], kinds[ends], run_top, run_bottom):
+                if (
+                    self._fvg_joined[i] == kind
+                    and self._fvg_joined_top[i] == t
+                    and self._fvg_joined_bottom[i] == b
+                ):
+                    # same gap as in the full history: reuse its mitigation
+                    j = int(self._fvg_joined_mitigated[i])
+                    j = j if 0 < j < e else -1
+                else:
+                    # a run of gaps cut by the window start
+                    if kind == 1:
+                        j = _first_true(self._low[i + 2 : e] <= t)
+                    else:
+                        j = _first_true(self._high[i + 2 : e] >= b)
+                    j = i + 2 + j if j >= 0 else -1
+                fvg[i - s] = kind
+                top[i - s] = t
+                bottom[i - s] = b
+                mitigated_index[i - s] = j - s if j >= 0 else 0
+
+        return {"FVG": fvg, "Top": top, "Bottom": bottom, "MitigatedIndex": mitigated_index}
+
+    def _swing_pivots(self, s: int, e: int):
+        """Window pivots as (window positions, kinds) including the two edge pivots."""
+        length = self.swing_length
+        pos = self._swing_pos
+        lo = np.searchsorted(pos, s + 2 * length - 1)
+        hi = np.searchsorted(pos, e - 1 - length, side="right")
+        pos, kinds = pos[lo:hi], self._swing_kind[lo:hi]
+        if not len(pos):
+            return pos, kinds
+
+        keep = _reduce_swings(kinds, self._high[pos], self._low[pos])
+        pos, kinds = pos[keep] - s, kinds[keep]
+
+        pos = np.concatenate([[0], pos, [e - s - 1]])
+        kinds = np.concatenate([[-kinds[0]], kinds, [-kinds[-1]]])
+        return pos, kinds
+
+    def _bos_choch(self, s: int, e: int, pos: np.ndarray, kinds: np.ndarray, levels: np.ndarray):
+        n = e - s
+        bos = np.zeros(n, dtype=np.int32)
+        choch = np.zeros(n, dtype=np.int32)
+        level = np.zeros(n, dtype=np.float32)
+        broken = np.zeros(n, dtype=np.int32)
+
+        if len(pos) >= 4:
+            h4, h3, h2, h1 = kinds[:-3], kinds[1:-2], kinds[2:-1], kinds[3:]
+            l4, l3, l2, l1 = levels[:-3], levels[1:-2], levels[2:-1], levels[3:]
+            bull = (h4 == -1) & (h3 == 1) & (h2 == -1) & (h1 == 1)
+            bear = (h4 == 1) & (h3 == -1) & (h2 == 1) & (h1 == -1)
+            target = pos[1:-2]
+            bos_t = np.where(bull & (l4 < l2) & (l2 < l3) & (l3 < l1), 1, 0)
+            bos_t = np.where(bear & (l4 > l2) & (l2 > l3) & (l3 > l1), -1, bos_t)
+            choch_t = np.where(bull & (l1 > l3) & (l3 > l4) & (l4 > l2), 1, 0)
+            choch_t = np.where(bear & (l1 < l3) & (l3 < l4) & (l4 < l2), -1, choch_t)
+            bos[target] = bos_t
+            choch[target] = choch_t
+            level[target] = np.where((bos_t != 0) | (choch_t != 0), l3, 0)
+
+        detected = np.flatnonzero((bos != 0) | (choch != 0))
+        if len(detected):
+            j = self._swing_broken[s + detected]
+            broken[detected] = np.where((j >= 0) & (j < e), j - s, 0)
+            # if there are any unbroken bos or choch that started before a broken one and ended after it then remove them
+            broken_at = np.where(broken[detected] != 0, broken[detected], n)
+            first_later_break = np.append(np.minimum.accumulate(broken_at[::-1])[::-1][1:], n)
+            removed = detected[broken[detected] >= first_later_break]
+            bos[removed] = 0
+            choch[removed] = 0
+            level[removed] = 0
+
+        # remove the ones that aren't broken
+        unbroken = ((bos != 0) | (choch != 0)) & (broken == 0)
+        bos[unbroken] = 0
+        choch[unbroken] = 0
+        level[unbroken] = 0
+
+        return {
+            "BOS": np.where(bos != 0, bos, np.nan),
+            "CHOCH": np.where(choch != 0, choch, np.nan),
+            "Level": np.where(level != 0, level, np.nan),
+            "BrokenIndex": np.where(broken != 0, broken, np.nan),
+        }
+
+    def _previous_high_low(self, s: int, e: int):
+        if self._period is None or self._missing[e] > self._missing[s]:
+            # resample drops the periods of the window where a price is missing
+            with dtype_policy("mixed"):
+                data = smc.previous_high_low(self.df.iloc[s:e], time_frame=self.time_frame)
+            return {k: data[k].values for k in data.columns}
+
+        n = e - s
+        high = self._high[s:e]
+        low = self._low[s:e]
+        period = self._period[s:e]
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(period)) + 1])
+        if len(starts) < 2:
+            return {
+                "PreviousHigh": np.full(n, np.nan, dtype=np.float32),
+                "PreviousLow": np.full(n, np.nan, dtype=np.float32),
+                "BrokenHigh": np.zeros(n, dtype=np.int32),
+                "BrokenLow": np.zeros(n, dtype=np.int32),
+            }
+
+        period_times = self._period_labels[period[starts]]
+        period_highs = np.maximum.reduceat(high, starts)
+        period_lows = np.minimum.reduceat(low, starts)
+        periods_before = np.searchsorted(period_times, self._candle_times[s:e], side="left")
+        prev_period_idx = periods_before - 2
+        valid_mask = periods_before > 1
+
+        previous_high = np.full(n, np.nan, dtype=np.float32)
+        previous_low = np.full(n, np.nan, dtype=np.float32)
+        previous_high[valid_mask] = period_highs[prev_period_idx[valid_mask]]
+        previous_low[valid_mask] = period_lows[prev_period_idx[valid_mask]]
+
+        groups = np.concatenate([[0], np.flatnonzero(np.diff(prev_period_idx)) + 1, [n]])
+        cummax_high = np.empty(n)
+        cummin_low = np.empty(n)
+        for a, b in zip(groups[:-1], groups[1:]):
+            cummax_high[a:b] = np.maximum.accumulate(high[a:b])
+            cummin_low[a:b] = np.minimum.accumulate(low[a:b])
+
+        return {
+            "PreviousHigh": previous_high,
+            "PreviousLow": previous_low,
+            "BrokenHigh": np.where(valid_mask & (cummax_high > previous_high), 1, 0).astype(np.int32),
+            "BrokenLow": np.where(valid_mask & (cummin_low < previous_low), 1, 0).astype(np.int32),
+        }
+
+    def _session(self, key: str, s: int, e: int):
+        active, high, low = self._sessions[key]
+        active = active[s:e]
+        high = high[s:e].copy()
+        low = low[s:e].copy()
+        if s > 0 and active[0] and self._sessions[key][0][s - 1]:
+            # the session started before the window: restart its running high/low
+            k = _first_true(active == 0)
+            k = len(active) if k < 0 else k
+            session_high, session_low = self._high[s : s + k], self._low[s : s + k]
+            if np.all(session_high > 0) and np.all(session_low.astype(np.float32) > 0):
+                high[:k] = np.maximum.accumulate(session_high)
+                low[:k] = np.minimum.accumulate(session_low)
+            else:
+                high[:k], low[:k] = _session_extremes(session_high, session_low)
+        if self.timeframe in DAILY_TIMEFRAMES:
+            active = np.zeros(e - s, dtype=np.int64)
+        return {"Active": active, "High": high, "Low": low}
+
+    def columns(self, start: int, end: int) -> dict:
+        """All indicator columns of window [start, end) keyed by their path in the frame dict."""
+        s, e = start, end
+        o, h, l, c, v = (a[s:e] for a in (self._open, self._high, self._low, self._close, self._volume))
+
+        pos, kinds = self._swing_pivots(s, e)
+        levels = np.where(kinds == 1, h[pos], l[pos]) if len(pos) else np.empty(0)
+        swing_hl = np.full(e - s, np.nan)
+        swing_level = np.full(e - s, np.nan)
+        swing_hl[pos] = kinds
+        swing_level[pos] = levels
+
+        ob = _ob_arrays(o, h, l, c, v, swing_hl, False, np.float32)
+        liquidity = _kernel("_liquidity_kernel")(
+            h, l, swing_hl, swing_level, (np.nanmax(h) - np.nanmin(l)) * 0.01, np.float32
+        )
+        retracements = _kernel("_retracements_kernel")(h, l, swing_hl, swing_level)
+
+        sections = {
+            "fvg": self._fvg(s, e),
+            "swingHighsLows": {"HighLow": swing_hl, "Level": swing_level},
+            "bosChoch": self._bos_choch(s, e, pos, kinds, levels),
+            "ob": dict(zip(("OB", "Top", "Bottom", "OBVolume", "MitigatedIndex", "Percentage"), ob)),
+            "liquidity": dict(zip(("Liquidity", "Level", "End", "Swept"), liquidity)),
+            "previousHighLow": self._previous_high_low(s, e),
+            "sessions": {key: self._session(key, s, e) for key, _ in SESSIONS},
+            "retracements": dict(
+                zip(("Direction", "CurrentRetracement%", "DeepestRetracement%"), retracements)
+            ),
+        }
+
+        columns = {}
+        for section, data in sections.items():
+            if section == "sessions":
+                for key, session in data.items():
+                    for name, values in session.items():
+                        columns[(section, key, name)] = values
+            else:
+                for name, values in data.items():
+                    columns[(section, name)] = values
+        return columns
+
+    def _timestamp(self, e: int) -> str:
+        if self._timestamps is not None and e <= len(self._timestamps):
+            return self._timestamps[e - 1]
+        return self.df.index[e - 1].isoformat()
+
+    def frame_index(self, timestamp: str) -> int | None:
+        """Index of the frame with this timestamp, or None; searched from the newest frame back."""
+        for end in range(len(self.df) - 1, self.window - 1, -1):
+            if self._timestamp(end) == timestamp:
+                return end - self.window
+        return None
+
+    def deltas(self, json_values: bool = True, first: int = 0) -> Iterator[FrameDelta]:
+        """
+        Yield one FrameDelta per window, oldest first, from frame first on (that frame lists
+        every position). With json_values=False the changed values are left as the column's
+        NumPy array instead of a JSON-ready list.
+        """
+        previous = None
+        for index, end in enumerate(range(self.window + first, len(self.df)), first):
+            start = end - self.window
+            columns = self.columns(start, end)
+            changes = {}
+            for path, values in columns.items():
+                if previous is None:
+                    positions = np.arange(len(values))
+                else:
+                    same = _same(values[:-1], previous[path][1:])
+                    positions = np.concatenate([np.flatnonzero(~same), [len(values) - 1]])
+                changed = values[positions]
+                changes[path] = (positions, _json_values(changed) if json_values else changed)
+            previous = columns
+            yield FrameDelta(index, start, end, self._timestamp(end), changes)
+
+    def series(self) -> dict:
+        """The JSON-ready per-bar series every frame slices: x, open, high, low, close and the extras."""
+        if self._timestamps is not None:
+            x = self._timestamps
+        else:
+            x = [t.isoformat() for t in self.df.index]
+        ohlc = {name: _json_values(self.df[name].to_numpy()) for name in ("open", "high", "low", "close")}
+        return {"x": x, **ohlc, **self._extras}
+
+    def assembler(self) -> FrameAssembler:
+        series = self.series()
+        ohlc = {name: series[name] for name in ("open", "high", "low", "close")}
+        return FrameAssembler(series["x"], ohlc, self._extras)
+
+    def frames(self, first: int = 0) -> Iterator[dict]:
+        """Yield the full frame dicts from frame first on, identical to recomputing every window from scratch."""
+        assembler = self.assembler()
+        for delta in self.deltas(first=first):
+            yield assembler.apply(delta)
@@ -9,40 +9,106 @@ Set NEXT_PUBLIC_SUPABASE_MARKET_URL and NEXT_PUBLIC_SUPABASE_MARKET_ANON_KEY.
 """
 from __future__ import annotations
 
+import http.client
 import json
 import os
+import threading
 import urllib.error
 import urllib.parse
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
 
+if TYPE_CHECKING:
+    from smartmoneyconcepts.candle_cache import CandleCache
 
-def _fetch(
+# rows requested per page; the server may cap pages lower (Supabase max-rows defaults to 1000)
+PAGE_SIZE = 1000
+# pages fetched at once after the first one
+FETCH_WORKERS = 4
+
+
+def _credentials() -> tuple[str, str]:
+    base_url = os.environ.get("NEXT_PUBLIC_SUPABASE_MARKET_URL") or os.environ.get("SUPABASE_URL", "http://127.0.0.1:54321")
+    anon_key = os.environ.get("NEXT_PUBLIC_SUPABASE_MARKET_ANON_KEY") or os.environ.get("SUPABASE_ANON_KEY", "")
+    if not anon_key:
+        raise ValueError("Set NEXT_PUBLIC_SUPABASE_MARKET_ANON_KEY (or SUPABASE_ANON_KEY)")
+    return base_url, anon_key
+
+
+class _ConnectionPool:
+    """Keep-alive HTTP connections to one server, one per thread using the pool."""
+
+    def __init__(self, base_url: str):
+        url = urllib.parse.urlsplit(base_url)
+        self._connection_class = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+        self._host = url.netloc
+        self.prefix = url.path.rstrip("/")
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def _connect(self) -> http.client.HTTPConnection:
+        connection = self._connection_class(self._host, timeout=60)
+        with self._lock:
+            self._connections.append(connection)
+        self._local.connection = connection
+        return connection
+
+    def get(self, path: str, headers: dict) -> tuple[int, http.client.HTTPResponse, bytes]:
+        connection = getattr(self._local, "connection", None) or self._connect()
+        for attempt in range(2):
+            try:
+                connection.request("GET", self.prefix + path, headers=headers)
+                response = connection.getresponse()
+                return response.status, response, response.read()
+            except (http.client.HTTPException, ConnectionError):
+                # the server closed an idle keep-alive connection; retry once on a new one
+                connection.close()
+                if attempt:
+                    raise
+                connection = self._connect()
+
+    def close(self) -> None:
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+
+
+def _fetch_columns(
     base_url: str,
     anon_key: str,
     table: str,
     *,
     symbol: str,
     timeframe: str,
+    numeric: list[str],
+    text: list[str] = (),
     from_ts: int | None = None,
     to_ts: int | None = None,
     from_iso: str | None = None,
     to_iso: str | None = None,
     order_col: str = "timestamp_utc",
-    order_asc: bool = True,
     schema: str | None = None,
-    limit: int | None = None,
-) -> list[dict]:
-    """Fetch rows from Supabase REST. Use default (public) schema if schema is None.
-    Supabase default limit is 1000; use order_asc=False and limit to get latest rows."""
-    path = f"/rest/v1/{table}"
-    order_dir = "asc" if order_asc else "desc"
+    page_size: int = PAGE_SIZE,
+    workers: int = FETCH_WORKERS,
+) -> dict:
+    """
+    Fetch every matching row from Supabase REST in ascending order_col, as columns.
+
+    The first page also asks for the exact row count, so the columns are allocated once and
+    the remaining pages are fetched concurrently over keep-alive connections and written in
+    place. Returns {column: ndarray} for the numeric (float64, missing values NaN) and text
+    (object) columns present in the rows, or {} if there are none.
+    """
+    import numpy as np
+
     query = [
         ("symbol", f"eq.{symbol}"),
         ("timeframe", f"eq.{timeframe}"),
-        ("order", f"{order_col}.{order_dir}"),
+        ("order", f"{order_col}.asc"),
     ]
-    if limit is not None:
-        query.append(("limit", str(limit)))
     if from_ts is not None:
         query.append(("timestamp_utc", f"gte.{from_ts}"))
     if to_ts is not None:
@@ -51,7 +117,6 @@ def _fetch(
         query.append(("timestamp", f"gte.{from_iso}"))
     if to_iso is not None:
         query.append(("timestamp", f"lte.{to_iso}"))
-    url = f"{base_url.rstrip('/')}{path}?{urllib.parse.urlencode(query)}"
     headers = {
         "apikey": anon_key,
         "Authorization": f"Bearer {anon_key}",
@@ -60,9 +125,64 @@ def _fetch(
     if schema:
         headers["Accept-Profile"] = schema
         headers["Content-Profile"] = schema
-    req = urllib.request.Request(url, headers=headers, method="GET")
-    with urllib.request.urlopen(req) as resp:
-        return json.loads(resp.read().decode())
+
+    pool = _ConnectionPool(base_url)
+
+    def get_page(offset: int, limit: int, count: bool = False):
+        path = f"/rest/v1/{table}?" + urllib.parse.urlencode(
+            query + [("limit", str(limit)), ("offset", str(offset))]
+        )
+        status, response, body = pool.get(path, {**headers, "Prefer": "count=exact"} if count else headers)
+        if status not in (200, 206):
+            raise RuntimeError(f"{table} request failed: {status} {body[:200].decode(errors='replace')}")
+        return response, json.loads(body)
+
+    try:
+        response, rows = get_page(0, page_size, count=True)
+        if not rows:
+            return {}
+        # Content-Range: 0-999/12345
+        total = int(response.getheader("Content-Range", "").rpartition("/")[2] or len(rows))
+        page_size = min(page_size, len(rows)) if total > len(rows) else page_size
+        columns = {c: np.full(total, np.nan) for c in numeric if c in rows[0]}
+        columns.update({c: np.empty(total, dtype=object) for c in text if c in rows[0]})
+
+        def store(offset: int, rows: list[dict]) -> None:
+            expected = min(page_size, total - offset)
+            if len(rows) != expected:
+                raise RuntimeError(
+                    f"{table} changed while paging: expected {expected} rows at offset {offset}, got {len(rows)}"
+                )
+            for c, values in columns.items():
+                if values.dtype == object:
+                    values[offset : offset + expected] = [r.get(c) for r in rows]
+                else:
+                    values[offset : offset + expected] = np.array([r.get(c) for r in rows], dtype=float)
+
+        store(0, rows[: min(page_size, total)])
+        offsets = range(page_size, total, page_size)
+        if offsets:
+            with ThreadPoolExecutor(max(1, min(workers, len(offsets)))) as executor:
+                for offset, (_, page) in zip(
+                    offsets, executor.map(lambda offset: get_page(offset, page_size), offsets)
+                ):
+                    store(offset, page)
+        return columns
+    finally:
+        pool.close()
+
+
+def _between(columns: dict, key: str, low: int | None, high: int | None) -> dict:
+    """Rows of columns whose key is within [low, high], like the gte/lte filters of the REST API."""
+    import numpy as np
+
+    if not columns:
+        return columns
+    start = 0 if low is None else int(np.searchsorted(columns[key], low, side="left"))
+    end = len(columns[key]) if high is None else int(np.searchsorted(columns[key], high, side="right"))
+    if end <= start:
+        return {}
+    return {name: values[start:end] for name, values in columns.items()}
 
 
 def load_candles_ewo(
@@ -73,6 +193,7 @@ def load_candles_ewo(
     to_date: str | None = None,
     from_ts: int | None = None,
     to_ts: int | None = None,
+    cache: "CandleCache | None" = None,
 ) -> "tuple[pd.DataFrame, list[float | None] | None, list[float | None] | None, list[float | None] | None, list[str] | None]":
     """
     Load candle + EWO + SMA from market_candles_ewo (single table: OHLCV + EWO).
@@ -84,14 +205,14 @@ def load_candles_ewo(
     Returns (df, ewo_list, sma5_list, sma35_list, timestamp_str_list). ewo/sma5/sma35 aligned to rows or None.
     timestamp_str_list is the raw timestamp strings from the API (no conversion), so frame ohlc.x can match wave_engine_state.
 
-    Date args: "YYYY-MM-DD". Timestamp args: Unix seconds.
+    Date args: "YYYY-MM-DD". Timestamp args: Unix seconds. Without dates the whole history is loaded.
+    With a CandleCache the whole history is kept on disk, only the bars from the last cached one
+    on are fetched, and the dates are applied to the cached rows.
     """
+    import numpy as np
     import pandas as pd
 
-    base_url = os.environ.get("NEXT_PUBLIC_SUPABASE_MARKET_URL") or os.environ.get("SUPABASE_URL", "http://127.0.0.1:54321")
-    anon_key = os.environ.get("NEXT_PUBLIC_SUPABASE_MARKET_ANON_KEY") or os.environ.get("SUPABASE_ANON_KEY", "")
-    if not anon_key:
-        raise ValueError("Set NEXT_PUBLIC_SUPABASE_MARKET_ANON_KEY (or SUPABASE_ANON_KEY)")
+    base_url, anon_key = _credentials()
 
     from_iso = to_iso = None
     if from_date or from_ts is not None:
@@ -101,54 +222,68 @@ def load_candles_ewo(
         ts = pd.Timestamp(to_date) if to_ts is None else pd.Timestamp(to_ts, unit="s")
         to_iso = ts.isoformat()
 
-    # When no date filter, fetch latest rows first (Supabase REST often caps limit at 1000)
-    if from_iso is None and to_iso is None:
-        rows = _fetch(
+    ohlcv = ["open", "high", "low", "close", "volume"]
+
+    def fetch(from_iso: str | None, to_iso: str | None) -> dict:
+        columns = _fetch_columns(
             base_url,
             anon_key,
             "market_candles_ewo",
             symbol=symbol,
             timeframe=timeframe,
+            numeric=ohlcv + ["ewo", "sma_5", "sma_35"],
+            text=["timestamp"],
+            from_iso=from_iso,
+            to_iso=to_iso,
             order_col="timestamp",
-            order_asc=False,
-            limit=1000,
         )
-        if rows:
-            rows = list(reversed(rows))
+        if columns:
+            # int64 nanoseconds the cache orders and filters rows by
+            columns["time"] = pd.to_datetime(columns["timestamp"], utc=True).as_unit("ns").asi8
+        return columns
+
+    if cache is None:
+        columns = fetch(from_iso, to_iso)
     else:
-        rows = _fetch(
-            base_url,
-            anon_key,
+        columns = cache.load(
             "market_candles_ewo",
-            symbol=symbol,
-            timeframe=timeframe,
-            from_iso=from_iso,
-            to_iso=to_iso,
-            order_col="timestamp",
+            symbol,
+            timeframe,
+            lambda since: fetch(None if since is None else pd.Timestamp(since, tz="UTC").isoformat(), None),
+            key="time",
+        )
+        columns = _between(
+            columns,
+            "time",
+            None if from_iso is None else pd.Timestamp(from_iso, tz="UTC").value,
+            None if to_iso is None else pd.Timestamp(to_iso, tz="UTC").value,
         )
-    if not rows:
+    if not columns:
         return pd.DataFrame(), None, None, None, None
 
-    ohlcv = ["open", "high", "low", "close", "volume"]
     for c in ohlcv:
-        if c not in rows[0]:
+        if c not in columns:
             raise ValueError(f"market_candles_ewo missing column: {c}")
 
     # Raw timestamp strings from API (same format as wave_engine_state); rows are order timestamp.asc, df keeps that order
-    timestamp_str_list = [str(r.get("timestamp") or "") for r in rows]
+    timestamp_str_list = [t or "" for t in columns["timestamp"].tolist()]
 
-    df = pd.DataFrame(rows)
-    df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
-    df = df.set_index("timestamp").sort_index()
-    df = df[ohlcv].copy()
+    # the index comes from the parsed times, in the resolution parsing the strings gives
+    unit = pd.to_datetime(columns["timestamp"][:1], utc=True).unit
+    index = pd.DatetimeIndex(columns["time"].view("datetime64[ns]"), name="timestamp").tz_localize("UTC")
+    df = pd.DataFrame({c: columns[c] for c in ohlcv}, index=index.as_unit(unit))
+    df = df.sort_index()
 
     def _float_list(key: str) -> list[float | None] | None:
-        if key not in rows[0]:
+        values = columns.get(key)
+        if values is None:
             return None
-        raw = [r.get(key) for r in rows]
-        if all(v is None for v in raw):
+        missing = np.isnan(values)
+        if missing.all():
             return None
-        return [float(v) if v is not None else None for v in raw]
+        values = values.astype(object)
+        values[missing] = None
+        return values.tolist()
 
     ewo_list = _float_list("ewo")
     sma5_list = _float_list("sma_5")
@@ -165,38 +300,76 @@ def load_candles(
     to_date: str | None = None,
     from_ts: int | None = None,
     to_ts: int | None = None,
+    cache: "CandleCache | None" = None,
 ) -> "pd.DataFrame":
     """
     Load OHLCV from market.market_candles (no EWO).
 
     Returns DataFrame with datetime index and ohlcv columns, ready for smc.
+    With a CandleCache only the bars from the last cached one on are fetched.
     """
     import pandas as pd
 
-    base_url = os.environ.get("NEXT_PUBLIC_SUPABASE_MARKET_URL") or os.environ.get("SUPABASE_URL", "http://127.0.0.1:54321")
-    anon_key = os.environ.get("NEXT_PUBLIC_SUPABASE_MARKET_ANON_KEY") or os.environ.get("SUPABASE_ANON_KEY", "")
-    if not anon_key:
-        raise ValueError("Set NEXT_PUBLIC_SUPABASE_MARKET_ANON_KEY (or SUPABASE_ANON_KEY)")
+    base_url, anon_key = _credentials()
 
     if from_date and from_ts is None:
         from_ts = int(pd.Timestamp(from_date).timestamp())
     if to_date and to_ts is None:
         to_ts = int(pd.Timestamp(to_date).timestamp() + 86400)
 
-    rows = _fetch(
-        base_url, anon_key, "market_candles",
-        symbol=symbol, timeframe=timeframe, from_ts=from_ts, to_ts=to_ts,
-    )
-    if not rows:
+    ohlcv = ["open", "high", "low", "close", "volume"]
+
+    def fetch(from_ts: int | None, to_ts: int | None) -> dict:
+        columns = _fetch_columns(
+            base_url, anon_key, "market_candles",
+            symbol=symbol, timeframe=timeframe, numeric=["timestamp_utc"] + ohlcv, from_ts=from_ts, to_ts=to_ts,
+        )
+        if columns:
+            columns["timestamp_utc"] = columns["timestamp_utc"].astype("int64")
+        return columns
+
+    if cache is None:
+        columns = fetch(from_ts, to_ts)
+    else:
+        columns = cache.load("market_candles", symbol, timeframe, lambda since: fetch(since, None), key="timestamp_utc")
+        columns = _between(columns, "timestamp_utc", from_ts, to_ts)
+    if not columns:
         return pd.DataFrame()
 
-    df = pd.DataFrame(rows)
-    df = df.rename(columns={"timestamp_utc": "time"})
-    df = df.set_index("time")
-    df.index = pd.to_datetime(df.index, unit="s")
-    df = df.sort_index()
-    ohlcv = ["open", "high", "low", "close", "volume"]
-    return df[[c for c in ohlcv if c in df.columns]].copy()
+    df = pd.DataFrame(
+        {c: columns[c] for c in ohlcv if c in columns},
+        index=pd.to_datetime(columns["timestamp_utc"], unit="s").rename("time"),
+    )
+    return df.sort_index()
+
+
+def _rest(path: str, payload=None, prefer: str | None = None):
+    """JSON response of a request to the REST API (a POST of payload if given), None if empty."""
+    base_url, anon_key = _credentials()
+    headers = {"apikey": anon_key, "Authorization": f"Bearer {anon_key}", "Accept": "application/json"}
+    data = None
+    if payload is not None:
+        data = json.dumps(payload).encode("utf-8")
+        headers["Content-Type"] = "application/json"
+    if prefer:
+        headers["Prefer"] = prefer
+    req = urllib.request.Request(
+        f"{base_url.rstrip('/')}/rest/v1/{path}",
+        data=data,
+        headers=headers,
+        method="GET" if payload is None else "POST",
+    )
+    with urllib.request.urlopen(req) as resp:
+        if resp.status not in (200, 201, 204):
+            raise RuntimeError(f"{path.split('?')[0]} request failed: {resp.status}")
+        body = resp.read()
+    return json.loads(body) if body else None
+
+
+def _updated_at() -> str:
+    from datetime import datetime, timezone
+
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
 
 
 def upsert_smc_results(
@@ -209,32 +382,54 @@ def upsert_smc_results(
     Upsert computed SMC + EWO result into public.smc_results (one row per symbol/timeframe).
     Uses POST with Prefer: resolution=merge-duplicates for upsert.
     """
-    base_url = os.environ.get("NEXT_PUBLIC_SUPABASE_MARKET_URL") or os.environ.get("SUPABASE_URL", "http://127.0.0.1:54321")
-    anon_key = os.environ.get("NEXT_PUBLIC_SUPABASE_MARKET_ANON_KEY") or os.environ.get("SUPABASE_ANON_KEY", "")
-    if not anon_key:
-        raise ValueError("Set NEXT_PUBLIC_SUPABASE_MARKET_ANON_KEY (or SUPABASE_ANON_KEY)")
-
-    from datetime import datetime, timezone
-    url = f"{base_url.rstrip('/')}/rest/v1/smc_results"
     payload = {
         "symbol": symbol,
         "timeframe": timeframe,
-        "updated_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+        "updated_at": _updated_at(),
         "meta": meta,
         "frames": frames,
     }
-    data = json.dumps(payload).encode("utf-8")
-    req = urllib.request.Request(
-        url,
-        data=data,
-        headers={
-            "apikey": anon_key,
-            "Authorization": f"Bearer {anon_key}",
-            "Content-Type": "application/json",
-            "Prefer": "resolution=merge-duplicates",
+    _rest("smc_results", payload, prefer="resolution=merge-duplicates")
+
+
+def fetch_smc_results_tail(symbol: str, timeframe: str) -> tuple[dict, dict] | None:
+    """
+    (meta, last frame) of the stored public.smc_results row, or None if there is none. Only
+    the meta and the one frame are transferred, not the frames list.
+    """
+    query = f"symbol=eq.{urllib.parse.quote(symbol)}&timeframe=eq.{urllib.parse.quote(timeframe)}&limit=1"
+    rows = _rest(f"smc_results?select=meta&{query}")
+    if not rows or not rows[0]["meta"] or not rows[0]["meta"].get("barCount"):
+        return None
+    meta = rows[0]["meta"]
+    rows = _rest(f"smc_results?select=last:frames->{int(meta['barCount']) - 1}&{query}")
+    if not rows or not rows[0]["last"]:
+        return None
+    return meta, rows[0]["last"]
+
+
+def append_smc_results(
+    symbol: str,
+    timeframe: str,
+    meta: dict,
+    frames: list[dict],
+    after: str,
+) -> dict:
+    """
+    Append frames to the stored public.smc_results row, keeping its last meta["barCount"]
+    frames (renumbered from 0), with the append_smc_frames function of
+    supabase/migrations. after is the timestamp of the stored last frame the new frames
+    follow; the function refuses the append if the row has changed since. Returns the
+    function's {"count", "last"} (frame count and last frame timestamp after the append).
+    """
+    return _rest(
+        "rpc/append_smc_frames",
+        {
+            "p_symbol": symbol,
+            "p_timeframe": timeframe,
+            "p_meta": meta,
+            "p_frames": frames,
+            "p_keep": meta["barCount"],
+            "p_after": after,
         },
-        method="POST",
     )
-    with urllib.request.urlopen(req) as resp:
-        if resp.status not in (200, 201, 204):
-            raise RuntimeError(f"smc_results upsert failed: {resp.status}")
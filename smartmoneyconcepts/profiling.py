@@ -0,0 +1,238 @@
+"""
+Opt-in timing of every smc indicator call.
+
+While a Profiler is active, each smc call records its wall time (validation included),
+the number of candles it got, the number of events in its result (rows with a non-zero
+value, or the records of sparse output) and, with allocations=True, the peak memory it
+allocated as traced by tracemalloc. The calls are aggregated per indicator:
+
+    from smartmoneyconcepts.profiling import profile
+
+    with profile() as profiler:
+        run_all_indicators(df)
+    print(profiler.summary())        # calls, p50/p99, bars/s per indicator
+    profiler.dump("smc_profile.json")
+
+Other code can add its own stages to the same stats with timed(name). Calls made in
+other processes (smc.batch, export_smc_frames --all-timeframes) are not recorded.
+
+Setting SMC_PROFILE=1 profiles the whole process from the import of smartmoneyconcepts
+on; SMC_PROFILE=path.json also dumps the stats there when the process exits. When no
+profiler is active an smc call only pays for one check of a global.
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from smartmoneyconcepts.smc import SMCContext, _get_profiler, _set_profiler
+
+
+def _bars(args) -> int | None:
+    for arg in args[:2]:
+        if isinstance(arg, (pd.DataFrame, SMCContext)):
+            return len(arg)
+    return None
+
+
+def _events(result) -> int | None:
+    """Rows of result with any non-zero value; every record of sparse output."""
+    if isinstance(result, np.recarray) or (isinstance(result, np.ndarray) and result.dtype.names):
+        return len(result)
+    if isinstance(result, pd.DataFrame):
+        try:
+            values = result.to_numpy(dtype=np.float64, na_value=np.nan)
+        except (TypeError, ValueError):
+            return None
+        return int(np.count_nonzero(((values != 0) & ~np.isnan(values)).any(axis=1)))
+    return None
+
+
+class _Stats:
+    def __init__(self, max_samples: int):
+        self.calls = 0
+        self.seconds = 0.0
+        self.bars = 0
+        self.events = 0
+        self.allocated = 0
+        self.max_allocated = 0
+        self.samples = deque(maxlen=max_samples)
+
+
+class Profiler:
+    """
+    Per indicator statistics of the smc calls made while it is active.
+
+    parameters:
+    allocations: bool - also trace the memory every call allocates with tracemalloc (slows the calls down)
+    max_samples: int - the percentiles are taken over the last max_samples calls of each indicator
+    """
+
+    def __init__(self, allocations: bool = False, max_samples: int = 10_000):
+        self.allocations = allocations
+        self.max_samples = max_samples
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._previous = None
+        self._started_tracemalloc = False
+
+    def start(self) -> "Profiler":
+        """Record the smc calls from now on (until stop)."""
+        if self.allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self._previous = _set_profiler(self)
+        return self
+
+    def stop(self) -> None:
+        """Stop recording, making the profiler that was active before start active again."""
+        _set_profiler(self._previous)
+        self._previous = None
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def __enter__(self) -> "Profiler":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def call(self, name: str, func, args, kwargs):
+        """Run func(*args, **kwargs) as the smc call name and record it."""
+        traced = self.allocations and tracemalloc.is_tracing()
+        if traced:
+            # peaks of nested calls are handed up, as each call resets the traced peak
+            stack = self._local.__dict__.setdefault("stack", [])
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            stack.append(before)
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            allocated = None
+            if traced:
+                peak = max(tracemalloc.get_traced_memory()[1], stack.pop())
+                allocated = peak - before
+                if stack:
+                    stack[-1] = max(stack[-1], peak)
+        self.record(name, seconds, _bars(args), _events(result), allocated)
+        return result
+
+    def record(self, name: str, seconds: float, bars=None, events=None, allocated=None) -> None:
+        """Add one call of name to the statistics (and to those of the profilers active before this one)."""
+        if self._previous is not None:
+            self._previous.record(name, seconds, bars, events, allocated)
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = _Stats(self.max_samples)
+            stats.calls += 1
+            stats.seconds += seconds
+            stats.bars += bars or 0
+            stats.events += events or 0
+            if allocated is not None:
+                stats.allocated += allocated
+                stats.max_allocated = max(stats.max_allocated, allocated)
+            stats.samples.append(seconds)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats = {}
+
+    def stats(self) -> dict:
+        """
+        {indicator: {calls, total_seconds, p50_seconds, p99_seconds, max_seconds, bars,
+        bars_per_second, events, allocated_mib (total), max_allocated_mib}}, slowest in total first.
+        """
+        with self._lock:
+            items = [(name, stats, np.array(stats.samples)) for name, stats in self._stats.items()]
+        out = {}
+        for name, stats, samples in sorted(items, key=lambda item: -item[1].seconds):
+            out[name] = {
+                "calls": stats.calls,
+                "total_seconds": stats.seconds,
+                "p50_seconds": float(np.percentile(samples, 50)),
+                "p99_seconds": float(np.percentile(samples, 99)),
+                "max_seconds": float(samples.max()),
+                "bars": stats.bars,
+                "bars_per_second": stats.bars / stats.seconds if stats.seconds else None,
+                "events": stats.events,
+                "allocated_mib": stats.allocated / 2**20 if self.allocations else None,
+                "max_allocated_mib": stats.max_allocated / 2**20 if self.allocations else None,
+            }
+        return out
+
+    def summary(self) -> str:
+        """The stats as a table."""
+        lines = [
+            f"{'indicator':<20} {'calls':>7} {'total s':>9} {'p50 ms':>9} {'p99 ms':>9} {'bars/s':>12} {'events':>9}"
+            + (f" {'max MiB':>8}" if self.allocations else "")
+        ]
+        for name, s in self.stats().items():
+            bars_per_second = f"{s['bars_per_second']:>12,.0f}" if s["bars_per_second"] else f"{'-':>12}"
+            lines.append(
+                f"{name:<20} {s['calls']:>7} {s['total_seconds']:>9.3f} {s['p50_seconds'] * 1e3:>9.3f}"
+                f" {s['p99_seconds'] * 1e3:>9.3f} {bars_per_second} {s['events']:>9}"
+                + (f" {s['max_allocated_mib']:>8.1f}" if self.allocations else "")
+            )
+        return "\n".join(lines)
+
+    def dump(self, path: str) -> None:
+        """Write the stats to path as JSON."""
+        with open(path, "w") as f:
+            json.dump(self.stats(), f, indent=1)
+
+
+@contextmanager
+def timed(name: str, bars: int | None = None) -> Iterator[None]:
+    """Record the with block as a call of name (e.g. a pipeline stage) if a profiler is active."""
+    profiler = _get_profiler()
+    if profiler is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.record(name, time.perf_counter() - start, bars)
+
+
+@contextmanager
+def profile(allocations: bool = False) -> Iterator[Profiler]:
+    """Profile the smc calls made inside the with block."""
+    with Profiler(allocations=allocations) as profiler:
+        yield profiler
+
+
+_process_profiler = None
+
+
+def enable(dump: str | None = None, allocations: bool = False) -> Profiler:
+    """
+    Profile every smc call of this process from now on and return the profiler; with dump
+    the stats are written to that path when the process exits. This is what SMC_PROFILE does.
+    """
+    global _process_profiler
+    if _process_profiler is None:
+        _process_profiler = Profiler(allocations=allocations).start()
+        if dump:
+            atexit.register(_process_profiler.dump, dump)
+    return _process_profiler
+
+
+def get_profiler() -> Profiler | None:
+    """The active Profiler, or None."""
+    return _get_profiler()
@@ -1,17 +1,350 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 from functools import wraps
+from importlib.util import find_spec
+from typing import NamedTuple
 import pandas as pd
 import numpy as np
 from pandas import DataFrame, Series
 from datetime import datetime
 
+BACKENDS = ("numba", "numpy")
+DTYPE_POLICIES = ("mixed", "float64", "float32")
+# the columns holding a candle index, floats with NaN where unset under the mixed dtype policy
+INDEX_COLUMNS = ("MitigatedIndex", "BrokenIndex", "End", "Swept")
+
+# numba is optional, the NumPy kernels below are always available; the compiled kernels
+# (and numba itself) are only imported when the numba backend first runs a kernel
+_numba_installed = find_spec("numba") is not None
+_numba_module = None
+
+_backend = os.getenv("SMC_BACKEND", "numba")
+if _backend not in BACKENDS or not _numba_installed:
+    _backend = "numpy"
+
+_dtype_policy = os.getenv("SMC_DTYPES", "mixed")
+if _dtype_policy not in DTYPE_POLICIES:
+    _dtype_policy = "mixed"
+# the policy of a dtype_policy block, per thread
+_local = threading.local()
+
+
+def _numba():
+    """The smartmoneyconcepts._numba_kernels module, imported on first use; None without numba."""
+    global _numba_module, _numba_installed
+    if _numba_module is None and _numba_installed:
+        try:
+            from smartmoneyconcepts import _numba_kernels as module
+        except ImportError:
+            _numba_installed = False
+        else:
+            _numba_module = module
+    return _numba_module
+
+
+def __getattr__(name):
+    if name == "_numba_kernels":
+        return _numba()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def set_backend(name: str) -> None:
+    """
+    Select the implementation of the per-candle loops used by every indicator.
+
+    parameters:
+    name: str - "numba" for the compiled kernels (requires numba) or "numpy" for the pure Python/NumPy ones.
+    The default is "numba" when it is installed; the SMC_BACKEND environment variable overrides it.
+    """
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend {name!r}, expected one of {BACKENDS}")
+    if name == "numba" and _numba() is None:
+        raise ImportError("The numba backend requires numba to be installed")
+    _backend = name
+
+
+def get_backend() -> str:
+    """Return the name of the active backend."""
+    return _backend
+
+
+def _check_dtype_policy(name: str) -> None:
+    if name not in DTYPE_POLICIES:
+        raise ValueError(f"Unknown dtype policy {name!r}, expected one of {DTYPE_POLICIES}")
+
+
+def set_dtype_policy(name: str) -> None:
+    """
+    Select the dtypes of the columns returned by every indicator.
+
+    parameters:
+    name: str - "mixed" for the dtypes the indicators always had (float32 prices in ob, liquidity, previous_high_low, sessions and the bos_choch Level, float64 elsewhere),
+    "float64" to compute and return every price in float64, or "float32" to return every float column as float32.
+    With "float64" and "float32" the index columns (MitigatedIndex, BrokenIndex, End, Swept) are nullable Int32 instead of floats with NaN, and int32 in sparse output.
+    The default is "mixed"; the SMC_DTYPES environment variable overrides it.
+    """
+    global _dtype_policy
+    _check_dtype_policy(name)
+    _dtype_policy = name
+
+
+def get_dtype_policy() -> str:
+    """Return the name of the active dtype policy."""
+    return getattr(_local, "dtype_policy", None) or _dtype_policy
+
+
+@contextmanager
+def dtype_policy(name: str):
+    """Use the dtype policy name for the smc calls made by this thread inside the with block."""
+    _check_dtype_policy(name)
+    previous = getattr(_local, "dtype_policy", None)
+    _local.dtype_policy = name
+    try:
+        yield
+    finally:
+        _local.dtype_policy = previous
+
+
+def _float_dtype():
+    """The dtype the kernels compute prices in: float32 unless the policy is float64."""
+    return np.float64 if get_dtype_policy() == "float64" else np.float32
+
+
+def _typed(columns: dict, nullable: bool = True) -> dict:
+    """
+    The output columns in the dtypes of the active policy: index columns as nullable Int32
+    (plain int32 with nullable False) and the other float columns as float64 or float32.
+    """
+    policy = get_dtype_policy()
+    if policy == "mixed":
+        return columns
+    float_dtype = np.float64 if policy == "float64" else np.float32
+    typed = {}
+    for name, values in columns.items():
+        if name in INDEX_COLUMNS:
+            typed[name] = pd.array(values, dtype="Int32") if nullable else values.astype(np.int32)
+        elif values.dtype.kind == "f":
+            typed[name] = values.astype(float_dtype, copy=False)
+        else:
+            typed[name] = values
+    return typed
+
+
+def _frame(columns: dict) -> DataFrame:
+    """The DataFrame of an indicator's output columns, in the dtypes of the active policy."""
+    return pd.concat([pd.Series(values, name=name) for name, values in _typed(columns).items()], axis=1)
+
+
+def _kernel(name: str):
+    """Return the kernel called name for the active backend."""
+    if _backend == "numba":
+        kernels = _numba()
+        if kernels is not None:
+            return getattr(kernels, name)
+    return globals()[name]
+
+
+class SMCContext:
+    """
+    Candles validated and normalized once, to be shared by several indicator calls.
+
+    Every smc indicator accepts an SMCContext in place of the ohlc DataFrame. The columns are
+    looked up case-insensitively once and held as contiguous float64 arrays, so the calls no
+    longer rename or copy the frame, and the arrays that several indicators derive from the
+    same candles (swing candidates, session minutes, resampled periods) are computed once.
+
+    parameters:
+    ohlc: DataFrame - the candles with open, high, low, close and optionally volume columns
+    """
+
+    def __init__(self, ohlc: DataFrame):
+        names = {c.lower(): c for c in ohlc.columns}
+        self.index = ohlc.index
+        self.columns = pd.Index([c for c in ("open", "high", "low", "close", "volume") if c in names])
+        self._arrays = {
+            c: np.ascontiguousarray(ohlc[names[c]].to_numpy(dtype=np.float64)) for c in self.columns
+        }
+        self._series = {}
+        self._cache = {}
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __getitem__(self, column: str) -> Series:
+        if column not in self._series:
+            self._series[column] = pd.Series(self._arrays[column], name=column, copy=False)
+        return self._series[column]
+
+    def cached(self, key, compute):
+        """Return compute(), computed only the first time key is asked for."""
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+
+class MemoInfo(NamedTuple):
+    hits: int
+    misses: int
+    entries: int
+    nbytes: int
+    max_bytes: int
+
+
+def _nbytes(value) -> int:
+    if isinstance(value, (np.ndarray, pd.Index)):
+        return value.nbytes
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage().sum())
+    if isinstance(value, tuple):
+        return sum(_nbytes(v) for v in value)
+    return 0
+
+
+def _read_only(value):
+    """value with its arrays made read-only, as it is handed to every caller with the same candles."""
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    elif isinstance(value, tuple):
+        for v in value:
+            _read_only(v)
+    return value
+
+
+class _Memo:
+    """
+    Least recently used cache of the arrays derived from DataFrame candles, keyed by a hash
+    of the candle columns they are computed from, holding at most max_bytes.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        value = _read_only(compute())
+        size = _nbytes(value)
+        with self._lock:
+            if key not in self._entries and size <= self.max_bytes:
+                self._entries[key] = (value, size)
+                self.nbytes += size
+                while self.nbytes > self.max_bytes:
+                    _, (_, evicted) = self._entries.popitem(last=False)
+                    self.nbytes -= evicted
+        return value
+
+    def resize(self, max_bytes: int) -> None:
+        with self._lock:
+            self.max_bytes = max_bytes
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.nbytes -= evicted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def info(self) -> MemoInfo:
+        with self._lock:
+            return MemoInfo(self.hits, self.misses, len(self._entries), self.nbytes, self.max_bytes)
+
+
+_memo = _Memo(int(float(os.getenv("SMC_MEMO_MB", "256")) * 2**20))
+
+
+def memo_info() -> MemoInfo:
+    """Hits, misses, entries and size in bytes of the memo of arrays derived from DataFrame candles."""
+    return _memo.info()
+
+
+def memo_clear() -> None:
+    """Empty the memo and reset its counters."""
+    _memo.clear()
+
+
+def set_memo_size(max_bytes: int) -> None:
+    """
+    Bound the memo to max_bytes, evicting the least recently used arrays; 0 turns it off.
+    The default is 256 MB; the SMC_MEMO_MB environment variable overrides it.
+    """
+    _memo.resize(max_bytes)
+
+
+def _fingerprint(ohlc: DataFrame, columns) -> bytes:
+    """Hash of the length and the given columns ("index" for the index) of the candles."""
+    digest = hashlib.sha256(str(len(ohlc)).encode())
+    for column in columns:
+        if column == "index":
+            index = ohlc.index
+            values = index.asi8 if isinstance(index, pd.DatetimeIndex) else pd.util.hash_array(index.to_numpy())
+            digest.update(str(index.dtype).encode())
+        else:
+            values = ohlc[column].to_numpy(dtype=np.float64)
+        digest.update(column.encode())
+        digest.update(np.ascontiguousarray(values))
+    return digest.digest()
+
+
+def _shared(ohlc, key, compute, columns=()):
+    """
+    compute(), cached on ohlc when it is an SMCContext, otherwise in the memo under a hash of
+    the columns it is computed from (not cached without columns).
+    """
+    if isinstance(ohlc, SMCContext):
+        return ohlc.cached(key, compute)
+    if not columns or _memo.max_bytes <= 0:
+        return compute()
+    return _memo.get((_fingerprint(ohlc, columns), key), compute)
+
+
+# the active smartmoneyconcepts.profiling.Profiler, None when profiling is off
+_profiler = None
+
+
+def _set_profiler(profiler):
+    """Make profiler record every smc call (None stops recording); returns the previous one."""
+    global _profiler
+    previous, _profiler = _profiler, profiler
+    return previous
+
+
+def _get_profiler():
+    return _profiler
+
+
 def inputvalidator(input_="ohlc"):
     def dfcheck(func):
         @wraps(func)
         def wrap(*args, **kwargs):
+            if _profiler is None:
+                return validated(*args, **kwargs)
+            return _profiler.call(func.__name__, validated, args, kwargs)
+
+        def validated(*args, **kwargs):
             args = list(args)
-            i = 0 if isinstance(args[0], pd.DataFrame) else 1
+            i = 0 if isinstance(args[0], (pd.DataFrame, SMCContext)) else 1
 
-            args[i] = args[i].rename(columns={c: c.lower() for c in args[i].columns})
+            if not isinstance(args[i], SMCContext):
+                lower = {c: c.lower() for c in args[i].columns}
+                if any(c != name for c, name in lower.items()):
+                    args[i] = args[i].rename(columns=lower)
 
             inputs = {
                 "o": "open",
@@ -37,10 +370,10 @@ def inputvalidator(input_="ohlc"):
     return dfcheck
 
 
-def apply(decorator):
+def apply(decorator, exclude=()):
     def decorate(cls):
         for attr in cls.__dict__:
-            if callable(getattr(cls, attr)):
+            if callable(getattr(cls, attr)) and attr not in exclude:
                 setattr(cls, attr, decorator(getattr(cls, attr)))
 
         return cls
@@ -48,12 +381,631 @@ def apply(decorator):
     return decorate
 
 
-@apply(inputvalidator(input_="ohlc"))
+def _swing_candidates(ohlc: DataFrame, swing_length: int) -> np.ndarray:
+    """Unfiltered swing pivots: 1 for a candidate high, -1 for a candidate low, NaN otherwise."""
+    swing_length *= 2
+    # set the highs to 1 if the current high is the highest high in the last 5 candles and next 5 candles
+    return np.where(
+        ohlc["high"]
+        == ohlc["high"].shift(-(swing_length // 2)).rolling(swing_length).max(),
+        1,
+        np.where(
+            ohlc["low"]
+            == ohlc["low"].shift(-(swing_length // 2)).rolling(swing_length).min(),
+            -1,
+            np.nan,
+        ),
+    )
+
+
+def _candidates(ohlc, swing_length: int) -> np.ndarray:
+    """_swing_candidates, shared between the calls on the same candles."""
+    return _shared(
+        ohlc, ("swing_candidates", swing_length), lambda: _swing_candidates(ohlc, swing_length), ("high", "low")
+    )
+
+
+def _swings(ohlc, swing_length: int) -> tuple:
+    """The HighLow and Level arrays of smc.swing_highs_lows."""
+    candidates = _candidates(ohlc, swing_length)
+
+    # consecutive highs (or lows) are reduced to the highest high (or lowest low) in one pass
+    positions = np.flatnonzero(~np.isnan(candidates))
+    kept = positions[
+        _reduce_swings(
+            candidates[positions],
+            ohlc["high"].values[positions],
+            ohlc["low"].values[positions],
+        )
+    ]
+    swing_highs_lows = np.full(len(candidates), np.nan)
+    swing_highs_lows[kept] = candidates[kept]
+
+    positions = np.where(~np.isnan(swing_highs_lows))[0]
+
+    if len(positions) > 0:
+        if swing_highs_lows[positions[0]] == 1:
+            swing_highs_lows[0] = -1
+        if swing_highs_lows[positions[0]] == -1:
+            swing_highs_lows[0] = 1
+        if swing_highs_lows[positions[-1]] == -1:
+            swing_highs_lows[-1] = 1
+        if swing_highs_lows[positions[-1]] == 1:
+            swing_highs_lows[-1] = -1
+
+    level = np.where(
+        ~np.isnan(swing_highs_lows),
+        np.where(swing_highs_lows == 1, ohlc["high"], ohlc["low"]),
+        np.nan,
+    )
+    return swing_highs_lows, level
+
+
+def _reduce_swings(kinds: np.ndarray, highs: np.ndarray, lows: np.ndarray) -> np.ndarray:
+    """
+    Indices of the candidates kept when every run of consecutive same-side candidates is reduced
+    to one pivot: the first highest high of a run of highs and the first lowest low of a run of lows.
+    kinds, highs and lows describe the candidates in candle order.
+    """
+    if not len(kinds):
+        return np.empty(0, dtype=np.int64)
+    # lows are negated so that both sides keep their maximum
+    value = np.where(kinds == 1, highs, -lows)
+    new_run = np.diff(kinds, prepend=np.nan) != 0
+    run = np.cumsum(new_run) - 1
+    best = np.flatnonzero(value == np.maximum.reduceat(value, np.flatnonzero(new_run))[run])
+    # the first best candidate of every run
+    return best[np.diff(run[best], prepend=-1) != 0]
+
+
+def _fvg_join_kernel(fvg, top, bottom):
+    """Merge runs of same-direction gaps into their last bar, in place."""
+    for i in range(len(fvg) - 1):
+        if fvg[i] == fvg[i + 1]:
+            top[i + 1] = max(top[i], top[i + 1])
+            bottom[i + 1] = min(bottom[i], bottom[i + 1])
+            fvg[i] = top[i] = bottom[i] = np.nan
+
+
+_CROSSING_COMPARE = {
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+}
+
+
+def _crossing_table(values: np.ndarray, side: str) -> list:
+    """
+    Sparse table for _first_crossing: level k holds the max (for ">", ">=") or min (for "<", "<=")
+    of every block of 2**k candles, ignoring NaN.
+    """
+    op = np.fmax if side in (">", ">=") else np.fmin
+    table = [np.asarray(values, dtype=np.float64)]
+    width = 1
+    while 2 * width <= len(values):
+        previous = table[-1]
+        table.append(op(previous[:-width], previous[width:]))
+        width *= 2
+    return table
+
+
+def _first_crossing(table: list, starts: np.ndarray, levels: np.ndarray, side: str) -> np.ndarray:
+    """
+    For every start, the index of the first candle at or after it whose value is side of its level,
+    len(values) if there is none. All queries are answered together in O(log n) steps.
+    """
+    compare = _CROSSING_COMPARE[side]
+    n = len(table[0])
+    position = np.asarray(starts, dtype=np.int64).copy()
+    levels = np.asarray(levels, dtype=np.float64)
+    # skip the largest blocks that contain no crossing, halving the block size every step
+    for k in range(len(table) - 1, -1, -1):
+        width = 1 << k
+        query = np.flatnonzero(position + width <= n)
+        no_cross = ~compare(table[k][position[query]], levels[query])
+        position[query[no_cross]] += width
+    return np.minimum(position, n)
+
+
+def _fvg_mitigation_kernel(fvg, top, bottom, _high, _low):
+    """Index of the first candle that trades back into each gap, 0 if none."""
+    n = len(fvg)
+    mitigated_index = np.zeros(n, dtype=np.int32)
+    bullish = np.flatnonzero(fvg == 1)
+    bearish = np.flatnonzero(fvg == -1)
+    if len(bullish):
+        j = _first_crossing(_crossing_table(_low, "<="), bullish + 2, top[bullish], "<=")
+        mitigated_index[bullish] = np.where(j < n, j, 0)
+    if len(bearish):
+        j = _first_crossing(_crossing_table(_high, ">="), bearish + 2, bottom[bearish], ">=")
+        mitigated_index[bearish] = np.where(j < n, j, 0)
+    return mitigated_index
+
+
+def _bos_choch_kernel(swing_hl, swing_level, _high, _low, _close, close_break, dtype):
+    """
+    BOS/CHoCH detection over plain arrays, with the level in dtype; see smc.bos_choch for the
+    meaning of the outputs.
+    """
+    n = len(swing_hl)
+    bos = np.zeros(n, dtype=np.int32)
+    choch = np.zeros(n, dtype=np.int32)
+    level = np.zeros(n, dtype=dtype)
+    broken = np.zeros(n, dtype=np.int32)
+
+    # every run of four consecutive swings decides the bos/choch of its second swing
+    positions = np.flatnonzero(~np.isnan(swing_hl))
+    if len(positions) >= 4:
+        kinds = swing_hl[positions]
+        levels = swing_level[positions]
+        h4, h3, h2, h1 = kinds[:-3], kinds[1:-2], kinds[2:-1], kinds[3:]
+        l4, l3, l2, l1 = levels[:-3], levels[1:-2], levels[2:-1], levels[3:]
+        bullish = (h4 == -1) & (h3 == 1) & (h2 == -1) & (h1 == 1)
+        bearish = (h4 == 1) & (h3 == -1) & (h2 == 1) & (h1 == -1)
+        target = positions[1:-2]
+        bos_target = np.where(bullish & (l4 < l2) & (l2 < l3) & (l3 < l1), 1, 0)
+        bos_target = np.where(bearish & (l4 > l2) & (l2 > l3) & (l3 > l1), -1, bos_target)
+        choch_target = np.where(bullish & (l1 > l3) & (l3 > l4) & (l4 > l2), 1, 0)
+        choch_target = np.where(bearish & (l1 < l3) & (l3 < l4) & (l4 < l2), -1, choch_target)
+        bos[target] = bos_target
+        choch[target] = choch_target
+        level[target] = np.where((bos_target != 0) | (choch_target != 0), l3, 0)
+
+    detected = np.flatnonzero((bos != 0) | (choch != 0))
+    if len(detected):
+        # if the bos is 1 then check if the candles high has gone above the level
+        # if the bos is -1 then check if the candles low has gone below the level
+        up = (bos[detected] == 1) | (choch[detected] == 1)
+        for side, selected, values in (
+            (">", up, _close if close_break else _high),
+            ("<", ~up, _close if close_break else _low),
+        ):
+            i = detected[selected]
+            if len(i):
+                j = _first_crossing(_crossing_table(values, side), i + 2, level[i], side)
+                broken[i] = np.where(j < n, j, 0)
+
+        # if there are any unbroken bos or choch that started before a broken one and ended after it then remove them
+        broken_at = np.where(broken[detected] != 0, broken[detected], n)
+        first_later_break = np.append(np.minimum.accumulate(broken_at[::-1])[::-1][1:], n)
+        removed = detected[broken[detected] >= first_later_break]
+        bos[removed] = 0
+        choch[removed] = 0
+        level[removed] = 0
+
+    # remove the ones that aren't broken
+    unbroken = ((bos != 0) | (choch != 0)) & (broken == 0)
+    bos[unbroken] = 0
+    choch[unbroken] = 0
+    level[unbroken] = 0
+
+    return bos, choch, level, broken
+
+
+def _ob_blocks(side, _high, _low, _close, _volume, swing_hl, dtype):
+    """
+    The bullish (side 1) or bearish (side -1) order blocks: for each one the candle that
+    creates it by closing beyond the last swing high (low), its block candle, top, bottom,
+    volume and percentage. The top, bottom, volume and percentage are in dtype like the columns.
+    """
+    n = len(_close)
+    swings = np.flatnonzero(swing_hl == side)
+    # a swing is the last one before every candle up to and including the next swing
+    last = np.append(swings[1:], n - 1)
+    if side == 1:
+        created = _first_crossing(_crossing_table(_close, ">"), swings + 1, _high[swings], ">")
+    else:
+        created = _first_crossing(_crossing_table(_close, "<"), swings + 1, _low[swings], "<")
+    crossed = created <= last
+    swings, created = swings[crossed], created[crossed]
+
+    # the block is the candle with the lowest low (highest high for bearish blocks) between the
+    # swing and the crossing candle, the last one on ties; the candle before the crossing one
+    # when there are none in between or one of them is NaN
+    index = created - 1
+    default = np.ones(len(created), dtype=bool)
+    values, reduce, extreme = (_low, np.minimum, "<=") if side == 1 else (_high, np.maximum, ">=")
+    between = np.flatnonzero(created - swings > 1)
+    if len(between):
+        bounds = np.column_stack([swings[between] + 1, created[between]]).ravel()
+        level = reduce.reduceat(values, bounds)[::2]
+        found = ~np.isnan(level)
+        # the last candle at the extreme is the first one going backwards from the crossing candle
+        last_at = _first_crossing(
+            _crossing_table(values[::-1], extreme), n - created[between][found], level[found], extreme
+        )
+        index[between[found]] = n - 1 - last_at
+        default[between[found]] = False
+    top = _high[index].astype(dtype)
+    bottom = _low[index].astype(dtype)
+    if side == 1:
+        # without a lower low in between the bullish block keeps the previous candle's low as
+        # its top and high as its bottom
+        top[default], bottom[default] = _low[index[default]], _high[index[default]]
+
+    current = _volume[created] + _volume[created - 1]
+    previous = np.where(created >= 2, _volume[np.maximum(created - 2, 0)], 0)
+    volume = (current + previous).astype(dtype)
+    current, previous = current.astype(dtype), previous.astype(dtype)
+    high_volume, low_volume = (current, previous) if side == 1 else (previous, current)
+    max_volume = np.where(low_volume > high_volume, low_volume, high_volume)
+    min_volume = np.where(low_volume < high_volume, low_volume, high_volume)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percentage = np.where(max_volume != 0, min_volume / max_volume * dtype(100.0), dtype(100.0))
+    return created, index, top, bottom, volume, percentage
+
+
+def _ob_kernel(_open, _high, _low, _close, _volume, swing_hl, close_mitigation, dtype):
+    """
+    Order block scan over plain arrays, with the prices, volumes and percentages in dtype;
+    see smc.ob for the meaning of the outputs.
+    """
+    ohlc_len = len(_close)
+
+    ob = np.zeros(ohlc_len, dtype=np.int32)
+    top_arr = np.zeros(ohlc_len, dtype=dtype)
+    bottom_arr = np.zeros(ohlc_len, dtype=dtype)
+    obVolume = np.zeros(ohlc_len, dtype=dtype)
+    percentage = np.zeros(ohlc_len, dtype=dtype)
+    mitigated_index = np.zeros(ohlc_len, dtype=np.int32)
+    breaker = np.full(ohlc_len, False, dtype=bool)
+
+    def reset(index):
+        for column in (ob, top_arr, bottom_arr, obVolume, mitigated_index, percentage):
+            column[index] = 0
+
+    # Each block is only ever compared against the candles after the one that created it, so
+    # instead of checking every active block on every candle, the candle that mitigates it
+    # (turning it into a breaker block) and the one that then breaks it (resetting it) are
+    # found for all blocks together by binary search over sparse min/max tables of the prices.
+    if close_mitigation:
+        mitigation_low = np.where(_close < _open, _close, _open)
+        mitigation_high = np.where(_close > _open, _close, _open)
+    else:
+        mitigation_low, mitigation_high = _low, _high
+    below = _crossing_table(mitigation_low, "<")
+    above = _crossing_table(mitigation_high, ">")
+    below_low = below if not close_mitigation else _crossing_table(_low, "<")
+    above_high = above if not close_mitigation else _crossing_table(_high, ">")
+
+    # bullish order blocks: mitigated when price trades below the bottom, reset above the top
+    created, index, top, bottom, volume, pct = _ob_blocks(1, _high, _low, _close, _volume, swing_hl, dtype)
+    mitigated = _first_crossing(below, created + 1, bottom, "<")
+    broken = _first_crossing(above_high, mitigated + 1, top, ">")
+    ob[index] = 1
+    top_arr[index] = top
+    bottom_arr[index] = bottom
+    obVolume[index] = volume
+    percentage[index] = pct
+    mitigated_index[index] = np.where(mitigated < ohlc_len, mitigated - 1, 0)
+    breaker[index] = mitigated < ohlc_len
+    reset(index[broken < ohlc_len])
+
+    # bearish order blocks, mitigated above the top and reset below the bottom. They are laid
+    # over the bullish ones: a candle that is both keeps the bullish breaker state and
+    # mitigated index, as when the bearish blocks were scanned after the bullish ones
+    created, index, top, bottom, volume, pct = _ob_blocks(-1, _high, _low, _close, _volume, swing_hl, dtype)
+    ob[index] = -1
+    top_arr[index] = top
+    bottom_arr[index] = bottom
+    obVolume[index] = volume
+    percentage[index] = pct
+    was_breaker = breaker[index]
+    mitigated = np.where(was_breaker, created, _first_crossing(above, created + 1, top, ">"))
+    newly = ~was_breaker & (mitigated < ohlc_len)
+    mitigated_index[index[newly]] = mitigated[newly]
+    broken = _first_crossing(below_low, mitigated + 1, bottom, "<")
+    reset(index[broken < ohlc_len])
+
+    return ob, top_arr, bottom_arr, obVolume, mitigated_index, percentage
+
+
+def _events(columns: dict) -> np.recarray:
+    """
+    Rows of the columns where any of them is set (not NaN), as a record array with the
+    candle position in "index" and one field per column.
+    """
+    mask = np.zeros(len(next(iter(columns.values()))), dtype=bool)
+    for values in columns.values():
+        mask |= ~np.isnan(values)
+    index = np.flatnonzero(mask)
+    # the index columns are set on every row that has an event
+    columns = _typed({name: values[index] for name, values in columns.items()}, nullable=False)
+    events = np.recarray(
+        len(index), dtype=[("index", np.int64)] + [(name, values.dtype) for name, values in columns.items()]
+    )
+    events["index"] = index
+    for name, values in columns.items():
+        events[name] = values
+    return events
+
+
+def _ob_arrays(_open, _high, _low, _close, _volume, swing_hl, close_mitigation, dtype):
+    """Order blocks over plain arrays with NaN where no block was found."""
+    ob, top_arr, bottom_arr, obVolume, mitigated_index, percentage = _kernel("_ob_kernel")(
+        _open, _high, _low, _close, _volume, swing_hl, close_mitigation, dtype
+    )
+
+    # Convert zeros to NaN where OB was not set
+    ob = np.where(ob != 0, ob, np.nan)
+    top_arr = np.where(~np.isnan(ob), top_arr, np.nan)
+    bottom_arr = np.where(~np.isnan(ob), bottom_arr, np.nan)
+    obVolume = np.where(~np.isnan(ob), obVolume, np.nan)
+    mitigated_index = np.where(~np.isnan(ob), mitigated_index, np.nan)
+    percentage = np.where(~np.isnan(ob), percentage, np.nan)
+
+    return ob, top_arr, bottom_arr, obVolume, mitigated_index, percentage
+
+
+def _liquidity_kernel(ohlc_high, ohlc_low, shl_HL, shl_Level, pip_range, dtype):
+    """Liquidity grouping over plain arrays, in dtype; see smc.liquidity for the meaning of the outputs."""
+    n = len(ohlc_high)
+
+    # Initialise output arrays with NaN (to match later replacement of zeros).
+    liquidity = np.full(n, np.nan, dtype=dtype)
+    liquidity_level = np.full(n, np.nan, dtype=dtype)
+    liquidity_end = np.full(n, np.nan, dtype=dtype)
+    liquidity_swept = np.full(n, np.nan, dtype=dtype)
+
+    # bullish liquidity (HighLow == 1) is swept by a high above the range, bearish by a low below it
+    for side, values, compare in ((1, ohlc_high, ">="), (-1, ohlc_low, "<=")):
+        indices = np.flatnonzero(shl_HL == side)
+        if not len(indices):
+            continue
+        levels = shl_Level[indices]
+        range_low = levels - pip_range
+        range_high = levels + pip_range
+
+        # the swept index is the first candle after the candidate that trades through its range
+        swept = _first_crossing(
+            _crossing_table(values, compare),
+            indices + 1,
+            range_high if side == 1 else range_low,
+            compare,
+        )
+        swept = np.where(swept < n, swept, 0)
+        # only candidates before the sweep can join the group
+        limit = np.where(swept > 0, np.searchsorted(indices, swept), len(indices))
+
+        # the candidates within a range are a contiguous block of the candidates sorted by level
+        by_level = np.argsort(levels, kind="stable")
+        sorted_levels = levels[by_level]
+        band_start = np.searchsorted(sorted_levels, range_low, side="left")
+        band_end = np.searchsorted(sorted_levels, range_high, side="right")
+
+        used = np.zeros(len(indices), dtype=bool)
+        for c in range(len(indices)):
+            # Skip if this candidate has already been used.
+            if used[c]:
+                continue
+            # look at whichever is shorter: the candidates up to the sweep or the ones in the range
+            if limit[c] - c - 1 <= band_end[c] - band_start[c]:
+                members = np.arange(c + 1, limit[c])
+            else:
+                members = by_level[band_start[c] : band_end[c]]
+                members = np.sort(members[(members > c) & (members < limit[c])])
+            members = members[
+                ~used[members]
+                & (range_low[c] <= levels[members])
+                & (levels[members] <= range_high[c])
+            ]
+            # Only record liquidity if more than one candidate is grouped.
+            if not len(members):
+                continue
+            used[members] = True
+            i = indices[c]
+            group_levels = np.concatenate([[levels[c]], levels[members]])
+            liquidity[i] = side
+            liquidity_level[i] = np.cumsum(group_levels)[-1] / len(group_levels)
+            liquidity_end[i] = indices[members[-1]]
+            liquidity_swept[i] = swept[c]
+
+    return liquidity, liquidity_level, liquidity_end, liquidity_swept
+
+
+def _day_starts(index: pd.DatetimeIndex) -> np.ndarray:
+    """Whether each candle of the sorted index is the first of its (local) day."""
+    tick = pd.Timedelta(1, unit=index.unit).value
+    day = pd.Timedelta(days=1).value // tick
+    wall = index.tz_localize(None) if index.tz is not None else index
+    days = wall.asi8 // day
+    return np.diff(days, prepend=days[0] - 1) != 0
+
+
+def _period_labels(index: pd.DatetimeIndex, offset, day_starts=None) -> np.ndarray:
+    """
+    The label resample gives the offset period of every candle of the sorted index, as
+    index.asi8 gives the times (UTC for candles with a time zone).
+
+    parameters:
+    day_starts: np.ndarray - _day_starts(index), for the calendar offsets
+    """
+    times = index.asi8
+    tick = pd.Timedelta(1, unit=index.unit).value
+    if isinstance(offset, pd.offsets.Tick) and index.tz is None and offset.nanos % tick == 0:
+        # periods of a fixed length from midnight of the first day
+        day, step = pd.Timedelta(days=1).value // tick, offset.nanos // tick
+        origin = times[0] // day * day
+        return origin + (times - origin) // step * step
+    if isinstance(offset, pd.offsets.Tick):
+        # with a time zone the periods start at its midnight: resample every candle
+        points, point_of = index, np.arange(len(index))
+    else:
+        # calendar offsets put every candle of a day in the same period: resample the first candle of each day
+        if day_starts is None:
+            day_starts = _day_starts(index)
+        points, point_of = index[day_starts], np.cumsum(day_starts) - 1
+    first = pd.Series(np.arange(len(points)), index=points).resample(offset).first().dropna()
+    period = np.searchsorted(first.to_numpy(dtype=np.int64), np.arange(len(points)), side="right") - 1
+    return first.index.asi8[period][point_of]
+
+
+def _segmented_any(flags: np.ndarray, new_segment: np.ndarray) -> np.ndarray:
+    """Whether a flag is set at or before each element since the start of its segment (new_segment[0] must be set)."""
+    counts = np.cumsum(flags)
+    # the count before the start of the segment, carried over the segment
+    before = np.maximum.accumulate(np.where(new_segment, counts - flags, 0))
+    return counts > before
+
+
+_DEFAULT_SESSIONS = {
+    "Asia": {
+        "start": "01:00",
+        "end": "07:00",
+    },
+    "London": {
+        "start": "07:00",
+        "end": "13:00",
+    },
+    "NYAM": {
+        "start": "13:00",
+        "end": "19:00",
+    },
+    "NYPM": {
+        "start": "19:00",
+        "end": "01:00",
+    },
+    # "Sydney": {"start": "21:00", "end": "06:00"},
+    # "Tokyo": {"start": "00:00", "end": "09:00"},
+    # "New York": {"start": "13:00", "end": "22:00"},
+    # "Asian kill zone": {"start": "00:00", "end": "04:00"},
+    # "London open kill zone": {"start": "6:00", "end": "9:00"},
+    # "New York kill zone": {"start": "11:00", "end": "14:00"},
+    # "london close kill zone": {"start": "14:00", "end": "16:00"},
+}
+
+
+def _session_minutes(index, time_zone: str) -> np.ndarray:
+    """Minute of the day (UTC) of every candle."""
+    index = pd.to_datetime(index)
+    if time_zone != "UTC":
+        time_zone = time_zone.replace("GMT", "Etc/GMT")
+        time_zone = time_zone.replace("UTC", "Etc/GMT")
+        index = index.tz_localize(time_zone).tz_convert("UTC")
+    return np.asarray(index.hour * 60 + index.minute, dtype=np.int64)
+
+
+def _session_bounds(start_time: str, end_time: str):
+    """Start and end of a session as minutes of the day."""
+    start = datetime.strptime(start_time, "%H:%M")
+    end = datetime.strptime(end_time, "%H:%M")
+    return start.hour * 60 + start.minute, end.hour * 60 + end.minute
+
+
+def _sessions_kernel(minutes, start, end, _high, _low, dtype):
+    """Session membership and running high/low (in dtype) from each candle's minute of the day."""
+    if start < end:
+        active = (minutes >= start) & (minutes <= end)
+    else:
+        # the session wraps around midnight
+        active = (minutes >= start) | (minutes <= end)
+
+    idx = np.flatnonzero(active)
+    session_high = _high[idx]
+    session_low = _low[idx]
+    if not (np.all(session_high > 0) and np.all(session_low.astype(dtype) > 0)):
+        return _sessions_loop(minutes, start, end, _high, _low, dtype)
+
+    high = np.zeros(len(minutes), dtype=dtype)
+    low = np.zeros(len(minutes), dtype=dtype)
+    if len(idx):
+        # every run of consecutive active candles is one session
+        group_id = np.cumsum(np.diff(idx, prepend=-2) != 1)
+        df_temp = pd.DataFrame({"group": group_id, "high": session_high, "low": session_low})
+        high[idx] = df_temp.groupby("group")["high"].cummax().values
+        low[idx] = df_temp.groupby("group")["low"].cummin().values
+
+    return active.astype(np.int32), high, low
+
+
+def _sessions_loop(minutes, start, end, _high, _low, dtype):
+    """Candle by candle version of _sessions_kernel, used when prices are not all positive."""
+    active = np.zeros(len(minutes), dtype=np.int32)
+    high = np.zeros(len(minutes), dtype=dtype)
+    low = np.zeros(len(minutes), dtype=dtype)
+
+    for i in range(len(minutes)):
+        current_time = minutes[i]
+        if (start < end and start <= current_time <= end) or (
+            start >= end
+            and (start <= current_time or current_time <= end)
+        ):
+            active[i] = 1
+            high[i] = max(_high[i], high[i - 1] if i > 0 else 0)
+            low[i] = min(
+                _low[i],
+                low[i - 1] if i > 0 and low[i - 1] != 0 else float("inf"),
+            )
+
+    return active, high, low
+
+
+def _ffill(mask: np.ndarray, values: np.ndarray, fill, dtype=np.float64) -> np.ndarray:
+    """values where mask is set, carried forward to the next set position; fill before the first one."""
+    positions = np.flatnonzero(mask)
+    out = np.full(len(mask), fill, dtype=dtype)
+    if len(positions):
+        out[positions[0] :] = np.repeat(values[positions], np.diff(positions, append=len(mask)))
+    return out
+
+
+def _retracements_kernel(ohlc_high, ohlc_low, swing_hl, swing_level):
+    """Retracement scan over plain arrays; see smc.retracements for the meaning of the outputs."""
+    n = len(ohlc_high)
+    is_high = swing_hl == 1
+    is_low = swing_hl == -1
+
+    # the direction of the last swing and the levels of the last swing high (top) and low (bottom)
+    direction = _ffill(is_high | is_low, swing_hl, 0, np.int32)
+    top = _ffill(is_high, swing_level, 0.0)
+    bottom = _ffill(is_low, swing_level, 0.0)
+    previous_direction = np.roll(direction, 1)
+    if n > 1:
+        previous_direction[0] = 0  # the scan reads direction[-1] before setting it
+
+    # a bullish retracement (from the candle after the swing high on) is measured from the
+    # bottom up to the low, a bearish one from the top down to the high
+    current_retracement = np.zeros(n, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        idx = np.flatnonzero((previous_direction == 1) & (direction == 1))
+        denom = top[idx] - bottom[idx]
+        retracement = np.round(100 - (((ohlc_low[idx] - bottom[idx]) / denom) * 100), 1)
+        current_retracement[idx] = np.where(denom != 0, retracement, 0.0)
+        idx = np.flatnonzero(direction == -1)
+        denom = bottom[idx] - top[idx]
+        retracement = np.round(100 - ((ohlc_high[idx] - top[idx]) / denom) * 100, 1)
+        current_retracement[idx] = np.where(denom != 0, retracement, 0.0)
+
+    # the deepest retracement is the running max of the current one (at least 0, NaN ignored)
+    # restarted whenever the direction changes; the candles without a retracement are all at
+    # the start of such a run, where it is 0
+    group_id = np.cumsum(np.diff(direction, prepend=0) != 0)
+    deepest_retracement = (
+        pd.Series(np.fmax(current_retracement, 0.0)).groupby(group_id, sort=False).cummax().to_numpy()
+    )
+
+    # shift the arrays by 1
+    current_retracement = np.roll(current_retracement, 1)
+    deepest_retracement = np.roll(deepest_retracement, 1)
+    direction = np.roll(direction, 1)
+
+    # remove the first 3 retracements as they get calculated incorrectly due to not enough data
+    changes = np.flatnonzero(direction[:-1] != direction[1:])
+    remove = changes[2] + 2 if len(changes) >= 3 else max(n - 1, 0)
+    direction[:remove] = 0
+    current_retracement[:remove] = 0
+    deepest_retracement[:remove] = 0
+
+    return direction, current_retracement, deepest_retracement
+
+
+@apply(inputvalidator(input_="ohlc"), exclude=("batch",))
 class smc:
     __version__ = "0.0.26"
 
     @classmethod
-    def fvg(cls, ohlc: DataFrame, join_consecutive=False) -> Series:
+    def fvg(cls, ohlc: DataFrame, join_consecutive=False, sparse: bool = False) -> Series:
         """
         FVG - Fair Value Gap
         A fair value gap is when the previous high is lower than the next low if the current candle is bullish.
@@ -61,6 +1013,7 @@ class smc:
 
         parameters:
         join_consecutive: bool - if there are multiple FVG in a row then they will be merged into one using the highest top and the lowest bottom
+        sparse: bool - if True then return only the candles where any of the columns below is set, as a record array with the candle position in "index" and the columns below as fields
 
         returns:
         FVG = 1 if bullish fair value gap, -1 if bearish fair value gap
@@ -104,37 +1057,25 @@ class smc:
 
         # if there are multiple consecutive fvg then join them together using the highest top and lowest bottom and the last index
         if join_consecutive:
-            for i in range(len(fvg) - 1):
-                if fvg[i] == fvg[i + 1]:
-                    top[i + 1] = max(top[i], top[i + 1])
-                    bottom[i + 1] = min(bottom[i], bottom[i + 1])
-                    fvg[i] = top[i] = bottom[i] = np.nan
-
-        mitigated_index = np.zeros(len(ohlc), dtype=np.int32)
-        for i in np.where(~np.isnan(fvg))[0]:
-            mask = np.zeros(len(ohlc), dtype=np.bool_)
-            if fvg[i] == 1:
-                mask = ohlc["low"][i + 2 :] <= top[i]
-            elif fvg[i] == -1:
-                mask = ohlc["high"][i + 2 :] >= bottom[i]
-            if np.any(mask):
-                j = np.argmax(mask) + i + 2
-                mitigated_index[i] = j
+            _kernel("_fvg_join_kernel")(fvg, top, bottom)
+
+        mitigated_index = _kernel("_fvg_mitigation_kernel")(
+            fvg, top, bottom, ohlc["high"].values, ohlc["low"].values
+        )
 
         mitigated_index = np.where(np.isnan(fvg), np.nan, mitigated_index)
 
-        return pd.concat(
-            [
-                pd.Series(fvg, name="FVG"),
-                pd.Series(top, name="Top"),
-                pd.Series(bottom, name="Bottom"),
-                pd.Series(mitigated_index, name="MitigatedIndex"),
-            ],
-            axis=1,
-        )
+        if sparse:
+            return _events(
+                {"FVG": fvg, "Top": top, "Bottom": bottom, "MitigatedIndex": mitigated_index}
+            )
+
+        return _frame({"FVG": fvg, "Top": top, "Bottom": bottom, "MitigatedIndex": mitigated_index})
 
     @classmethod
-    def swing_highs_lows(cls, ohlc: DataFrame, swing_length: int = 50) -> Series:
+    def swing_highs_lows(
+        cls, ohlc: DataFrame, swing_length: int = 50, return_candidates: bool = False
+    ) -> Series:
         """
         Swing Highs and Lows
         A swing high is when the current high is the highest high out of the swing_length amount of candles before and after.
@@ -142,85 +1083,27 @@ class smc:
 
         parameters:
         swing_length: int - the amount of candles to look back and forward to determine the swing high or low
+        return_candidates: bool - if True then also return the candidates before consecutive highs or lows are reduced to one
 
         returns:
         HighLow = 1 if swing high, -1 if swing low
         Level = the level of the swing high or low
+        Candidate = 1 if candidate swing high, -1 if candidate swing low (only if return_candidates is True)
         """
 
-        swing_length *= 2
-        # set the highs to 1 if the current high is the highest high in the last 5 candles and next 5 candles
-        swing_highs_lows = np.where(
-            ohlc["high"]
-            == ohlc["high"].shift(-(swing_length // 2)).rolling(swing_length).max(),
-            1,
-            np.where(
-                ohlc["low"]
-                == ohlc["low"].shift(-(swing_length // 2)).rolling(swing_length).min(),
-                -1,
-                np.nan,
-            ),
+        swing_highs_lows, level = _shared(
+            ohlc, ("swing_highs_lows", swing_length), lambda: _swings(ohlc, swing_length), ("high", "low")
         )
 
-        while True:
-            positions = np.where(~np.isnan(swing_highs_lows))[0]
-
-            if len(positions) < 2:
-                break
-
-            current = swing_highs_lows[positions[:-1]]
-            next = swing_highs_lows[positions[1:]]
-
-            highs = ohlc["high"].iloc[positions[:-1]].values
-            lows = ohlc["low"].iloc[positions[:-1]].values
-
-            next_highs = ohlc["high"].iloc[positions[1:]].values
-            next_lows = ohlc["low"].iloc[positions[1:]].values
-
-            index_to_remove = np.zeros(len(positions), dtype=bool)
-
-            consecutive_highs = (current == 1) & (next == 1)
-            index_to_remove[:-1] |= consecutive_highs & (highs < next_highs)
-            index_to_remove[1:] |= consecutive_highs & (highs >= next_highs)
+        columns = {"HighLow": swing_highs_lows, "Level": level}
+        if return_candidates:
+            columns["Candidate"] = _candidates(ohlc, swing_length).copy()
 
-            consecutive_lows = (current == -1) & (next == -1)
-            index_to_remove[:-1] |= consecutive_lows & (lows > next_lows)
-            index_to_remove[1:] |= consecutive_lows & (lows <= next_lows)
-
-            if not index_to_remove.any():
-                break
-
-            swing_highs_lows[positions[index_to_remove]] = np.nan
-
-        positions = np.where(~np.isnan(swing_highs_lows))[0]
-
-        if len(positions) > 0:
-            if swing_highs_lows[positions[0]] == 1:
-                swing_highs_lows[0] = -1
-            if swing_highs_lows[positions[0]] == -1:
-                swing_highs_lows[0] = 1
-            if swing_highs_lows[positions[-1]] == -1:
-                swing_highs_lows[-1] = 1
-            if swing_highs_lows[positions[-1]] == 1:
-                swing_highs_lows[-1] = -1
-
-        level = np.where(
-            ~np.isnan(swing_highs_lows),
-            np.where(swing_highs_lows == 1, ohlc["high"], ohlc["low"]),
-            np.nan,
-        )
-
-        return pd.concat(
-            [
-                pd.Series(swing_highs_lows, name="HighLow"),
-                pd.Series(level, name="Level"),
-            ],
-            axis=1,
-        )
+        return _frame(columns)
 
     @classmethod
     def bos_choch(
-        cls, ohlc: DataFrame, swing_highs_lows: DataFrame, close_break: bool = True
+        cls, ohlc: DataFrame, swing_highs_lows: DataFrame, close_break: bool = True, sparse: bool = False
     ) -> Series:
         """
         BOS - Break of Structure
@@ -230,6 +1113,7 @@ class smc:
         parameters:
         swing_highs_lows: DataFrame - provide the dataframe from the swing_highs_lows function
         close_break: bool - if True then the break of structure will be mitigated based on the close of the candle otherwise it will be the high/low.
+        sparse: bool - if True then return only the candles where any of the columns below is set, as a record array with the candle position in "index" and the columns below as fields
 
         returns:
         BOS = 1 if bullish break of structure, -1 if bearish break of structure
@@ -238,126 +1122,15 @@ class smc:
         BrokenIndex = the index of the candle that broke the level
         """
 
-        swing_highs_lows = swing_highs_lows.copy()
-
-        level_order = []
-        highs_lows_order = []
-
-        bos = np.zeros(len(ohlc), dtype=np.int32)
-        choch = np.zeros(len(ohlc), dtype=np.int32)
-        level = np.zeros(len(ohlc), dtype=np.float32)
-
-        last_positions = []
-
-        for i in range(len(swing_highs_lows["HighLow"])):
-            if not np.isnan(swing_highs_lows["HighLow"][i]):
-                level_order.append(swing_highs_lows["Level"][i])
-                highs_lows_order.append(swing_highs_lows["HighLow"][i])
-                if len(level_order) >= 4:
-                    # bullish bos
-                    bos[last_positions[-2]] = (
-                        1
-                        if (
-                            np.all(highs_lows_order[-4:] == [-1, 1, -1, 1])
-                            and np.all(
-                                level_order[-4]
-                                < level_order[-2]
-                                < level_order[-3]
-                                < level_order[-1]
-                            )
-                        )
-                        else 0
-                    )
-                    level[last_positions[-2]] = (
-                        level_order[-3] if bos[last_positions[-2]] != 0 else 0
-                    )
-
-                    # bearish bos
-                    bos[last_positions[-2]] = (
-                        -1
-                        if (
-                            np.all(highs_lows_order[-4:] == [1, -1, 1, -1])
-                            and np.all(
-                                level_order[-4]
-                                > level_order[-2]
-                                > level_order[-3]
-                                > level_order[-1]
-                            )
-                        )
-                        else bos[last_positions[-2]]
-                    )
-                    level[last_positions[-2]] = (
-                        level_order[-3] if bos[last_positions[-2]] != 0 else 0
-                    )
-
-                    # bullish choch
-                    choch[last_positions[-2]] = (
-                        1
-                        if (
-                            np.all(highs_lows_order[-4:] == [-1, 1, -1, 1])
-                            and np.all(
-                                level_order[-1]
-                                > level_order[-3]
-                                > level_order[-4]
-                                > level_order[-2]
-                            )
-                        )
-                        else 0
-                    )
-                    level[last_positions[-2]] = (
-                        level_order[-3]
-                        if choch[last_positions[-2]] != 0
-                        else level[last_positions[-2]]
-                    )
-
-                    # bearish choch
-                    choch[last_positions[-2]] = (
-                        -1
-                        if (
-                            np.all(highs_lows_order[-4:] == [1, -1, 1, -1])
-                            and np.all(
-                                level_order[-1]
-                                < level_order[-3]
-                                < level_order[-4]
-                                < level_order[-2]
-                            )
-                        )
-                        else choch[last_positions[-2]]
-                    )
-                    level[last_positions[-2]] = (
-                        level_order[-3]
-                        if choch[last_positions[-2]] != 0
-                        else level[last_positions[-2]]
-                    )
-
-                last_positions.append(i)
-
-        broken = np.zeros(len(ohlc), dtype=np.int32)
-        for i in np.where(np.logical_or(bos != 0, choch != 0))[0]:
-            mask = np.zeros(len(ohlc), dtype=np.bool_)
-            # if the bos is 1 then check if the candles high has gone above the level
-            if bos[i] == 1 or choch[i] == 1:
-                mask = ohlc["close" if close_break else "high"][i + 2 :] > level[i]
-            # if the bos is -1 then check if the candles low has gone below the level
-            elif bos[i] == -1 or choch[i] == -1:
-                mask = ohlc["close" if close_break else "low"][i + 2 :] < level[i]
-            if np.any(mask):
-                j = np.argmax(mask) + i + 2
-                broken[i] = j
-                # if there are any unbroken bos or choch that started before this one and ended after this one then remove them
-                for k in np.where(np.logical_or(bos != 0, choch != 0))[0]:
-                    if k < i and broken[k] >= j:
-                        bos[k] = 0
-                        choch[k] = 0
-                        level[k] = 0
-
-        # remove the ones that aren't broken
-        for i in np.where(
-            np.logical_and(np.logical_or(bos != 0, choch != 0), broken == 0)
-        )[0]:
-            bos[i] = 0
-            choch[i] = 0
-            level[i] = 0
+        bos, choch, level, broken = _kernel("_bos_choch_kernel")(
+            swing_highs_lows["HighLow"].values,
+            swing_highs_lows["Level"].values,
+            ohlc["high"].values,
+            ohlc["low"].values,
+            ohlc["close"].values,
+            close_break,
+            _float_dtype(),
+        )
 
         # replace all the 0s with np.nan
         bos = np.where(bos != 0, bos, np.nan)
@@ -365,12 +1138,12 @@ class smc:
         level = np.where(level != 0, level, np.nan)
         broken = np.where(broken != 0, broken, np.nan)
 
-        bos = pd.Series(bos, name="BOS")
-        choch = pd.Series(choch, name="CHOCH")
-        level = pd.Series(level, name="Level")
-        broken = pd.Series(broken, name="BrokenIndex")
+        if sparse:
+            return _events(
+                {"BOS": bos, "CHOCH": choch, "Level": level, "BrokenIndex": broken}
+            )
 
-        return pd.concat([bos, choch, level, broken], axis=1)
+        return _frame({"BOS": bos, "CHOCH": choch, "Level": level, "BrokenIndex": broken})
 
     @classmethod
     def ob(
@@ -378,6 +1151,7 @@ class smc:
         ohlc: DataFrame,
         swing_highs_lows: DataFrame,
         close_mitigation: bool = False,
+        sparse: bool = False,
     ) -> Series:
         """
         OB - Order Blocks
@@ -386,6 +1160,7 @@ class smc:
         parameters:
         swing_highs_lows: DataFrame - provide the dataframe from the swing_highs_lows function
         close_mitigation: bool - if True then the order block will be mitigated based on the close of the candle otherwise it will be the high/low.
+        sparse: bool - if True then return only the candles where any of the columns below is set, as a record array with the candle position in "index" and the columns below as fields
 
         returns:
         OB = 1 if bullish order block, -1 if bearish order block
@@ -395,182 +1170,44 @@ class smc:
         Percentage = strength of order block (min(highVolume, lowVolume)/max(highVolume, lowVolume))
         """
 
-        ohlc_len = len(ohlc)
-        _open = ohlc["open"].values
-        _high = ohlc["high"].values
-        _low = ohlc["low"].values
-        _close = ohlc["close"].values
-        _volume = ohlc["volume"].values
-        swing_hl = swing_highs_lows["HighLow"].values
-
-        # Pre-allocate arrays
-        crossed = np.full(ohlc_len, False, dtype=bool)
-        ob = np.zeros(ohlc_len, dtype=np.int32)
-        top_arr = np.zeros(ohlc_len, dtype=np.float32)
-        bottom_arr = np.zeros(ohlc_len, dtype=np.float32)
-        obVolume = np.zeros(ohlc_len, dtype=np.float32)
-        lowVolume = np.zeros(ohlc_len, dtype=np.float32)
-        highVolume = np.zeros(ohlc_len, dtype=np.float32)
-        percentage = np.zeros(ohlc_len, dtype=np.float32)
-        mitigated_index = np.zeros(ohlc_len, dtype=np.int32)
-        breaker = np.full(ohlc_len, False, dtype=bool)
-
-        # Precompute swing indices (assumed sorted)
-        swing_high_indices = np.flatnonzero(swing_hl == 1)
-        swing_low_indices = np.flatnonzero(swing_hl == -1)
-
-        # List to track active bullish order blocks
-        active_bullish = []
-        for i in range(ohlc_len):
-            close_index = i
-            # Update existing bullish OB
-            for idx in active_bullish.copy():
-                if breaker[idx]:
-                    if _high[close_index] > top_arr[idx]:
-                        # Reset this OB
-                        ob[idx] = 0
-                        top_arr[idx] = 0.0
-                        bottom_arr[idx] = 0.0
-                        obVolume[idx] = 0.0
-                        lowVolume[idx] = 0.0
-                        highVolume[idx] = 0.0
-                        mitigated_index[idx] = 0
-                        percentage[idx] = 0.0
-                        active_bullish.remove(idx)
-                else:
-                    if ((not close_mitigation and _low[close_index] < bottom_arr[idx])
-                        or (close_mitigation and min(_open[close_index], _close[close_index]) < bottom_arr[idx])):
-                        breaker[idx] = True
-                        mitigated_index[idx] = close_index - 1
-
-            # Find last swing high index less than current candle (using binary search)
-            pos = np.searchsorted(swing_high_indices, close_index)
-            last_top_index = swing_high_indices[pos - 1] if pos > 0 else None
-
-            if last_top_index is not None:
-                if _close[close_index] > _high[last_top_index] and not crossed[last_top_index]:
-                    crossed[last_top_index] = True
-                    # Initialise with default values from previous candle
-                    default_index = close_index - 1
-                    obBtm = _high[default_index]
-                    obTop = _low[default_index]
-                    obIndex = default_index
-                    # Look for a lower low between last_top_index and current candle
-                    if close_index - last_top_index > 1:
-                        start = last_top_index + 1
-                        end = close_index  # up to but not including close_index
-                        if end > start:
-                            segment = _low[start:end]
-                            min_val = segment.min()
-                            # In case of ties, take the last occurrence
-                            candidates = np.nonzero(segment == min_val)[0]
-                            if candidates.size:
-                                candidate_index = start + candidates[-1]
-                                obBtm = _low[candidate_index]
-                                obTop = _high[candidate_index]
-                                obIndex = candidate_index
-                    # Set bullish OB values
-                    ob[obIndex] = 1
-                    top_arr[obIndex] = obTop
-                    bottom_arr[obIndex] = obBtm
-                    vol_cur = _volume[close_index]
-                    vol_prev1 = _volume[close_index - 1] if close_index >= 1 else 0.0
-                    vol_prev2 = _volume[close_index - 2] if close_index >= 2 else 0.0
-                    obVolume[obIndex] = vol_cur + vol_prev1 + vol_prev2
-                    lowVolume[obIndex] = vol_prev2
-                    highVolume[obIndex] = vol_cur + vol_prev1
-                    max_vol = max(highVolume[obIndex], lowVolume[obIndex])
-                    percentage[obIndex] = (min(highVolume[obIndex], lowVolume[obIndex]) / max_vol * 100.0) if max_vol != 0 else 100.0
-                    active_bullish.append(obIndex)
-
-        # List to track active bearish order blocks
-        active_bearish = []
-        for i in range(ohlc_len):
-            close_index = i
-            # Update existing bearish OB
-            for idx in active_bearish.copy():
-                if breaker[idx]:
-                    if _low[close_index] < bottom_arr[idx]:
-                        ob[idx] = 0
-                        top_arr[idx] = 0.0
-                        bottom_arr[idx] = 0.0
-                        obVolume[idx] = 0.0
-                        lowVolume[idx] = 0.0
-                        highVolume[idx] = 0.0
-                        mitigated_index[idx] = 0
-                        percentage[idx] = 0.0
-                        active_bearish.remove(idx)
-                else:
-                    if ((not close_mitigation and _high[close_index] > top_arr[idx])
-                        or (close_mitigation and max(_open[close_index], _close[close_index]) > top_arr[idx])):
-                        breaker[idx] = True
-                        mitigated_index[idx] = close_index
-
-            # Find last swing low index less than current candle
-            pos = np.searchsorted(swing_low_indices, close_index)
-            last_btm_index = swing_low_indices[pos - 1] if pos > 0 else None
-
-            if last_btm_index is not None:
-                if _close[close_index] < _low[last_btm_index] and not crossed[last_btm_index]:
-                    crossed[last_btm_index] = True
-                    default_index = close_index - 1
-                    obTop = _high[default_index]
-                    obBtm = _low[default_index]
-                    obIndex = default_index
-                    if close_index - last_btm_index > 1:
-                        start = last_btm_index + 1
-                        end = close_index
-                        if end > start:
-                            segment = _high[start:end]
-                            max_val = segment.max()
-                            candidates = np.nonzero(segment == max_val)[0]
-                            if candidates.size:
-                                candidate_index = start + candidates[-1]
-                                obTop = _high[candidate_index]
-                                obBtm = _low[candidate_index]
-                                obIndex = candidate_index
-                    ob[obIndex] = -1
-                    top_arr[obIndex] = obTop
-                    bottom_arr[obIndex] = obBtm
-                    vol_cur = _volume[close_index]
-                    vol_prev1 = _volume[close_index - 1] if close_index >= 1 else 0.0
-                    vol_prev2 = _volume[close_index - 2] if close_index >= 2 else 0.0
-                    obVolume[obIndex] = vol_cur + vol_prev1 + vol_prev2
-                    lowVolume[obIndex] = vol_cur + vol_prev1
-                    highVolume[obIndex] = vol_prev2
-                    max_vol = max(highVolume[obIndex], lowVolume[obIndex])
-                    percentage[obIndex] = (min(highVolume[obIndex], lowVolume[obIndex]) / max_vol * 100.0) if max_vol != 0 else 100.0
-                    active_bearish.append(obIndex)
-
-        # Convert zeros to NaN where OB was not set
-        ob = np.where(ob != 0, ob, np.nan)
-        top_arr = np.where(~np.isnan(ob), top_arr, np.nan)
-        bottom_arr = np.where(~np.isnan(ob), bottom_arr, np.nan)
-        obVolume = np.where(~np.isnan(ob), obVolume, np.nan)
-        mitigated_index = np.where(~np.isnan(ob), mitigated_index, np.nan)
-        percentage = np.where(~np.isnan(ob), percentage, np.nan)
-
-        ob_series = pd.Series(ob, name="OB")
-        top_series = pd.Series(top_arr, name="Top")
-        bottom_series = pd.Series(bottom_arr, name="Bottom")
-        obVolume_series = pd.Series(obVolume, name="OBVolume")
-        mitigated_index_series = pd.Series(mitigated_index, name="MitigatedIndex")
-        percentage_series = pd.Series(percentage, name="Percentage")
-
-        return pd.concat(
-            [
-                ob_series,
-                top_series,
-                bottom_series,
-                obVolume_series,
-                mitigated_index_series,
-                percentage_series,
-            ],
-            axis=1,
+        ob, top_arr, bottom_arr, obVolume, mitigated_index, percentage = _ob_arrays(
+            ohlc["open"].values,
+            ohlc["high"].values,
+            ohlc["low"].values,
+            ohlc["close"].values,
+            ohlc["volume"].values,
+            swing_highs_lows["HighLow"].values,
+            close_mitigation,
+            _float_dtype(),
+        )
+
+        if sparse:
+            return _events(
+                {
+                    "OB": ob,
+                    "Top": top_arr,
+                    "Bottom": bottom_arr,
+                    "OBVolume": obVolume,
+                    "MitigatedIndex": mitigated_index,
+                    "Percentage": percentage,
+                }
+            )
+
+        return _frame(
+            {
+                "OB": ob,
+                "Top": top_arr,
+                "Bottom": bottom_arr,
+                "OBVolume": obVolume,
+                "MitigatedIndex": mitigated_index,
+                "Percentage": percentage,
+            }
         )
 
     @classmethod
-    def liquidity(cls, ohlc: DataFrame, swing_highs_lows: DataFrame, range_percent: float = 0.01) -> Series:
+    def liquidity(
+        cls, ohlc: DataFrame, swing_highs_lows: DataFrame, range_percent: float = 0.01, sparse: bool = False
+    ) -> Series:
         """
         Liquidity
         Liquidity is when there are multiple highs within a small range of each other,
@@ -579,6 +1216,7 @@ class smc:
         parameters:
         swing_highs_lows: DataFrame - provide the dataframe from the swing_highs_lows function
         range_percent: float - the percentage of the range to determine liquidity
+        sparse: bool - if True then return only the candles where any of the columns below is set, as a record array with the candle position in "index" and the columns below as fields
 
         returns:
         Liquidity = 1 if bullish liquidity, -1 if bearish liquidity
@@ -587,115 +1225,24 @@ class smc:
         Swept = the index of the candle that swept the liquidity
         """
 
-        # Work on a copy so the original is not modified.
-        shl = swing_highs_lows.copy()
-        n = len(ohlc)
-        
         # Calculate the pip range based on the overall high-low range.
         pip_range = (ohlc["high"].max() - ohlc["low"].min()) * range_percent
 
-        # Preconvert required columns to numpy arrays.
-        ohlc_high = ohlc["high"].values
-        ohlc_low = ohlc["low"].values
-        # Make a copy to allow in-place marking of used candidates.
-        shl_HL = shl["HighLow"].values.copy()
-        shl_Level = shl["Level"].values.copy()
-
-        # Initialise output arrays with NaN (to match later replacement of zeros).
-        liquidity = np.full(n, np.nan, dtype=np.float32)
-        liquidity_level = np.full(n, np.nan, dtype=np.float32)
-        liquidity_end = np.full(n, np.nan, dtype=np.float32)
-        liquidity_swept = np.full(n, np.nan, dtype=np.float32)
-
-        # Process bullish liquidity (HighLow == 1)
-        bull_indices = np.nonzero(shl_HL == 1)[0]
-        for i in bull_indices:
-            # Skip if this candidate has already been used.
-            if shl_HL[i] != 1:
-                continue
-            high_level = shl_Level[i]
-            range_low = high_level - pip_range
-            range_high = high_level + pip_range
-            group_levels = [high_level]
-            group_end = i
-
-            # Determine the swept index:
-            # Find the first candle after i where the high reaches or exceeds range_high.
-            c_start = i + 1
-            if c_start < n:
-                cond = ohlc_high[c_start:] >= range_high
-                if np.any(cond):
-                    swept = c_start + int(np.argmax(cond))
-                else:
-                    swept = 0
-            else:
-                swept = 0
-
-            # Iterate only over candidate indices greater than i.
-            for j in bull_indices:
-                if j <= i:
-                    continue
-                # Emulate the inner loop break: if we've reached or passed the swept index, stop.
-                if swept and j >= swept:
-                    break
-                # If candidate j is within the liquidity range, add it and mark it as used.
-                if shl_HL[j] == 1 and (range_low <= shl_Level[j] <= range_high):
-                    group_levels.append(shl_Level[j])
-                    group_end = j
-                    shl_HL[j] = 0  # mark candidate as used
-            # Only record liquidity if more than one candidate is grouped.
-            if len(group_levels) > 1:
-                avg_level = sum(group_levels) / len(group_levels)
-                liquidity[i] = 1
-                liquidity_level[i] = avg_level
-                liquidity_end[i] = group_end
-                liquidity_swept[i] = swept
-
-        # Process bearish liquidity (HighLow == -1)
-        bear_indices = np.nonzero(shl_HL == -1)[0]
-        for i in bear_indices:
-            if shl_HL[i] != -1:
-                continue
-            low_level = shl_Level[i]
-            range_low = low_level - pip_range
-            range_high = low_level + pip_range
-            group_levels = [low_level]
-            group_end = i
-
-            # Find the first candle after i where the low reaches or goes below range_low.
-            c_start = i + 1
-            if c_start < n:
-                cond = ohlc_low[c_start:] <= range_low
-                if np.any(cond):
-                    swept = c_start + int(np.argmax(cond))
-                else:
-                    swept = 0
-            else:
-                swept = 0
-
-            for j in bear_indices:
-                if j <= i:
-                    continue
-                if swept and j >= swept:
-                    break
-                if shl_HL[j] == -1 and (range_low <= shl_Level[j] <= range_high):
-                    group_levels.append(shl_Level[j])
-                    group_end = j
-                    shl_HL[j] = 0
-            if len(group_levels) > 1:
-                avg_level = sum(group_levels) / len(group_levels)
-                liquidity[i] = -1
-                liquidity_level[i] = avg_level
-                liquidity_end[i] = group_end
-                liquidity_swept[i] = swept
-
-        # Convert arrays to Series with the proper names.
-        liq_series = pd.Series(liquidity, name="Liquidity")
-        level_series = pd.Series(liquidity_level, name="Level")
-        end_series = pd.Series(liquidity_end, name="End")
-        swept_series = pd.Series(liquidity_swept, name="Swept")
-
-        return pd.concat([liq_series, level_series, end_series, swept_series], axis=1)
+        liquidity, liquidity_level, liquidity_end, liquidity_swept = _kernel("_liquidity_kernel")(
+            ohlc["high"].values,
+            ohlc["low"].values,
+            swing_highs_lows["HighLow"].values,
+            swing_highs_lows["Level"].values,
+            pip_range,
+            _float_dtype(),
+        )
+
+        if sparse:
+            return _events(
+                {"Liquidity": liquidity, "Level": liquidity_level, "End": liquidity_end, "Swept": liquidity_swept}
+            )
+
+        return _frame({"Liquidity": liquidity, "Level": liquidity_level, "End": liquidity_end, "Swept": liquidity_swept})
 
     @classmethod
     def previous_high_low(cls, ohlc: DataFrame, time_frame: str = "1D") -> DataFrame:
@@ -712,32 +1259,40 @@ class smc:
         BrokenHigh = 1 once price has broken the previous high of the timeframe, 0 otherwise
         BrokenLow = 1 once price has broken the previous low of the timeframe, 0 otherwise
         """
-        ohlc = ohlc.copy()
-        ohlc.index = pd.to_datetime(ohlc.index)
+        index = _shared(ohlc, "datetime_index", lambda: pd.to_datetime(ohlc.index), ("index",))
         n = len(ohlc)
 
         # Resample to target timeframe
-        resampled = ohlc.resample(time_frame).agg({
-            "open": "first",
-            "high": "max",
-            "low": "min",
-            "close": "last",
-            "volume": "sum"
-        }).dropna()
+        resampled = _shared(
+            ohlc,
+            ("resampled", time_frame),
+            lambda: pd.DataFrame(
+                {c: ohlc[c].values for c in ("open", "high", "low", "close", "volume")}, index=index
+            ).resample(time_frame).agg({
+                "open": "first",
+                "high": "max",
+                "low": "min",
+                "close": "last",
+                "volume": "sum"
+            }).dropna(),
+            ("index", "open", "high", "low", "close", "volume"),
+        )
+
+        dtype = _float_dtype()
 
         # Edge case: not enough resampled periods
         if len(resampled) < 2:
-            return pd.concat([
-                pd.Series(np.full(n, np.nan, dtype=np.float32), name="PreviousHigh"),
-                pd.Series(np.full(n, np.nan, dtype=np.float32), name="PreviousLow"),
-                pd.Series(np.zeros(n, dtype=np.int32), name="BrokenHigh"),
-                pd.Series(np.zeros(n, dtype=np.int32), name="BrokenLow"),
-            ], axis=1)
+            return _frame({
+                "PreviousHigh": np.full(n, np.nan, dtype=dtype),
+                "PreviousLow": np.full(n, np.nan, dtype=dtype),
+                "BrokenHigh": np.zeros(n, dtype=np.int32),
+                "BrokenLow": np.zeros(n, dtype=np.int32),
+            })
 
         resampled_times = resampled.index.values
         resampled_highs = resampled["high"].values
         resampled_lows = resampled["low"].values
-        candle_times = ohlc.index.values
+        candle_times = index.values
 
         # For each candle, find how many resampled periods have start time < candle time
         # This is equivalent to: len(np.where(resampled_times < candle_time)[0])
@@ -750,8 +1305,8 @@ class smc:
         valid_mask = periods_before > 1
 
         # Initialize output arrays
-        previous_high = np.full(n, np.nan, dtype=np.float32)
-        previous_low = np.full(n, np.nan, dtype=np.float32)
+        previous_high = np.full(n, np.nan, dtype=dtype)
+        previous_low = np.full(n, np.nan, dtype=dtype)
 
         # Fill valid entries
         valid_indices = np.where(valid_mask)[0]
@@ -782,13 +1337,94 @@ class smc:
         broken_high = np.where(valid_mask & (cummax_high > previous_high), 1, 0).astype(np.int32)
         broken_low = np.where(valid_mask & (cummin_low < previous_low), 1, 0).astype(np.int32)
 
-        return pd.concat([
-            pd.Series(previous_high, name="PreviousHigh"),
-            pd.Series(previous_low, name="PreviousLow"),
-            pd.Series(broken_high, name="BrokenHigh"),
-            pd.Series(broken_low, name="BrokenLow"),
-        ], axis=1)
+        return _frame({
+            "PreviousHigh": previous_high,
+            "PreviousLow": previous_low,
+            "BrokenHigh": broken_high,
+            "BrokenLow": broken_low,
+        })
     
+    @classmethod
+    def previous_high_low_multi(cls, ohlc: DataFrame, time_frames=("4h", "1D", "W")) -> DataFrame:
+        """
+        Previous High Low (multiple)
+        This method returns the previous highs and lows of smc.previous_high_low for several time frames at once, reading the candle times and prices only once
+
+        parameters:
+        time_frames: list - the time frames to get the previous high and low of, e.g. ["4h", "1D", "W"]
+
+        returns:
+        one column group per time frame, result["1D"] is the same as smc.previous_high_low(ohlc, "1D")
+        PreviousHigh = the previous high
+        PreviousLow = the previous low
+        BrokenHigh = 1 once price has broken the previous high of the timeframe, 0 otherwise
+        BrokenLow = 1 once price has broken the previous low of the timeframe, 0 otherwise
+        """
+        index = _shared(ohlc, "datetime_index", lambda: pd.to_datetime(ohlc.index), ("index",))
+        n = len(ohlc)
+        if n == 0 or not index.is_monotonic_increasing:
+            # the periods are runs of consecutive candles only in time order
+            return pd.concat({tf: cls.previous_high_low(ohlc, time_frame=tf) for tf in time_frames}, axis=1)
+
+        times = index.asi8
+        offsets = [pd.tseries.frequencies.to_offset(tf) for tf in time_frames]
+        # the days are the same for every calendar time frame
+        day_starts = None
+        if any(not isinstance(offset, pd.offsets.Tick) for offset in offsets):
+            day_starts = _day_starts(index)
+        ohlc_high = ohlc["high"].values
+        ohlc_low = ohlc["low"].values
+        # resample drops the periods where any price is missing
+        priced = [ohlc[c].values for c in ("open", "high", "low", "close")]
+        # the cummax (cummin) is NaN at a missing high (low), so that candle is not broken
+        has_high = ~np.isnan(ohlc_high)
+        has_low = ~np.isnan(ohlc_low)
+        dtype = _float_dtype()
+
+        results = {}
+        for time_frame, offset in zip(time_frames, offsets):
+            labels = _period_labels(index, offset, day_starts)
+            new_period = np.diff(labels, prepend=labels[0] - 1) != 0
+            starts = np.flatnonzero(new_period)
+            period_highs = np.fmax.reduceat(ohlc_high, starts)
+            period_lows = np.fmin.reduceat(ohlc_low, starts)
+            kept = np.ones(len(starts), dtype=bool)
+            for values in priced:
+                kept &= ~np.isnan(np.fmax.reduceat(values, starts))
+            period_highs, period_lows = period_highs[kept], period_lows[kept]
+
+            previous_high = np.full(n, np.nan, dtype=dtype)
+            previous_low = np.full(n, np.nan, dtype=dtype)
+            broken_high = np.zeros(n, dtype=np.int32)
+            broken_low = np.zeros(n, dtype=np.int32)
+            if len(period_highs) >= 2:
+                # the second to last period labelled before each candle, as in previous_high_low:
+                # the kept periods before the candle's own, and its own once the candle is past its label
+                period_of = np.cumsum(new_period) - 1
+                kept_before = np.cumsum(kept) - kept
+                periods_before = kept_before[period_of] + (kept[period_of] & (labels < times))
+                prev_period_idx = periods_before - 2
+                valid_mask = periods_before > 1
+                previous_high[valid_mask] = period_highs[prev_period_idx[valid_mask]]
+                previous_low[valid_mask] = period_lows[prev_period_idx[valid_mask]]
+
+                # the cummax of the highs since the candle's previous period changed is above the
+                # previous high once any of those highs is
+                new_segment = np.diff(prev_period_idx, prepend=prev_period_idx[0] - 1) != 0
+                above = _segmented_any(ohlc_high > previous_high, new_segment)
+                below = _segmented_any(ohlc_low < previous_low, new_segment)
+                broken_high = (valid_mask & has_high & above).astype(np.int32)
+                broken_low = (valid_mask & has_low & below).astype(np.int32)
+
+            results[time_frame] = _frame({
+                "PreviousHigh": previous_high,
+                "PreviousLow": previous_low,
+                "BrokenHigh": broken_high,
+                "BrokenLow": broken_low,
+            })
+
+        return pd.concat(results, axis=1)
+
     @classmethod
     def sessions(
         cls,
@@ -817,76 +1453,72 @@ class smc:
         if session == "Custom" and (start_time == "" or end_time == ""):
             raise ValueError("Custom session requires a start and end time")
 
-        default_sessions = {
-            "Asia": {
-                "start": "01:00",
-                "end": "07:00",
-            },
-            "London": {
-                "start": "07:00",
-                "end": "13:00",
-            },
-            "NYAM": {
-                "start": "13:00",
-                "end": "19:00",
-            },
-            "NYPM": {
-                "start": "19:00",
-                "end": "01:00",
-            },
-            # "Sydney": {"start": "21:00", "end": "06:00"},
-            # "Tokyo": {"start": "00:00", "end": "09:00"},
-            # "New York": {"start": "13:00", "end": "22:00"},
-            # "Asian kill zone": {"start": "00:00", "end": "04:00"},
-            # "London open kill zone": {"start": "6:00", "end": "9:00"},
-            # "New York kill zone": {"start": "11:00", "end": "14:00"},
-            # "london close kill zone": {"start": "14:00", "end": "16:00"},
-            "Custom": {
-                "start": start_time,
-                "end": end_time,
-            },
-        }
-
-        ohlc.index = pd.to_datetime(ohlc.index)
-        if time_zone != "UTC":
-            time_zone = time_zone.replace("GMT", "Etc/GMT")
-            time_zone = time_zone.replace("UTC", "Etc/GMT")
-            ohlc.index = ohlc.index.tz_localize(time_zone).tz_convert("UTC")
-
-        start_time = datetime.strptime(
-            default_sessions[session]["start"], "%H:%M"
-        ).strftime("%H:%M")
-        start_time = datetime.strptime(start_time, "%H:%M")
-        end_time = datetime.strptime(
-            default_sessions[session]["end"], "%H:%M"
-        ).strftime("%H:%M")
-        end_time = datetime.strptime(end_time, "%H:%M")
+        if session == "Custom":
+            bounds = _session_bounds(start_time, end_time)
+        else:
+            bounds = _session_bounds(
+                _DEFAULT_SESSIONS[session]["start"], _DEFAULT_SESSIONS[session]["end"]
+            )
 
         # if the candles are between the start and end time then it is an active session
-        active = np.zeros(len(ohlc), dtype=np.int32)
-        high = np.zeros(len(ohlc), dtype=np.float32)
-        low = np.zeros(len(ohlc), dtype=np.float32)
-
-        for i in range(len(ohlc)):
-            current_time = ohlc.index[i].strftime("%H:%M")
-            # convert current time to the second of the day
-            current_time = datetime.strptime(current_time, "%H:%M")
-            if (start_time < end_time and start_time <= current_time <= end_time) or (
-                start_time >= end_time
-                and (start_time <= current_time or current_time <= end_time)
-            ):
-                active[i] = 1
-                high[i] = max(ohlc["high"].iloc[i], high[i - 1] if i > 0 else 0)
-                low[i] = min(
-                    ohlc["low"].iloc[i],
-                    low[i - 1] if i > 0 and low[i - 1] != 0 else float("inf"),
+        active, high, low = _kernel("_sessions_kernel")(
+            _shared(
+                ohlc, ("session_minutes", time_zone), lambda: _session_minutes(ohlc.index, time_zone), ("index",)
+            ),
+            *bounds,
+            ohlc["high"].values,
+            ohlc["low"].values,
+            _float_dtype(),
+        )
+
+        return _frame({"Active": active, "High": high, "Low": low})
+
+    @classmethod
+    def sessions_multi(
+        cls,
+        ohlc: DataFrame,
+        sessions=("Asia", "London", "NYAM", "NYPM"),
+        time_zone: str = "UTC",
+    ) -> DataFrame:
+        """
+        Sessions (multiple)
+        This method returns the sessions of smc.sessions for several sessions at once, reading the candle times only once
+
+        parameters:
+        sessions: list or dict - names of default sessions (Asia, London, NYAM, NYPM), or a dict of {name: (start_time, end_time)} with times in the format "HH:MM"
+        time_zone: str - the time zone of the candles can be in the format "UTC+0" or "GMT+0"
+
+        returns:
+        one column group per session, result["London"] is the same as smc.sessions(ohlc, "London")
+        Active = 1 if the candle is within the session, 0 if not
+        High = the highest point of the session
+        Low = the lowest point of the session
+        """
+
+        if isinstance(sessions, dict):
+            bounds = {name: _session_bounds(*times) for name, times in sessions.items()}
+        else:
+            bounds = {
+                name: _session_bounds(
+                    _DEFAULT_SESSIONS[name]["start"], _DEFAULT_SESSIONS[name]["end"]
                 )
+                for name in sessions
+            }
 
-        active = pd.Series(active, name="Active")
-        high = pd.Series(high, name="High")
-        low = pd.Series(low, name="Low")
+        minutes = _shared(
+            ohlc, ("session_minutes", time_zone), lambda: _session_minutes(ohlc.index, time_zone), ("index",)
+        )
+        ohlc_high = ohlc["high"].values
+        ohlc_low = ohlc["low"].values
+        kernel = _kernel("_sessions_kernel")
+        dtype = _float_dtype()
 
-        return pd.concat([active, high, low], axis=1)
+        results = {}
+        for name, (start, end) in bounds.items():
+            active, high, low = kernel(minutes, start, end, ohlc_high, ohlc_low, dtype)
+            results[name] = _frame({"Active": active, "High": high, "Low": low})
+
+        return pd.concat(results, axis=1)
 
     @classmethod
     def retracements(cls, ohlc: DataFrame, swing_highs_lows: DataFrame) -> Series:
@@ -903,82 +1535,45 @@ class smc:
         DeepestRetracement% = the deepest retracement percentage from the swing high or low
         """
 
-        swing_highs_lows = swing_highs_lows.copy()
-
-        direction = np.zeros(len(ohlc), dtype=np.int32)
-        current_retracement = np.zeros(len(ohlc), dtype=np.float64)
-        deepest_retracement = np.zeros(len(ohlc), dtype=np.float64)
-
-        top = 0
-        bottom = 0
-        for i in range(len(ohlc)):
-            if swing_highs_lows["HighLow"][i] == 1:
-                direction[i] = 1
-                top = swing_highs_lows["Level"][i]
-                # deepest_retracement[i] = 0
-            elif swing_highs_lows["HighLow"][i] == -1:
-                direction[i] = -1
-                bottom = swing_highs_lows["Level"][i]
-                # deepest_retracement[i] = 0
-            else:
-                direction[i] = direction[i - 1] if i > 0 else 0
+        direction, current_retracement, deepest_retracement = _kernel("_retracements_kernel")(
+            ohlc["high"].values,
+            ohlc["low"].values,
+            swing_highs_lows["HighLow"].values,
+            swing_highs_lows["Level"].values,
+        )
 
-            if direction[i - 1] == 1:
-                denom = top - bottom
-                if denom != 0:
-                    current_retracement[i] = round(
-                        100 - (((ohlc["low"].iloc[i] - bottom) / denom) * 100), 1
-                    )
-                else:
-                    current_retracement[i] = 0.0
-                deepest_retracement[i] = max(
-                    (
-                        deepest_retracement[i - 1]
-                        if i > 0 and direction[i - 1] == 1
-                        else 0
-                    ),
-                    current_retracement[i],
-                )
-            if direction[i] == -1:
-                denom = bottom - top
-                if denom != 0:
-                    current_retracement[i] = round(
-                        100 - ((ohlc["high"].iloc[i] - top) / denom) * 100, 1
-                    )
-                else:
-                    current_retracement[i] = 0.0
-                deepest_retracement[i] = max(
-                    (
-                        deepest_retracement[i - 1]
-                        if i > 0 and direction[i - 1] == -1
-                        else 0
-                    ),
-                    current_retracement[i],
-                )
+        return _frame(
+            {
+                "Direction": direction,
+                "CurrentRetracement%": current_retracement,
+                "DeepestRetracement%": deepest_retracement,
+            }
+        )
+
+    @classmethod
+    def batch(
+        cls,
+        frames: dict,
+        indicators=("fvg", "swing_highs_lows", "bos_choch", "ob", "liquidity", "previous_high_low", "retracements"),
+        workers: int = None,
+    ) -> dict:
+        """
+        Batch
+        This method runs a set of indicators over many candle DataFrames (e.g. one per symbol and timeframe) on a pool of processes
+
+        parameters:
+        frames: dict - the ohlc DataFrames by any key
+        indicators: list or dict - indicator names (fvg, swing_highs_lows, bos_choch, ob, liquidity, previous_high_low, previous_high_low_multi, sessions, sessions_multi, retracements) or (name, kwargs) pairs, or a dict of them by result label. bos_choch, ob, liquidity and retracements use the swing highs and lows of the swing_length in their kwargs (default 50)
+        workers: int - number of processes (default: one per core); with 1 the frames are run in this process
+
+        returns:
+        a dict with the keys of frames, each a BatchResult with
+        indicators = the indicator results by name (or label)
+        seconds = the time the indicators of this frame took
+        pid = the process that ran them
+
+        The candles are handed to the processes through shared memory, not by pickling the DataFrames.
+        """
+        from smartmoneyconcepts.batch import batch
 
-        # shift the arrays by 1
-        current_retracement = np.roll(current_retracement, 1)
-        deepest_retracement = np.roll(deepest_retracement, 1)
-        direction = np.roll(direction, 1)
-
-        # remove the first 3 retracements as they get calculated incorrectly due to not enough data
-        remove_first_count = 0
-        for i in range(len(direction)):
-            if i + 1 == len(direction):
-                break
-            if direction[i] != direction[i + 1]:
-                remove_first_count += 1
-            direction[i] = 0
-            current_retracement[i] = 0
-            deepest_retracement[i] = 0
-            if remove_first_count == 3:
-                direction[i + 1] = 0
-                current_retracement[i + 1] = 0
-                deepest_retracement[i + 1] = 0
-                break
-
-        direction = pd.Series(direction, name="Direction")
-        current_retracement = pd.Series(current_retracement, name="CurrentRetracement%")
-        deepest_retracement = pd.Series(deepest_retracement, name="DeepestRetracement%")
-
-        return pd.concat([direction, current_retracement, deepest_retracement], axis=1)
+        return batch(frames, indicators, workers)
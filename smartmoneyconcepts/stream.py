@@ -0,0 +1,784 @@
+"""
+Streaming SMC calculator.
+
+SMCStream takes closed candles one at a time and keeps the smc indicators up to date
+without recomputing the history. Each update does amortized O(1) work per indicator
+(O(log n) where a heap of pending levels is involved) and returns the events that the
+new candle made known: new fair value gaps and their mitigation, confirmed swing
+pivots, BOS/CHoCH breaks, order blocks, liquidity groups and sweeps, previous high/low
+breaks and session changes.
+
+Some indicators can only be decided with hindsight: a swing pivot is confirmed
+swing_length candles after it, the highest high of a run of swing highs is only known
+once a swing low follows, and order blocks depend on the last pivot before each candle.
+Events are therefore emitted as soon as the answer can no longer change, and
+SMCStream.snapshot() resolves the pending tail so that it returns exactly what the smc
+functions return on the candles pushed so far.
+
+The one deliberate difference is liquidity: smc.liquidity sizes its range from the
+high-low range of the whole history, which changes as candles arrive, so the stream
+takes the range as an absolute price distance (liquidity_range).
+"""
+from __future__ import annotations
+
+import copy
+import heapq
+import operator
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from smartmoneyconcepts.smc import _DEFAULT_SESSIONS, _segmented_any, _session_bounds
+
+_COMPARE = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+
+
+class StreamEvent(NamedTuple):
+    """
+    Something that became known when candle ``bar`` was pushed.
+
+    ``index`` is the row of the indicator the event belongs to (the gap, pivot, structure,
+    order block or liquidity candle), ``values`` holds the event's fields.
+    """
+
+    kind: str
+    index: int
+    bar: int
+    values: dict
+
+
+class _Crossings:
+    """
+    First candle at or after a start whose value is side of a level, for levels added over time.
+
+    Levels not crossed yet wait in a heap ordered so that a new candle only pops the ones it
+    crosses. Results are kept in ``found`` by key.
+    """
+
+    def __init__(self, values: list, side: str):
+        self.values = values
+        self.compare = _COMPARE[side]
+        self.sign = 1 if side in (">", ">=") else -1
+        self.pending = []
+        self.found = {}
+
+    def add(self, key, start: int, level: float) -> None:
+        for j in range(start, len(self.values)):
+            if self.compare(self.values[j], level):
+                self.found[key] = j
+                return
+        if level == level:  # a NaN level is never crossed
+            heapq.heappush(self.pending, (self.sign * level, key))
+
+    def update(self, index: int) -> list:
+        """Resolve the pending levels crossed by candle index and return their keys."""
+        value = self.values[index]
+        crossed = []
+        while self.pending and self.compare(value, self.sign * self.pending[0][0]):
+            _, key = heapq.heappop(self.pending)
+            self.found[key] = index
+            crossed.append(key)
+        return crossed
+
+
+class SMCStream:
+    """
+    Incremental version of the smc indicators for one instrument.
+
+    parameters:
+    swing_length: int - the swing_length of smc.swing_highs_lows
+    join_consecutive: bool - the join_consecutive of smc.fvg
+    close_break: bool - the close_break of smc.bos_choch
+    close_mitigation: bool - the close_mitigation of smc.ob
+    liquidity_range: float - the price distance of smc.liquidity, i.e. range_percent times the expected high-low range (None to skip liquidity)
+    time_frame: str - the time_frame of smc.previous_high_low
+    sessions: list or dict - the sessions of smc.sessions_multi
+    time_zone: str - the time zone of the candle timestamps, as in smc.sessions
+    """
+
+    def __init__(
+        self,
+        swing_length: int = 50,
+        join_consecutive: bool = False,
+        close_break: bool = True,
+        close_mitigation: bool = False,
+        liquidity_range: float = None,
+        time_frame: str = "1D",
+        sessions=("Asia", "London", "NYAM", "NYPM"),
+        time_zone: str = "UTC",
+    ):
+        self.swing_length = swing_length
+        self.join_consecutive = join_consecutive
+        self.close_break = close_break
+        self.close_mitigation = close_mitigation
+        self.liquidity_range = liquidity_range
+        self.time_frame = time_frame
+        self.time_zone = time_zone
+
+        self._time = []
+        self._open = []
+        self._high = []
+        self._low = []
+        self._close = []
+        self._volume = []
+
+        # fair value gaps: index -> [direction, top, bottom, mitigated index]
+        self._fvg = {}
+        self._fvg_pending = {1: [], -1: []}
+
+        # swings: sliding window extremes over the last 2 * swing_length candles
+        self._max_window = deque()
+        self._min_window = deque()
+        self._nan_high = deque()
+        self._nan_low = deque()
+        self._run = None  # [kind, index, level] of the best candidate of the current run
+        self._pivots = []  # (index, kind, level) of the final pivots
+
+        # bos/choch: target index -> [bos, choch, level]
+        up, down = (self._close, self._close) if close_break else (self._high, self._low)
+        self._breaks = {1: _Crossings(up, ">"), -1: _Crossings(down, "<")}
+        self._structures = {}
+        self._unbroken = set()
+        self._broken_structures = []  # sorted indices of the broken structures
+        self._alive = []  # sorted indices of the structures reported and not removed
+
+        # order blocks, processed up to (not including) candle _ob_next
+        self._ob_next = 0
+        self._ob_pivot = 0
+        self._last_pivot = {1: None, -1: None}
+        self._crossed = set()
+        self._ob = {1: {}, -1: {}}  # index -> [top, bottom, volume, mitigated index, percentage]
+        self._ob_active = {1: [], -1: []}
+        self._ob_breaker = {1: [], -1: []}
+
+        # liquidity: leader index -> [range low, range high, level sum, count, end]
+        self._sweeps = {1: _Crossings(self._high, ">="), -1: _Crossings(self._low, "<=")}
+        self._leaders = {1: {}, -1: {}}
+        self._leader_ranges = {1: [], -1: []}  # sorted (range low, index) of the open leaders
+
+        # previous high/low: one entry per non-empty time_frame bucket; like resample().dropna(),
+        # only the buckets with an open, high, low and close count as periods (kept)
+        self._offset = pd.tseries.frequencies.to_offset(time_frame)
+        self._tick = isinstance(self._offset, pd.offsets.Tick)
+        self._label = None  # label of the current bucket
+        self._label_day = None  # (day, label) of the last calendar day resolved by resampling
+        self._bucket_high = []
+        self._bucket_low = []
+        self._bucket_kept = []
+        self._priced = None  # which of open, high, low and close the current bucket has
+        self._kept_buckets = []
+        self._candle_bucket = []
+        self._after_label = []  # whether each candle is later than its bucket's label
+        self._phl_period = None
+        self._phl_max = np.nan
+        self._phl_min = np.nan
+        self._phl_last = (np.nan, np.nan, 0, 0)  # previous high, low and their breaks at the last candle
+
+        # sessions: name -> (start, end) in minutes of the day
+        if isinstance(sessions, dict):
+            self._session_bounds = {name: _session_bounds(*times) for name, times in sessions.items()}
+        else:
+            self._session_bounds = {
+                name: _session_bounds(_DEFAULT_SESSIONS[name]["start"], _DEFAULT_SESSIONS[name]["end"])
+                for name in sessions
+            }
+        self._sessions = {name: ([], [], []) for name in self._session_bounds}
+
+    def __len__(self) -> int:
+        return len(self._close)
+
+    def update(self, timestamp, open: float, high: float, low: float, close: float, volume: float = 0.0) -> list:
+        """
+        Push the next closed candle and return the list of StreamEvent it produced.
+        Candles must arrive in time order.
+        """
+        t = len(self._close)
+        self._time.append(pd.Timestamp(timestamp))
+        self._open.append(float(open))
+        self._high.append(float(high))
+        self._low.append(float(low))
+        self._close.append(float(close))
+        self._volume.append(float(volume))
+
+        events = []
+        self._update_sessions(t, events)
+        self._update_previous_high_low(t, events)
+        self._update_fvg(t, events)
+        self._update_crossings(t, events)
+        self._update_swings(t, events)
+        if self._run is not None:
+            # order blocks need the last pivot before each candle to be final
+            self._update_ob(self._run[1] + 1, events)
+        return events
+
+    def extend(self, ohlc: pd.DataFrame) -> list:
+        """Push every row of an ohlc(v) DataFrame indexed by timestamp and return all their events."""
+        ohlc = ohlc.rename(columns={c: c.lower() for c in ohlc.columns})
+        volume = ohlc["volume"] if "volume" in ohlc.columns else np.zeros(len(ohlc))
+        events = []
+        for row in zip(ohlc.index, ohlc["open"], ohlc["high"], ohlc["low"], ohlc["close"], volume):
+            events.extend(self.update(*row))
+        return events
+
+    # fair value gaps
+
+    def _update_fvg(self, t: int, events: list) -> None:
+        gap = None
+        r = t - 1
+        if r >= 1:
+            bullish = self._close[r] > self._open[r]
+            if (bullish and self._high[r - 1] < self._low[t]) or (
+                self._close[r] < self._open[r] and self._low[r - 1] > self._high[t]
+            ):
+                if bullish:
+                    gap = [1, self._low[t], self._high[r - 1], 0]
+                else:
+                    gap = [-1, self._low[r - 1], self._high[t], 0]
+                replaces = None
+                previous = self._fvg.get(r - 1)
+                if self.join_consecutive and previous is not None and previous[0] == gap[0]:
+                    gap[1] = max(previous[1], gap[1])
+                    gap[2] = min(previous[2], gap[2])
+                    del self._fvg[r - 1]
+                    replaces = r - 1
+                self._fvg[r] = gap
+                events.append(
+                    StreamEvent("fvg", r, t, {"direction": gap[0], "top": gap[1], "bottom": gap[2], "replaces": replaces})
+                )
+
+        # a bullish gap is mitigated by a low at or below its top, a bearish one by a high at or above its bottom
+        for direction, value, sign in ((1, self._low[t], -1), (-1, self._high[t], 1)):
+            pending = self._fvg_pending[direction]
+            while pending and (value <= -pending[0][0] if direction == 1 else value >= pending[0][0]):
+                _, index = heapq.heappop(pending)
+                record = self._fvg.get(index)
+                if record is None or record[0] != direction or record[3]:
+                    continue  # joined into a later gap
+                record[3] = t
+                events.append(StreamEvent("fvg_mitigated", index, t, {"direction": direction, "mitigated_index": t}))
+
+        if gap is not None:
+            level = -gap[1] if gap[0] == 1 else gap[2]
+            heapq.heappush(self._fvg_pending[gap[0]], (level, r))
+
+    # swings
+
+    def _update_swings(self, t: int, events: list) -> None:
+        window = 2 * self.swing_length
+        high, low = self._high[t], self._low[t]
+        if high != high:
+            self._nan_high.append(t)
+        else:
+            while self._max_window and self._high[self._max_window[-1]] <= high:
+                self._max_window.pop()
+            self._max_window.append(t)
+        if low != low:
+            self._nan_low.append(t)
+        else:
+            while self._min_window and self._low[self._min_window[-1]] >= low:
+                self._min_window.pop()
+            self._min_window.append(t)
+        for candles in (self._max_window, self._min_window, self._nan_high, self._nan_low):
+            while candles and candles[0] <= t - window:
+                candles.popleft()
+
+        # candle k is a candidate once the swing_length candles after it are known
+        k = t - self.swing_length
+        if k < window - 1:
+            return
+        if not self._nan_high and self._high[k] == self._high[self._max_window[0]]:
+            self._add_candidate(k, 1, t, events)
+        elif not self._nan_low and self._low[k] == self._low[self._min_window[0]]:
+            self._add_candidate(k, -1, t, events)
+
+    def _level(self, index: int, kind: int) -> float:
+        return self._high[index] if kind == 1 else self._low[index]
+
+    def _add_candidate(self, k: int, kind: int, t: int, events: list) -> None:
+        level = self._level(k, kind)
+        self._breaks[kind].add(k, k + 2, float(np.float32(level)))
+        if self.liquidity_range is not None:
+            self._sweeps[kind].add(k, k + 1, level + kind * self.liquidity_range)
+
+        if self._run is None:
+            # the first candle is an artificial pivot opposite to the first one
+            if self.liquidity_range is not None:
+                self._sweeps[-kind].add(0, 1, self._level(0, -kind) - kind * self.liquidity_range)
+            self._add_pivot(0, -kind, t, events)
+            self._run = [kind, k, level]
+        elif self._run[0] == kind:
+            # a run of same-side candidates keeps its first highest high or lowest low
+            if (level > self._run[2]) if kind == 1 else (level < self._run[2]):
+                self._run[1:] = [k, level]
+        else:
+            self._add_pivot(self._run[1], self._run[0], t, events)
+            self._run = [kind, k, level]
+
+    def _add_pivot(self, index: int, kind: int, t: int, events: list) -> None:
+        level = self._level(index, kind)
+        self._pivots.append((index, kind, level))
+        events.append(StreamEvent("swing", index, t, {"direction": kind, "level": level}))
+        self._detect_structure(t, events)
+        if self.liquidity_range is not None:
+            self._group_liquidity(index, kind, level, t, events)
+
+    # bos / choch
+
+    def _detect_structure(self, t: int, events: list) -> None:
+        if len(self._pivots) < 4:
+            return
+        (_, h4, l4), (target, h3, l3), (_, h2, l2), (_, h1, l1) = self._pivots[-4:]
+        bullish = h4 == -1 and h3 == 1 and h2 == -1 and h1 == 1
+        bearish = h4 == 1 and h3 == -1 and h2 == 1 and h1 == -1
+        bos = choch = 0
+        if bullish and l4 < l2 < l3 < l1:
+            bos = 1
+        elif bearish and l4 > l2 > l3 > l1:
+            bos = -1
+        if bullish and l1 > l3 > l4 > l2:
+            choch = 1
+        elif bearish and l1 < l3 < l4 < l2:
+            choch = -1
+        if not (bos or choch):
+            return
+        self._structures[target] = [bos, choch, np.float32(l3)]
+        broken = self._breaks[h3].found.get(target)
+        if broken is None:
+            self._unbroken.add(target)
+        else:
+            self._structure_broken(target, broken, t, events)
+
+    def _structure_broken(self, target: int, broken: int, t: int, events: list) -> None:
+        breaks = self._structure_break
+        later = self._broken_structures[bisect_right(self._broken_structures, target):]
+        insort(self._broken_structures, target)
+        # a structure broken after a later one was broken is removed, see smc.bos_choch
+        if any(breaks(i) <= broken for i in later):
+            return
+        position = bisect_left(self._alive, target)
+        removed = []
+        while position > 0 and breaks(self._alive[position - 1]) >= broken:
+            position -= 1
+            removed.append(self._alive.pop(position))
+        for index in removed:
+            bos, choch, level = self._structures[index]
+            events.append(StreamEvent("bos_removed" if bos else "choch_removed", index, t, {}))
+        self._alive.insert(position, target)
+        bos, choch, level = self._structures[target]
+        events.append(
+            StreamEvent(
+                "bos" if bos else "choch",
+                target,
+                t,
+                {"direction": bos or choch, "level": float(level), "broken_index": broken},
+            )
+        )
+
+    def _structure_break(self, target: int) -> int:
+        bos, choch, _ = self._structures[target]
+        return self._breaks[bos or choch].found[target]
+
+    # order blocks
+
+    def _update_ob(self, limit: int, events: list) -> None:
+        while self._ob_next < limit:
+            c = self._ob_next
+            self._ob_next += 1
+            while self._ob_pivot < len(self._pivots) and self._pivots[self._ob_pivot][0] < c:
+                index, kind, _ = self._pivots[self._ob_pivot]
+                self._last_pivot[kind] = index
+                self._ob_pivot += 1
+            for direction in (1, -1):
+                self._update_ob_direction(direction, c, events)
+
+    def _update_ob_direction(self, direction: int, c: int, events: list) -> None:
+        _open, _high, _low, _close = self._open[c], self._high[c], self._low[c], self._close[c]
+        blocks = self._ob[direction]
+        active = self._ob_active[direction]
+        breaker = self._ob_breaker[direction]
+
+        # a mitigated (breaker) block is removed once price trades back through its other side,
+        # a bullish block is mitigated below its bottom and a bearish one above its top
+        if direction == 1:
+            while breaker and _high > breaker[0][0]:
+                _, index = heapq.heappop(breaker)
+                del blocks[index]
+                events.append(StreamEvent("ob_removed", index, c, {"direction": direction}))
+            value = min(_open, _close) if self.close_mitigation else _low
+            while active and value < -active[0][0]:
+                _, index = heapq.heappop(active)
+                blocks[index][3] = c - 1
+                if blocks[index][0] == blocks[index][0]:  # a NaN top is never traded through
+                    heapq.heappush(breaker, (float(blocks[index][0]), index))
+                events.append(StreamEvent("ob_mitigated", index, c, {"direction": direction, "mitigated_index": c - 1}))
+        else:
+            while breaker and _low < -breaker[0][0]:
+                _, index = heapq.heappop(breaker)
+                del blocks[index]
+                events.append(StreamEvent("ob_removed", index, c, {"direction": direction}))
+            value = max(_open, _close) if self.close_mitigation else _high
+            while active and value > active[0][0]:
+                _, index = heapq.heappop(active)
+                blocks[index][3] = c
+                if blocks[index][1] == blocks[index][1]:
+                    heapq.heappush(breaker, (-float(blocks[index][1]), index))
+                events.append(StreamEvent("ob_mitigated", index, c, {"direction": direction, "mitigated_index": c}))
+
+        # a close through the last swing high (low) forms a bullish (bearish) block on the lowest
+        # (highest) candle since that swing
+        last = self._last_pivot[direction]
+        if last is None or last in self._crossed:
+            return
+        if not (_close > self._high[last] if direction == 1 else _close < self._low[last]):
+            return
+        self._crossed.add(last)
+        index = c - 1
+        ob_top, ob_btm = (self._low[index], self._high[index]) if direction == 1 else (self._high[index], self._low[index])
+        if c - last > 1:
+            segment = np.asarray((self._low if direction == 1 else self._high)[last + 1 : c])
+            extreme = segment.min() if direction == 1 else segment.max()
+            candidates = np.nonzero(segment == extreme)[0]
+            if candidates.size:
+                # in case of ties, take the last occurrence
+                index = last + 1 + int(candidates[-1])
+                ob_top, ob_btm = self._high[index], self._low[index]
+
+        vol_cur = self._volume[c]
+        vol_prev1 = self._volume[c - 1] if c >= 1 else 0.0
+        vol_prev2 = self._volume[c - 2] if c >= 2 else 0.0
+        if direction == 1:
+            low_volume, high_volume = np.float32(vol_prev2), np.float32(vol_cur + vol_prev1)
+        else:
+            low_volume, high_volume = np.float32(vol_cur + vol_prev1), np.float32(vol_prev2)
+        max_vol = max(high_volume, low_volume)
+        percentage = (min(high_volume, low_volume) / max_vol * 100.0) if max_vol != 0 else 100.0
+        top, bottom = np.float32(ob_top), np.float32(ob_btm)
+        blocks[index] = [top, bottom, np.float32(vol_cur + vol_prev1 + vol_prev2), 0, np.float32(percentage)]
+        level = -float(bottom) if direction == 1 else float(top)
+        if level == level:  # a block with a NaN side is never mitigated
+            heapq.heappush(active, (level, index))
+        events.append(
+            StreamEvent(
+                "ob",
+                index,
+                c,
+                {
+                    "direction": direction,
+                    "top": float(top),
+                    "bottom": float(bottom),
+                    "volume": float(blocks[index][2]),
+                    "percentage": float(blocks[index][4]),
+                },
+            )
+        )
+
+    # liquidity
+
+    def _group_liquidity(self, index: int, kind: int, level: float, t: int, events: list) -> None:
+        pip_range = self.liquidity_range
+        leaders = self._leaders[kind]
+        ranges = self._leader_ranges[kind]
+        swept = self._sweeps[kind].found
+
+        # a pivot joins the first open leader whose range holds its level
+        slack = 1e-9 * (abs(level) + abs(pip_range))
+        start = bisect_left(ranges, (level - 2 * pip_range - slack,))
+        end = bisect_right(ranges, (level, float("inf")))
+        best = None
+        closed = []
+        for position in range(start, end):
+            leader = ranges[position][1]
+            range_low, range_high = leaders[leader][:2]
+            if swept.get(leader, index + 1) <= index:
+                # swept before this pivot, so before every later one too
+                closed.append(position)
+            elif range_low <= level <= range_high and (best is None or leader < best):
+                best = leader
+        for position in reversed(closed):
+            del ranges[position]
+
+        if best is None:
+            leaders[index] = [level - pip_range, level + pip_range, level, 1, None]
+            insort(ranges, (level - pip_range, index))
+            return
+        group = leaders[best]
+        group[2] += level
+        group[3] += 1
+        group[4] = index
+        events.append(StreamEvent("liquidity", best, t, self._liquidity_values(kind, best, group)))
+
+    def _liquidity_values(self, kind: int, leader: int, group: list) -> dict:
+        return {
+            "direction": kind,
+            "level": float(np.float32(group[2] / group[3])),
+            "end": group[4],
+            "swept": self._sweeps[kind].found.get(leader, 0),
+        }
+
+    # crossings of pending levels (structure breaks and liquidity sweeps)
+
+    def _update_crossings(self, t: int, events: list) -> None:
+        for kind in (1, -1):
+            for target in self._breaks[kind].update(t):
+                if target in self._unbroken:
+                    self._unbroken.discard(target)
+                    self._structure_broken(target, t, t, events)
+            if self.liquidity_range is None:
+                continue
+            for leader in self._sweeps[kind].update(t):
+                group = self._leaders[kind].get(leader)
+                if group is not None and group[3] > 1:
+                    events.append(StreamEvent("liquidity_swept", leader, t, self._liquidity_values(kind, leader, group)))
+
+    # previous high / low
+
+    def _bucket_label(self, timestamp: pd.Timestamp) -> pd.Timestamp:
+        """Label of the time_frame bucket holding timestamp, as smc.previous_high_low resamples."""
+        origin = self._time[0]
+        if self._tick:
+            origin = origin.normalize()
+            return origin + ((timestamp - origin) // self._offset) * self._offset
+        # calendar offsets put every candle of a day in the same bucket
+        day = timestamp.normalize()
+        if self._label_day is None or self._label_day[0] != day:
+            index = pd.DatetimeIndex([origin, timestamp])
+            self._label_day = (day, pd.Series([0, 0], index=index).resample(self.time_frame).count().index[-1])
+        return self._label_day[1]
+
+    def _update_previous_high_low(self, t: int, events: list) -> None:
+        timestamp, high, low = self._time[t], self._high[t], self._low[t]
+        label = self._bucket_label(timestamp)
+        if label != self._label:
+            self._label = label
+            self._bucket_high.append(np.nan)
+            self._bucket_low.append(np.nan)
+            self._bucket_kept.append(False)
+            self._priced = [False] * 4
+        bucket = len(self._bucket_kept) - 1
+        if not high <= self._bucket_high[-1]:
+            self._bucket_high[-1] = high if high == high else self._bucket_high[-1]
+        if not low >= self._bucket_low[-1]:
+            self._bucket_low[-1] = low if low == low else self._bucket_low[-1]
+        if not self._bucket_kept[-1]:
+            for i, value in enumerate((self._open[t], high, low, self._close[t])):
+                self._priced[i] = self._priced[i] or value == value
+            if all(self._priced):
+                self._bucket_kept[-1] = True
+                self._kept_buckets.append(bucket)
+        self._candle_bucket.append(bucket)
+        self._after_label.append(label < timestamp)
+
+        # the periods labelled before this candle, the last of which is still open; a bucket
+        # that gets its missing prices later is counted from then on (snapshot counts it for
+        # all its candles, as the batch function does)
+        kept = self._bucket_kept[-1]
+        periods_before = len(self._kept_buckets) - kept + (kept and label < timestamp)
+        period = periods_before - 2
+        if period != self._phl_period:
+            self._phl_period = period
+            self._phl_max = self._phl_min = np.nan
+        if not high <= self._phl_max:
+            self._phl_max = high if high == high else self._phl_max
+        if not low >= self._phl_min:
+            self._phl_min = low if low == low else self._phl_min
+
+        previous_high = previous_low = np.float32(np.nan)
+        broken_high = broken_low = 0
+        if periods_before > 1:
+            previous_high = np.float32(self._bucket_high[self._kept_buckets[period]])
+            previous_low = np.float32(self._bucket_low[self._kept_buckets[period]])
+            # the running max (min) is NaN on a candle without a high (low), which breaks nothing
+            broken_high = int(high == high and self._phl_max > float(previous_high))
+            broken_low = int(low == low and self._phl_min < float(previous_low))
+            last_high, last_low, last_broken_high, last_broken_low = self._phl_last
+            if broken_high and not (last_broken_high and last_high == previous_high):
+                events.append(StreamEvent("previous_high_broken", t, t, {"level": float(previous_high)}))
+            if broken_low and not (last_broken_low and last_low == previous_low):
+                events.append(StreamEvent("previous_low_broken", t, t, {"level": float(previous_low)}))
+        self._phl_last = (previous_high, previous_low, broken_high, broken_low)
+
+    def _previous_high_low_frame(self) -> pd.DataFrame:
+        """The previous_high_low of every candle, from the final kept state of their buckets."""
+        n = len(self._close)
+        previous_high = np.full(n, np.nan, dtype=np.float32)
+        previous_low = np.full(n, np.nan, dtype=np.float32)
+        broken_high = np.zeros(n, dtype=np.int32)
+        broken_low = np.zeros(n, dtype=np.int32)
+        kept = np.array(self._bucket_kept, dtype=bool)
+        if kept.sum() >= 2:
+            bucket = np.array(self._candle_bucket, dtype=np.int64)
+            periods_before = (np.cumsum(kept) - kept)[bucket] + (kept[bucket] & np.array(self._after_label, dtype=bool))
+            period = periods_before - 2
+            valid = periods_before > 1
+            period_high = np.array(self._bucket_high)[kept]
+            period_low = np.array(self._bucket_low)[kept]
+            previous_high[valid] = period_high[period[valid]]
+            previous_low[valid] = period_low[period[valid]]
+
+            high, low = np.array(self._high), np.array(self._low)
+            new_segment = np.diff(period, prepend=period[0] - 1) != 0
+            above = _segmented_any(high > previous_high, new_segment)
+            below = _segmented_any(low < previous_low, new_segment)
+            broken_high = (valid & ~np.isnan(high) & above).astype(np.int32)
+            broken_low = (valid & ~np.isnan(low) & below).astype(np.int32)
+        return _frame(PreviousHigh=previous_high, PreviousLow=previous_low, BrokenHigh=broken_high, BrokenLow=broken_low)
+
+    # sessions
+
+    def _update_sessions(self, t: int, events: list) -> None:
+        timestamp = self._time[t]
+        if self.time_zone != "UTC":
+            time_zone = self.time_zone.replace("GMT", "Etc/GMT").replace("UTC", "Etc/GMT")
+            timestamp = timestamp.tz_localize(time_zone).tz_convert("UTC")
+        minute = timestamp.hour * 60 + timestamp.minute
+        high, low = self._high[t], self._low[t]
+
+        for name, (start, end) in self._session_bounds.items():
+            active, session_high, session_low = self._sessions[name]
+            if (start < end and start <= minute <= end) or (start >= end and (start <= minute or minute <= end)):
+                previous_high = float(session_high[-1]) if t > 0 else 0
+                previous_low = float(session_low[-1]) if t > 0 and session_low[-1] != 0 else float("inf")
+                if not (t > 0 and active[-1]):
+                    events.append(StreamEvent("session_start", t, t, {"session": name}))
+                active.append(1)
+                session_high.append(np.float32(max(high, previous_high)))
+                session_low.append(np.float32(min(low, previous_low)))
+            else:
+                if t > 0 and active[-1]:
+                    events.append(StreamEvent("session_end", t, t, {"session": name}))
+                active.append(0)
+                session_high.append(np.float32(0))
+                session_low.append(np.float32(0))
+
+    # results
+
+    def _finish(self) -> None:
+        """Resolve the pending tail as if no more candles were coming."""
+        n = len(self._close)
+        events = []
+        if self._run is not None:
+            kind = self._run[0]
+            self._add_pivot(self._run[1], kind, n - 1, events)
+            self._add_pivot(n - 1, -kind, n - 1, events)
+            self._run = None
+        self._update_ob(n, events)
+
+    def snapshot(self) -> dict:
+        """
+        The indicators over every candle pushed so far, keyed by smc method name
+        ("fvg", "swing_highs_lows", "bos_choch", "ob", "liquidity", "previous_high_low", "sessions").
+        Each DataFrame equals the one the smc method returns for the same candles; liquidity
+        uses liquidity_range as the price distance and is only included when it is set.
+        """
+        # the candle history is append-only, so the copy can share it
+        memo = {id(values): values for values in (self._time, self._open, self._high, self._low, self._close, self._volume)}
+        final = copy.deepcopy(self, memo)
+        final._finish()
+        return final._frames()
+
+    def _frames(self) -> dict:
+        n = len(self._close)
+        frames = {}
+
+        fvg = np.full(n, np.nan)
+        top = np.full(n, np.nan)
+        bottom = np.full(n, np.nan)
+        mitigated_index = np.zeros(n, dtype=np.int32)
+        for index, (direction, gap_top, gap_bottom, mitigated) in self._fvg.items():
+            fvg[index], top[index], bottom[index], mitigated_index[index] = direction, gap_top, gap_bottom, mitigated
+        mitigated_index = np.where(np.isnan(fvg), np.nan, mitigated_index)
+        frames["fvg"] = _frame(FVG=fvg, Top=top, Bottom=bottom, MitigatedIndex=mitigated_index)
+
+        swing_hl = np.full(n, np.nan)
+        swing_level = np.full(n, np.nan)
+        for index, kind, level in self._pivots:
+            swing_hl[index], swing_level[index] = kind, level
+        frames["swing_highs_lows"] = _frame(HighLow=swing_hl, Level=swing_level)
+
+        bos = np.zeros(n, dtype=np.int32)
+        choch = np.zeros(n, dtype=np.int32)
+        level = np.zeros(n, dtype=np.float32)
+        broken = np.zeros(n, dtype=np.int32)
+        detected = np.array(sorted(self._structures), dtype=np.int64)
+        for target in detected:
+            bos[target], choch[target], level[target] = self._structures[target]
+            broken[target] = self._breaks[int(bos[target] or choch[target])].found.get(target, 0)
+        if len(detected):
+            broken_at = np.where(broken[detected] != 0, broken[detected], n)
+            first_later_break = np.append(np.minimum.accumulate(broken_at[::-1])[::-1][1:], n)
+            removed = detected[broken[detected] >= first_later_break]
+            bos[removed] = choch[removed] = 0
+            level[removed] = 0
+        unbroken = ((bos != 0) | (choch != 0)) & (broken == 0)
+        bos[unbroken] = choch[unbroken] = 0
+        level[unbroken] = 0
+        frames["bos_choch"] = _frame(
+            BOS=np.where(bos != 0, bos, np.nan),
+            CHOCH=np.where(choch != 0, choch, np.nan),
+            Level=np.where(level != 0, level, np.nan),
+            BrokenIndex=np.where(broken != 0, broken, np.nan),
+        )
+
+        ob = np.zeros(n, dtype=np.int32)
+        top_arr = np.zeros(n, dtype=np.float32)
+        bottom_arr = np.zeros(n, dtype=np.float32)
+        ob_volume = np.zeros(n, dtype=np.float32)
+        ob_mitigated = np.zeros(n, dtype=np.int32)
+        percentage = np.zeros(n, dtype=np.float32)
+        for direction in (1, -1):
+            for index, block in self._ob[direction].items():
+                ob[index] = direction
+                top_arr[index], bottom_arr[index], ob_volume[index], ob_mitigated[index], percentage[index] = block
+        ob = np.where(ob != 0, ob, np.nan)
+        found = ~np.isnan(ob)
+        frames["ob"] = _frame(
+            OB=ob,
+            Top=np.where(found, top_arr, np.nan),
+            Bottom=np.where(found, bottom_arr, np.nan),
+            OBVolume=np.where(found, ob_volume, np.nan),
+            MitigatedIndex=np.where(found, ob_mitigated, np.nan),
+            Percentage=np.where(found, percentage, np.nan),
+        )
+
+        if self.liquidity_range is not None:
+            liquidity = np.full(n, np.nan, dtype=np.float32)
+            liquidity_level = np.full(n, np.nan, dtype=np.float32)
+            liquidity_end = np.full(n, np.nan, dtype=np.float32)
+            liquidity_swept = np.full(n, np.nan, dtype=np.float32)
+            for kind in (1, -1):
+                for leader, group in self._leaders[kind].items():
+                    if group[3] > 1:
+                        liquidity[leader] = kind
+                        liquidity_level[leader] = group[2] / group[3]
+                        liquidity_end[leader] = group[4]
+                        liquidity_swept[leader] = self._sweeps[kind].found.get(leader, 0)
+            frames["liquidity"] = _frame(
+                Liquidity=liquidity, Level=liquidity_level, End=liquidity_end, Swept=liquidity_swept
+            )
+
+        frames["previous_high_low"] = self._previous_high_low_frame()
+
+        frames["sessions"] = pd.concat(
+            {
+                name: _frame(
+                    Active=np.array(active, dtype=np.int32),
+                    High=np.array(session_high, dtype=np.float32),
+                    Low=np.array(session_low, dtype=np.float32),
+                )
+                for name, (active, session_high, session_low) in self._sessions.items()
+            },
+            axis=1,
+        )
+        return frames
+
+
+def _frame(**columns) -> pd.DataFrame:
+    return pd.concat([pd.Series(values, name=name) for name, values in columns.items()], axis=1)
@@ -7,7 +7,42 @@ import fs from "fs";
  * POST /api/export-smc-frames
  * Body: { symbol, timeframe?, allTimeframes?, last?, window? }
  * Runs the Python export script to update smc_results. Requires script and venv at repo root (parent of smc-viewer).
+ * With SMC_DAEMON_URL set, the export is handed to scripts/smc_daemon.py instead, which keeps
+ * the candles and the Python workers warm; the script is started only if the daemon does not answer.
  */
+
+type DaemonJob = {
+  timeframe: string;
+  status: "queued" | "running" | "done" | "failed";
+  result: string | null;
+  error: string | null;
+};
+
+/** The finished jobs of the export on the daemon, or null if it is not configured or not reachable. */
+async function exportWithDaemon(body: {
+  symbol: string;
+  timeframe: string;
+  allTimeframes: boolean;
+  last: number;
+  window: number;
+}): Promise<DaemonJob[] | null> {
+  const daemonUrl = process.env.SMC_DAEMON_URL;
+  if (!daemonUrl) return null;
+  let response: Response;
+  try {
+    response = await fetch(`${daemonUrl.replace(/\/$/, "")}/jobs?wait=1`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ ...body, saveToDb: true }),
+    });
+  } catch {
+    return null;
+  }
+  if (!response.ok) return null;
+  const data = (await response.json()) as { jobs: DaemonJob[] };
+  return data.jobs;
+}
+
 export async function POST(request: NextRequest) {
   try {
     const body = await request.json().catch(() => ({}));
@@ -24,6 +59,24 @@ export async function POST(request: NextRequest) {
       Math.max(50, Number(body.window) || 100)
     );
 
+    const jobs = await exportWithDaemon({ symbol, timeframe, allTimeframes, last, window });
+    if (jobs) {
+      const failed = jobs.filter((job) => job.status !== "done");
+      if (failed.length > 0) {
+        return NextResponse.json(
+          {
+            error: "Export failed",
+            detail: failed.map((job) => job.error || `${job.timeframe}: ${job.status}`).join("\n"),
+          },
+          { status: 502 }
+        );
+      }
+      return NextResponse.json({
+        ok: true,
+        message: jobs.map((job) => job.result).join("\n"),
+      });
+    }
+
     const cwd = process.cwd();
     const projectRoot = path.resolve(cwd, "..");
     const scriptPath = path.join(projectRoot, "scripts", "export_smc_frames.py");
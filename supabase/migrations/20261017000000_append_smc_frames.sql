@@ -0,0 +1,48 @@
+-- Append export frames to a public.smc_results row without sending the frames it already has.
+-- Used by smartmoneyconcepts.load_supabase.append_smc_results (export_smc_frames.py --append).
+--
+-- The new frames follow the stored last frame, whose timestamp must still be p_after (otherwise
+-- another export changed the row in between and the caller has to start over). The row keeps
+-- its last p_keep frames, renumbered from 0, and takes p_meta. Returns the frame count and the
+-- timestamp of the last frame after the append.
+create or replace function public.append_smc_frames(
+  p_symbol text,
+  p_timeframe text,
+  p_meta jsonb,
+  p_frames jsonb,
+  p_keep integer,
+  p_after text
+) returns jsonb
+language plpgsql
+as $$
+declare
+  stored jsonb;
+  merged jsonb;
+begin
+  select frames into stored
+  from public.smc_results
+  where symbol = p_symbol and timeframe = p_timeframe
+  for update;
+
+  if stored is null then
+    raise exception 'no smc_results row for % %', p_symbol, p_timeframe;
+  end if;
+  if stored -> -1 ->> 'timestamp' is distinct from p_after then
+    raise exception 'smc_results row for % % changed since %', p_symbol, p_timeframe, p_after;
+  end if;
+
+  select coalesce(jsonb_agg(jsonb_set(e.frame, '{index}', to_jsonb(e.pos - e.total + p_keep - 1)) order by e.pos), '[]'::jsonb)
+  into merged
+  from (
+    select f.value as frame, f.pos, count(*) over () as total
+    from jsonb_array_elements(stored || p_frames) with ordinality as f(value, pos)
+  ) e
+  where e.pos > e.total - p_keep;
+
+  update public.smc_results
+  set frames = merged, meta = p_meta, updated_at = now()
+  where symbol = p_symbol and timeframe = p_timeframe;
+
+  return jsonb_build_object('count', jsonb_array_length(merged), 'last', merged -> -1 -> 'timestamp');
+end;
+$$;
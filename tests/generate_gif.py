@@ -34,21 +34,22 @@ def load_csv_data(csv_path: str) -> pd.DataFrame:
     df = df.sort_index()
     return df
 
-def add_FVG(fig, df, fvg_data):
-    for i in range(len(fvg_data["FVG"])):
-        if not np.isnan(fvg_data["FVG"][i]):
+def add_FVG(fig, df, fvg_events):
+    for event in fvg_events:
+        i = int(event["index"])
+        if not np.isnan(event["FVG"]):
             x1 = int(
-                fvg_data["MitigatedIndex"][i]
-                if fvg_data["MitigatedIndex"][i] != 0
+                event["MitigatedIndex"]
+                if event["MitigatedIndex"] != 0
                 else len(df) - 1
             )
             fig.add_shape(
                 # filled Rectangle
                 type="rect",
                 x0=df.index[i],
-                y0=fvg_data["Top"][i],
+                y0=event["Top"],
                 x1=df.index[x1],
-                y1=fvg_data["Bottom"][i],
+                y1=event["Bottom"],
                 line=dict(
                     width=0,
                 ),
@@ -56,7 +57,7 @@ def add_FVG(fig, df, fvg_data):
                 opacity=0.2,
             )
             mid_x = round((i + x1) / 2)
-            mid_y = (fvg_data["Top"][i] + fvg_data["Bottom"][i]) / 2
+            mid_y = (event["Top"] + event["Bottom"]) / 2
             fig.add_trace(
                 go.Scatter(
                     x=[df.index[mid_x]],
@@ -98,16 +99,17 @@ def add_swing_highs_lows(fig, df, swing_highs_lows_data):
     return fig
 
 
-def add_bos_choch(fig, df, bos_choch_data):
-    for i in range(len(bos_choch_data["BOS"])):
-        if not np.isnan(bos_choch_data["BOS"][i]):
+def add_bos_choch(fig, df, bos_choch_events):
+    for event in bos_choch_events:
+        i = int(event["index"])
+        if not np.isnan(event["BOS"]):
             # add a label to this line
-            mid_x = round((i + int(bos_choch_data["BrokenIndex"][i])) / 2)
-            mid_y = bos_choch_data["Level"][i]
+            mid_x = round((i + int(event["BrokenIndex"])) / 2)
+            mid_y = event["Level"]
             fig.add_trace(
                 go.Scatter(
-                    x=[df.index[i], df.index[int(bos_choch_data["BrokenIndex"][i])]],
-                    y=[bos_choch_data["Level"][i], bos_choch_data["Level"][i]],
+                    x=[df.index[i], df.index[int(event["BrokenIndex"])]],
+                    y=[event["Level"], event["Level"]],
                     mode="lines",
                     line=dict(
                         color="rgba(255, 165, 0, 0.2)",
@@ -120,18 +122,18 @@ def add_bos_choch(fig, df, bos_choch_data):
                     y=[mid_y],
                     mode="text",
                     text="BOS",
-                    textposition="top center" if bos_choch_data["BOS"][i] == 1 else "bottom center",
+                    textposition="top center" if event["BOS"] == 1 else "bottom center",
                     textfont=dict(color="rgba(255, 165, 0, 0.4)", size=8),
                 )
             )
-        if not np.isnan(bos_choch_data["CHOCH"][i]):
+        if not np.isnan(event["CHOCH"]):
             # add a label to this line
-            mid_x = round((i + int(bos_choch_data["BrokenIndex"][i])) / 2)
-            mid_y = bos_choch_data["Level"][i]
+            mid_x = round((i + int(event["BrokenIndex"])) / 2)
+            mid_y = event["Level"]
             fig.add_trace(
                 go.Scatter(
-                    x=[df.index[i], df.index[int(bos_choch_data["BrokenIndex"][i])]],
-                    y=[bos_choch_data["Level"][i], bos_choch_data["Level"][i]],
+                    x=[df.index[i], df.index[int(event["BrokenIndex"])]],
+                    y=[event["Level"], event["Level"]],
                     mode="lines",
                     line=dict(
                         color="rgba(0, 0, 255, 0.2)",
@@ -144,7 +146,7 @@ def add_bos_choch(fig, df, bos_choch_data):
                     y=[mid_y],
                     mode="text",
                     text="CHOCH",
-                    textposition="top center" if bos_choch_data["CHOCH"][i] == 1 else "bottom center",
+                    textposition="top center" if event["CHOCH"] == 1 else "bottom center",
                     textfont=dict(color="rgba(0, 0, 255, 0.4)", size=8),
                 )
             )
@@ -152,7 +154,7 @@ def add_bos_choch(fig, df, bos_choch_data):
     return fig
 
 
-def add_OB(fig, df, ob_data):
+def add_OB(fig, df, ob_events):
     def format_volume(volume):
         if volume >= 1e12:
             return f"{volume / 1e12:.3f}T"
@@ -165,19 +167,20 @@ def add_OB(fig, df, ob_data):
         else:
             return f"{volume:.2f}"
 
-    for i in range(len(ob_data["OB"])):
-        if ob_data["OB"][i] == 1:
+    for event in ob_events:
+        i = int(event["index"])
+        if event["OB"] == 1:
             x1 = int(
-                ob_data["MitigatedIndex"][i]
-                if ob_data["MitigatedIndex"][i] != 0
+                event["MitigatedIndex"]
+                if event["MitigatedIndex"] != 0
                 else len(df) - 1
             )
             fig.add_shape(
                 type="rect",
                 x0=df.index[i],
-                y0=ob_data["Bottom"][i],
+                y0=event["Bottom"],
                 x1=df.index[x1],
-                y1=ob_data["Top"][i],
+                y1=event["Top"],
                 line=dict(color="Purple"),
                 fillcolor="Purple",
                 opacity=0.2,
@@ -186,15 +189,15 @@ def add_OB(fig, df, ob_data):
                 showlegend=True,
             )
 
-            if ob_data["MitigatedIndex"][i] > 0:
-                x_center = df.index[int(i + (ob_data["MitigatedIndex"][i] - i) / 2)]
+            if event["MitigatedIndex"] > 0:
+                x_center = df.index[int(i + (event["MitigatedIndex"] - i) / 2)]
             else:
                 x_center = df.index[int(i + (len(df) - i) / 2)]
 
-            y_center = (ob_data["Bottom"][i] + ob_data["Top"][i]) / 2
-            volume_text = format_volume(ob_data["OBVolume"][i])
+            y_center = (event["Bottom"] + event["Top"]) / 2
+            volume_text = format_volume(event["OBVolume"])
             # Add annotation text
-            annotation_text = f'OB: {volume_text} ({ob_data["Percentage"][i]}%)'
+            annotation_text = f'OB: {volume_text} ({event["Percentage"]}%)'
 
             fig.add_annotation(
                 x=x_center,
@@ -207,19 +210,20 @@ def add_OB(fig, df, ob_data):
                 showarrow=False,
             )
 
-    for i in range(len(ob_data["OB"])):
-        if ob_data["OB"][i] == -1:
+    for event in ob_events:
+        i = int(event["index"])
+        if event["OB"] == -1:
             x1 = int(
-                ob_data["MitigatedIndex"][i]
-                if ob_data["MitigatedIndex"][i] != 0
+                event["MitigatedIndex"]
+                if event["MitigatedIndex"] != 0
                 else len(df) - 1
             )
             fig.add_shape(
                 type="rect",
                 x0=df.index[i],
-                y0=ob_data["Bottom"][i],
+                y0=event["Bottom"],
                 x1=df.index[x1],
-                y1=ob_data["Top"][i],
+                y1=event["Top"],
                 line=dict(color="Purple"),
                 fillcolor="Purple",
                 opacity=0.2,
@@ -228,15 +232,15 @@ def add_OB(fig, df, ob_data):
                 showlegend=True,
             )
 
-            if ob_data["MitigatedIndex"][i] > 0:
-                x_center = df.index[int(i + (ob_data["MitigatedIndex"][i] - i) / 2)]
+            if event["MitigatedIndex"] > 0:
+                x_center = df.index[int(i + (event["MitigatedIndex"] - i) / 2)]
             else:
                 x_center = df.index[int(i + (len(df) - i) / 2)]
 
-            y_center = (ob_data["Bottom"][i] + ob_data["Top"][i]) / 2
-            volume_text = format_volume(ob_data["OBVolume"][i])
+            y_center = (event["Bottom"] + event["Top"]) / 2
+            volume_text = format_volume(event["OBVolume"])
             # Add annotation text
-            annotation_text = f'OB: {volume_text} ({ob_data["Percentage"][i]}%)'
+            annotation_text = f'OB: {volume_text} ({event["Percentage"]}%)'
 
             fig.add_annotation(
                 x=x_center,
@@ -251,45 +255,46 @@ def add_OB(fig, df, ob_data):
     return fig
 
 
-def add_liquidity(fig, df, liquidity_data):
+def add_liquidity(fig, df, liquidity_events):
     # draw a line horizontally for each liquidity level
-    for i in range(len(liquidity_data["Liquidity"])):
-        if not np.isnan(liquidity_data["Liquidity"][i]):
+    for event in liquidity_events:
+        i = int(event["index"])
+        if not np.isnan(event["Liquidity"]):
             fig.add_trace(
                 go.Scatter(
-                    x=[df.index[i], df.index[int(liquidity_data["End"][i])]],
-                    y=[liquidity_data["Level"][i], liquidity_data["Level"][i]],
+                    x=[df.index[i], df.index[int(event["End"])]],
+                    y=[event["Level"], event["Level"]],
                     mode="lines",
                     line=dict(
                         color="rgba(255, 165, 0, 0.2)",
                     ),
                 )
             )
-            mid_x = round((i + int(liquidity_data["End"][i])) / 2)
+            mid_x = round((i + int(event["End"])) / 2)
             fig.add_trace(
                 go.Scatter(
                     x=[df.index[mid_x]],
-                    y=[liquidity_data["Level"][i]],
+                    y=[event["Level"]],
                     mode="text",
                     text="Liquidity",
-                    textposition="top center" if liquidity_data["Liquidity"][i] == 1 else "bottom center",
+                    textposition="top center" if event["Liquidity"] == 1 else "bottom center",
                     textfont=dict(color="rgba(255, 165, 0, 0.4)", size=8),
                 )
             )
-        if liquidity_data["Swept"][i] != 0 and not np.isnan(liquidity_data["Swept"][i]):
+        if event["Swept"] != 0 and not np.isnan(event["Swept"]):
             # draw a red line between the end and the swept point
             fig.add_trace(
                 go.Scatter(
                     x=[
-                        df.index[int(liquidity_data["End"][i])],
-                        df.index[int(liquidity_data["Swept"][i])],
+                        df.index[int(event["End"])],
+                        df.index[int(event["Swept"])],
                     ],
                     y=[
-                        liquidity_data["Level"][i],
+                        event["Level"],
                         (
-                            df["high"].iloc[int(liquidity_data["Swept"][i])]
-                            if liquidity_data["Liquidity"][i] == 1
-                            else df["low"].iloc[int(liquidity_data["Swept"][i])]
+                            df["high"].iloc[int(event["Swept"])]
+                            if event["Liquidity"] == 1
+                            else df["low"].iloc[int(event["Swept"])]
                         ),
                     ],
                     mode="lines",
@@ -298,13 +303,13 @@ def add_liquidity(fig, df, liquidity_data):
                     ),
                 )
             )
-            mid_x = round((i + int(liquidity_data["Swept"][i])) / 2)
+            mid_x = round((i + int(event["Swept"])) / 2)
             mid_y = (
-                liquidity_data["Level"][i]
+                event["Level"]
                 + (
-                    df["high"].iloc[int(liquidity_data["Swept"][i])]
-                    if liquidity_data["Liquidity"][i] == 1
-                    else df["low"].iloc[int(liquidity_data["Swept"][i])]
+                    df["high"].iloc[int(event["Swept"])]
+                    if event["Liquidity"] == 1
+                    else df["low"].iloc[int(event["Swept"])]
                 )
             ) / 2
             fig.add_trace(
@@ -313,7 +318,7 @@ def add_liquidity(fig, df, liquidity_data):
                     y=[mid_y],
                     mode="text",
                     text="Liquidity Swept",
-                    textposition="top center" if liquidity_data["Liquidity"][i] == 1 else "bottom center",
+                    textposition="top center" if event["Liquidity"] == 1 else "bottom center",
                     textfont=dict(color="rgba(255, 0, 0, 0.4)", size=8),
                 )
             )
@@ -526,19 +531,20 @@ for pos in range(args.window, len(df)):
         ]
     )
 
-    fvg_data = smc.fvg(window_df, join_consecutive=True)
+    # only the candles with an event are needed to draw fvg, bos/choch, ob and liquidity
+    fvg_events = smc.fvg(window_df, join_consecutive=True, sparse=True)
     swing_highs_lows_data = smc.swing_highs_lows(window_df, swing_length=5)
-    bos_choch_data = smc.bos_choch(window_df, swing_highs_lows_data)
-    ob_data = smc.ob(window_df, swing_highs_lows_data)
-    liquidity_data = smc.liquidity(window_df, swing_highs_lows_data)
+    bos_choch_events = smc.bos_choch(window_df, swing_highs_lows_data, sparse=True)
+    ob_events = smc.ob(window_df, swing_highs_lows_data, sparse=True)
+    liquidity_events = smc.liquidity(window_df, swing_highs_lows_data, sparse=True)
     previous_high_low_data = smc.previous_high_low(window_df, time_frame="4h")
     sessions = smc.sessions(window_df, session="London")
     retracements = smc.retracements(window_df, swing_highs_lows_data)
-    fig = add_FVG(fig, window_df, fvg_data)
+    fig = add_FVG(fig, window_df, fvg_events)
     fig = add_swing_highs_lows(fig, window_df, swing_highs_lows_data)
-    fig = add_bos_choch(fig, window_df, bos_choch_data)
-    fig = add_OB(fig, window_df, ob_data)
-    fig = add_liquidity(fig, window_df, liquidity_data)
+    fig = add_bos_choch(fig, window_df, bos_choch_events)
+    fig = add_OB(fig, window_df, ob_events)
+    fig = add_liquidity(fig, window_df, liquidity_events)
     fig = add_previous_high_low(fig, window_df, previous_high_low_data)
     fig = add_sessions(fig, window_df, sessions)
     fig = add_retracements(fig, window_df, retracements)
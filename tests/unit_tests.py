@@ -3,12 +3,31 @@
 import os
 import sys
 import time
+import json
+import numpy as np
 import pandas as pd
 import unittest
+import tempfile
+import threading
+import urllib.parse
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
 BASE_DIR = os.path.dirname(__file__)
 sys.path.append(os.path.abspath(os.path.join(BASE_DIR, "..")))
-from smartmoneyconcepts.smc import smc
+from smartmoneyconcepts.smc import smc, SMCContext, set_backend, get_backend, _numba_kernels
+from smartmoneyconcepts.smc import INDEX_COLUMNS, dtype_policy, get_dtype_policy, set_dtype_policy
+from smartmoneyconcepts.smc import memo_clear, memo_info, set_memo_size
+from smartmoneyconcepts.smc import _crossing_table, _first_crossing
+from smartmoneyconcepts.frames import FrameEngine, nan_to_none
+from smartmoneyconcepts.frame_format import decode_frames, encode_frames
+from smartmoneyconcepts.frame_json import iter_frames_json, json_lists, json_tokens
+from smartmoneyconcepts.stream import SMCStream
+from smartmoneyconcepts.profiling import get_profiler, profile
+from smartmoneyconcepts import load_supabase
+from smartmoneyconcepts.candle_cache import CandleCache
 
 # define and import test data
 test_instrument = "EURUSD"
@@ -18,6 +37,98 @@ df = pd.read_csv(os.path.join(TEST_DATA_DIR, instrument_data))
 df = df.set_index("Date")
 df.index = pd.to_datetime(df.index)
 
+def _baseline_ob(_open, _high, _low, _close, _volume, swing_hl, close_mitigation):
+    """The candle by candle order block scan the kernels replaced, as a reference."""
+    ohlc_len = len(_open)
+    crossed = np.full(ohlc_len, False, dtype=bool)
+    ob = np.zeros(ohlc_len, dtype=np.int32)
+    top_arr = np.zeros(ohlc_len, dtype=np.float32)
+    bottom_arr = np.zeros(ohlc_len, dtype=np.float32)
+    obVolume = np.zeros(ohlc_len, dtype=np.float32)
+    lowVolume = np.zeros(ohlc_len, dtype=np.float32)
+    highVolume = np.zeros(ohlc_len, dtype=np.float32)
+    percentage = np.zeros(ohlc_len, dtype=np.float32)
+    mitigated_index = np.zeros(ohlc_len, dtype=np.int32)
+    breaker = np.full(ohlc_len, False, dtype=bool)
+    swing_high_indices = np.flatnonzero(swing_hl == 1)
+    swing_low_indices = np.flatnonzero(swing_hl == -1)
+
+    def reset(idx):
+        ob[idx] = 0
+        top_arr[idx] = bottom_arr[idx] = obVolume[idx] = 0.0
+        lowVolume[idx] = highVolume[idx] = percentage[idx] = 0.0
+        mitigated_index[idx] = 0
+
+    def add(obIndex, close_index, obTop, obBtm, side):
+        ob[obIndex] = side
+        top_arr[obIndex] = obTop
+        bottom_arr[obIndex] = obBtm
+        vol_cur = _volume[close_index]
+        vol_prev1 = _volume[close_index - 1] if close_index >= 1 else 0.0
+        vol_prev2 = _volume[close_index - 2] if close_index >= 2 else 0.0
+        obVolume[obIndex] = vol_cur + vol_prev1 + vol_prev2
+        lowVolume[obIndex] = vol_prev2 if side == 1 else vol_cur + vol_prev1
+        highVolume[obIndex] = vol_cur + vol_prev1 if side == 1 else vol_prev2
+        max_vol = max(highVolume[obIndex], lowVolume[obIndex])
+        percentage[obIndex] = (min(highVolume[obIndex], lowVolume[obIndex]) / max_vol * 100.0) if max_vol != 0 else 100.0
+
+    active_bullish = []
+    for close_index in range(ohlc_len):
+        for idx in active_bullish.copy():
+            if breaker[idx]:
+                if _high[close_index] > top_arr[idx]:
+                    reset(idx)
+                    active_bullish.remove(idx)
+            elif ((not close_mitigation and _low[close_index] < bottom_arr[idx])
+                  or (close_mitigation and min(_open[close_index], _close[close_index]) < bottom_arr[idx])):
+                breaker[idx] = True
+                mitigated_index[idx] = close_index - 1
+        pos = np.searchsorted(swing_high_indices, close_index)
+        if pos > 0:
+            last_top_index = swing_high_indices[pos - 1]
+            if _close[close_index] > _high[last_top_index] and not crossed[last_top_index]:
+                crossed[last_top_index] = True
+                obIndex = close_index - 1
+                obBtm, obTop = _high[obIndex], _low[obIndex]
+                if close_index - last_top_index > 1:
+                    segment = _low[last_top_index + 1:close_index]
+                    candidates = np.nonzero(segment == segment.min())[0]
+                    if candidates.size:
+                        obIndex = last_top_index + 1 + candidates[-1]
+                        obBtm, obTop = _low[obIndex], _high[obIndex]
+                add(obIndex, close_index, obTop, obBtm, 1)
+                active_bullish.append(obIndex)
+
+    active_bearish = []
+    for close_index in range(ohlc_len):
+        for idx in active_bearish.copy():
+            if breaker[idx]:
+                if _low[close_index] < bottom_arr[idx]:
+                    reset(idx)
+                    active_bearish.remove(idx)
+            elif ((not close_mitigation and _high[close_index] > top_arr[idx])
+                  or (close_mitigation and max(_open[close_index], _close[close_index]) > top_arr[idx])):
+                breaker[idx] = True
+                mitigated_index[idx] = close_index
+        pos = np.searchsorted(swing_low_indices, close_index)
+        if pos > 0:
+            last_btm_index = swing_low_indices[pos - 1]
+            if _close[close_index] < _low[last_btm_index] and not crossed[last_btm_index]:
+                crossed[last_btm_index] = True
+                obIndex = close_index - 1
+                obTop, obBtm = _high[obIndex], _low[obIndex]
+                if close_index - last_btm_index > 1:
+                    segment = _high[last_btm_index + 1:close_index]
+                    candidates = np.nonzero(segment == segment.max())[0]
+                    if candidates.size:
+                        obIndex = last_btm_index + 1 + candidates[-1]
+                        obTop, obBtm = _high[obIndex], _low[obIndex]
+                add(obIndex, close_index, obTop, obBtm, -1)
+                active_bearish.append(obIndex)
+
+    return ob, top_arr, bottom_arr, obVolume, mitigated_index, percentage
+
+
 class TestSmartMoneyConcepts(unittest.TestCase):
     # to test each function in the smartmoneyconcepts package
     # each function will be called and the result will be compared to the result data
@@ -49,6 +160,21 @@ class TestSmartMoneyConcepts(unittest.TestCase):
         print("swing_highs_lows test time: ", time.time() - start_time)
         pd.testing.assert_frame_equal(swing_highs_lows_data, swing_highs_lows_result_data, check_dtype=False)
 
+    def test_swing_highs_lows_candidates(self):
+        swing_highs_lows_data = smc.swing_highs_lows(df, swing_length=5, return_candidates=True)
+        swing_highs_lows_result_data = pd.read_csv(
+            os.path.join(TEST_DATA_DIR, "swing_highs_lows_result_data.csv")
+        )
+        pd.testing.assert_frame_equal(
+            swing_highs_lows_data[["HighLow", "Level"]], swing_highs_lows_result_data, check_dtype=False
+        )
+        # every swing apart from the first and last candle is one of the candidates
+        candidates = swing_highs_lows_data["Candidate"].values[1:-1]
+        highs_lows = swing_highs_lows_data["HighLow"].values[1:-1]
+        swings = ~np.isnan(highs_lows)
+        self.assertTrue((candidates[swings] == highs_lows[swings]).all())
+        self.assertGreater(np.count_nonzero(~np.isnan(candidates)), np.count_nonzero(swings))
+
     def test_bos_choch(self):
         start_time = time.time()
         swing_highs_lows_data = smc.swing_highs_lows(df, swing_length=5)
@@ -124,6 +250,40 @@ class TestSmartMoneyConcepts(unittest.TestCase):
         print("previous_high_low test time: ", time.time() - start_time)
         pd.testing.assert_frame_equal(previous_high_low_data, previous_high_low_result_data, check_dtype=False)
 
+    def test_previous_high_low_multi(self):
+        start_time = time.time()
+        previous_high_low = smc.previous_high_low_multi(df, time_frames=["4h", "1D", "W"])
+        print("previous_high_low multi test time: ", time.time() - start_time)
+        self.assertEqual(list(previous_high_low.columns.levels[0]), ["4h", "1D", "W"])
+        for time_frame in ["4h", "1D", "W"]:
+            previous_high_low_result_data = pd.read_csv(
+                os.path.join(TEST_DATA_DIR, f"previous_high_low_result_data_{time_frame}.csv")
+            )
+            pd.testing.assert_frame_equal(
+                previous_high_low[time_frame], previous_high_low_result_data, check_dtype=False
+            )
+
+        # missing prices, other time zones and calendar periods match the single time frames
+        candles = df.copy()
+        candles.iloc[::97, 1] = np.nan
+        candles.iloc[::89, 2] = np.nan
+        # pandas < 2.2 (the last ones on Python 3.8) calls month end "M"
+        month_end = "ME" if tuple(int(v) for v in pd.__version__.split(".")[:2]) >= (2, 2) else "M"
+        time_frames = ["15min", "7h", "1D", "3D", "W", month_end]
+        for index in [candles.index, candles.index.tz_localize("UTC").tz_convert("America/New_York")]:
+            candles.index = index
+            previous_high_low = smc.previous_high_low_multi(candles, time_frames)
+            for time_frame in time_frames:
+                pd.testing.assert_frame_equal(
+                    previous_high_low[time_frame], smc.previous_high_low(candles, time_frame=time_frame)
+                )
+
+        # candles out of order give the same as previous_high_low
+        shuffled = df.sample(frac=1, random_state=0)
+        pd.testing.assert_frame_equal(
+            smc.previous_high_low_multi(shuffled, ["1D"])["1D"], smc.previous_high_low(shuffled, time_frame="1D")
+        )
+
     def test_sessions(self):
         start_time = time.time()
         sessions = smc.sessions(df, session="London")
@@ -133,6 +293,22 @@ class TestSmartMoneyConcepts(unittest.TestCase):
         print("sessions test time: ", time.time() - start_time)
         pd.testing.assert_frame_equal(sessions, sessions_result_data, check_dtype=False)
 
+    def test_sessions_multi(self):
+        start_time = time.time()
+        sessions = smc.sessions_multi(df, ["Asia", "London", "NYPM"])
+        sessions_result_data = pd.read_csv(
+            os.path.join(TEST_DATA_DIR, "sessions_result_data.csv")
+        )
+        print("sessions multi test time: ", time.time() - start_time)
+        self.assertEqual(list(sessions.columns.levels[0]), ["Asia", "London", "NYPM"])
+        pd.testing.assert_frame_equal(sessions["London"], sessions_result_data, check_dtype=False)
+        for session in ["Asia", "NYPM"]:
+            pd.testing.assert_frame_equal(sessions[session], smc.sessions(df, session=session))
+        custom = smc.sessions_multi(df, {"Overnight": ("22:00", "03:00")})
+        pd.testing.assert_frame_equal(
+            custom["Overnight"], smc.sessions(df, "Custom", "22:00", "03:00")
+        )
+
     def test_retracements(self):
         start_time = time.time()
         swing_highs_lows_data = smc.swing_highs_lows(df, swing_length=5)
@@ -143,6 +319,764 @@ class TestSmartMoneyConcepts(unittest.TestCase):
         print("retracements test time: ", time.time() - start_time)
         pd.testing.assert_frame_equal(retracements, retracements_result_data, check_dtype=False)
 
+    @unittest.skipIf(_numba_kernels is None, "numba is not installed")
+    def test_retracements_vectorized(self):
+        # the vectorized NumPy kernel matches the candle by candle scan of the numba kernel,
+        # including flat swings (zero range), NaN prices and single candles
+        from smartmoneyconcepts.smc import _retracements_kernel
+
+        rng = np.random.default_rng(0)
+        for case in range(500):
+            n = int(rng.integers(0, 80))
+            high = np.round(rng.normal(100, 2, n), 1)
+            low = high - np.round(rng.random(n), 1)
+            swing_hl = rng.choice([np.nan, 1.0, -1.0], n, p=[0.7, 0.15, 0.15])
+            level = np.where(swing_hl == 1, high, np.where(swing_hl == -1, low, np.nan))
+            if case % 5 == 0:
+                level = np.where(np.isnan(swing_hl), np.nan, 100.0)
+            if case % 7 == 0 and n:
+                low[rng.integers(0, n)] = np.nan
+            for expected, result in zip(
+                _numba_kernels._retracements_kernel(high, low, swing_hl, level),
+                _retracements_kernel(high, low, swing_hl, level),
+            ):
+                np.testing.assert_array_equal(result, expected)
+                self.assertEqual(result.dtype, expected.dtype)
+
+    @unittest.skipIf(_numba_kernels is None, "numba is not installed")
+    def test_ob_interval_index(self):
+        # the NumPy and numba kernels find the same blocks, mitigations and breaks as the candle
+        # by candle scan did, also on candles that are both a bullish and a bearish block and
+        # on candles with missing prices
+        from smartmoneyconcepts.smc import _ob_kernel
+
+        rng = np.random.default_rng(0)
+        for case in range(500):
+            n = int(rng.integers(1, 120))
+            close = np.round(100 + np.cumsum(rng.normal(0, 1, n)), 0 if case % 3 == 0 else 2)
+            _open = close + np.round(rng.normal(0, 0.5, n), 2)
+            high = np.maximum(_open, close) + np.round(rng.random(n), 1)
+            low = np.minimum(_open, close) - np.round(rng.random(n), 1)
+            volume = rng.random(n) * 100
+            if case % 2:
+                for values in (_open, high, low, close):
+                    values[rng.random(n) < 0.05] = np.nan
+            swing_hl = rng.choice([np.nan, 1.0, -1.0], n, p=[0.6, 0.2, 0.2])
+            for close_mitigation in (False, True):
+                args = (_open, high, low, close, volume, swing_hl, close_mitigation)
+                expected = _baseline_ob(*args)
+                for kernel in (_numba_kernels._ob_kernel, _ob_kernel):
+                    for want, result in zip(expected, kernel(*args, np.float32)):
+                        np.testing.assert_array_equal(result, want)
+                        self.assertEqual(result.dtype, want.dtype)
+
+    def test_context(self):
+        # every indicator gives the same result on a shared context as on the DataFrame
+        start_time = time.time()
+        context = SMCContext(df.rename(columns=str.upper))
+        swing_highs_lows_data = smc.swing_highs_lows(df, swing_length=5)
+        pd.testing.assert_frame_equal(smc.swing_highs_lows(context, swing_length=5), swing_highs_lows_data)
+        for name, args in [
+            ("fvg", ()),
+            ("bos_choch", (swing_highs_lows_data,)),
+            ("ob", (swing_highs_lows_data,)),
+            ("liquidity", (swing_highs_lows_data,)),
+            ("retracements", (swing_highs_lows_data,)),
+        ]:
+            method = getattr(smc, name)
+            pd.testing.assert_frame_equal(method(context, *args), method(df, *args))
+        pd.testing.assert_frame_equal(smc.fvg(context, join_consecutive=True), smc.fvg(df, join_consecutive=True))
+        for time_frame in ["4h", "1D", "W"]:
+            pd.testing.assert_frame_equal(
+                smc.previous_high_low(context, time_frame=time_frame), smc.previous_high_low(df, time_frame=time_frame)
+            )
+        pd.testing.assert_frame_equal(smc.previous_high_low_multi(context), smc.previous_high_low_multi(df))
+        pd.testing.assert_frame_equal(smc.sessions(context, session="London"), smc.sessions(df, session="London"))
+        pd.testing.assert_frame_equal(smc.sessions_multi(context), smc.sessions_multi(df))
+        print("context test time: ", time.time() - start_time)
+        with self.assertRaises(LookupError):
+            smc.ob(SMCContext(df[["Open", "High", "Low", "Close"]]), swing_highs_lows_data)
+
+    def test_sparse_events(self):
+        # sparse output holds exactly the rows of the dense output that have a value
+        swing_highs_lows_data = smc.swing_highs_lows(df, swing_length=5)
+        for name, args in (
+            ("fvg", ()),
+            ("bos_choch", (swing_highs_lows_data,)),
+            ("ob", (swing_highs_lows_data,)),
+            ("liquidity", (swing_highs_lows_data,)),
+        ):
+            dense = getattr(smc, name)(df, *args)
+            events = getattr(smc, name)(df, *args, sparse=True)
+            rows = np.flatnonzero(dense.notna().any(axis=1).values)
+            np.testing.assert_array_equal(events["index"], rows)
+            self.assertEqual(events.dtype.names[1:], tuple(dense.columns))
+            pd.testing.assert_frame_equal(
+                pd.DataFrame(events).drop(columns="index"),
+                dense.iloc[rows].reset_index(drop=True),
+            )
+
+    def test_dtype_policy(self):
+        # float32 gives the values of the mixed dtypes in float32 and float64 keeps the prices
+        # exact; both give every float column one dtype and nullable Int32 index columns
+        swing_highs_lows_data = smc.swing_highs_lows(df, swing_length=5)
+        calls = [
+            ("fvg", ()),
+            ("bos_choch", (swing_highs_lows_data,)),
+            ("ob", (swing_highs_lows_data,)),
+            ("liquidity", (swing_highs_lows_data,)),
+            ("previous_high_low", ()),
+            ("sessions", ("London",)),
+            ("retracements", (swing_highs_lows_data,)),
+        ]
+        self.assertEqual(get_dtype_policy(), "mixed")
+        mixed = {name: getattr(smc, name)(df, *args) for name, args in calls}
+        candles = df.rename(columns=str.lower)
+        prices = np.concatenate([candles["high"].values, candles["low"].values])
+        for policy, float_dtype in (("float32", np.float32), ("float64", np.float64)):
+            with dtype_policy(policy):
+                self.assertEqual(get_dtype_policy(), policy)
+                for name, args in calls:
+                    result = getattr(smc, name)(df, *args)
+                    self.assertEqual(list(result.columns), list(mixed[name].columns))
+                    for column in result.columns:
+                        expected = mixed[name][column]
+                        if column in INDEX_COLUMNS:
+                            self.assertEqual(result[column].dtype, "Int32")
+                        elif expected.dtype.kind == "f":
+                            self.assertEqual(result[column].dtype, float_dtype)
+                        else:
+                            self.assertEqual(result[column].dtype, expected.dtype)
+                        if policy == "float32":
+                            np.testing.assert_array_equal(
+                                result[column].to_numpy(np.float64, na_value=np.nan),
+                                expected.to_numpy(np.float64).astype(np.float32),
+                            )
+                ob = smc.ob(df, swing_highs_lows_data)
+                events = smc.ob(df, swing_highs_lows_data, sparse=True)
+            self.assertEqual(events["MitigatedIndex"].dtype, np.int32)
+            np.testing.assert_array_equal(events["MitigatedIndex"], ob["MitigatedIndex"].dropna())
+            blocks = ob["OB"].notna().values
+            # float32 rounds the order block prices, float64 keeps the candles' prices
+            exact = np.isin(ob["Top"].values[blocks], prices).all()
+            self.assertEqual(exact, policy == "float64")
+        self.assertEqual(get_dtype_policy(), "mixed")
+        with self.assertRaises(ValueError):
+            set_dtype_policy("float16")
+
+        # the viewer frames keep the mixed dtypes
+        window_df = df.iloc[:130].rename(columns=str.lower)
+        expected = list(FrameEngine(window_df, 100, timeframe="15").frames())
+        with dtype_policy("float64"):
+            frames = list(FrameEngine(window_df, 100, timeframe="15").frames())
+        self.assertEqual(json.dumps(frames), json.dumps(expected))
+
+    def test_memo(self):
+        # the swings of the same candles are reused across calls, even from another DataFrame,
+        # and computed again when the candles or the settings change
+        memo_clear()
+        expected = smc.swing_highs_lows(df, swing_length=5)
+        info = memo_info()
+        self.assertEqual(info.hits, 0)
+        self.assertGreater(info.misses, 0)
+        self.assertGreater(info.nbytes, 0)
+        expected.loc[:, "HighLow"] = 0  # changing a result does not change the memo
+        result = smc.swing_highs_lows(df.copy(), swing_length=5)
+        self.assertEqual(memo_info().hits, 1)
+        self.assertEqual(memo_info().misses, info.misses)
+        memo_clear()
+        pd.testing.assert_frame_equal(result, smc.swing_highs_lows(df, swing_length=5))
+
+        misses = memo_info().misses
+        smc.swing_highs_lows(df, swing_length=10)
+        changed = df.copy()
+        changed.iloc[500, changed.columns.get_loc("High")] += 0.01
+        pd.testing.assert_frame_equal(
+            smc.swing_highs_lows(changed, swing_length=5),
+            smc.swing_highs_lows(SMCContext(changed), swing_length=5),
+        )
+        self.assertEqual(memo_info().misses, misses + 4)
+
+        # least recently used arrays are evicted beyond the size bound, 0 turns the memo off
+        max_bytes = memo_info().max_bytes
+        try:
+            set_memo_size(memo_info().nbytes // 2)
+            info = memo_info()
+            self.assertLessEqual(info.nbytes, info.max_bytes)
+            self.assertLess(info.entries, 4)
+            set_memo_size(0)
+            self.assertEqual(memo_info().entries, 0)
+            smc.swing_highs_lows(df, swing_length=5)
+            smc.swing_highs_lows(df, swing_length=5)
+            self.assertEqual(memo_info().entries, 0)
+            self.assertEqual(memo_info().hits, info.hits)
+        finally:
+            set_memo_size(max_bytes)
+        memo_clear()
+        self.assertEqual(memo_info()[:4], (0, 0, 0, 0))
+
+    def test_batch(self):
+        # every frame of the batch must get the same results as calling the indicators on it
+        frames = {
+            ("EURUSD", "a"): df.iloc[:2000],
+            ("EURUSD", "b"): df.iloc[2000:3500],
+            "utc": df.iloc[3500:].tz_localize("UTC"),
+        }
+        indicators = {
+            "fvg": ("fvg", {"join_consecutive": True}),
+            "swings": ("swing_highs_lows", {"swing_length": 5}),
+            "bos_choch": ("bos_choch", {"swing_length": 5}),
+            "ob": ("ob", {"swing_length": 5}),
+            "previous_high_low": ("previous_high_low", {"time_frame": "4h"}),
+            "sessions": ("sessions", {"session": "London"}),
+        }
+        results = smc.batch(frames, indicators, workers=2)
+        self.assertEqual(list(results), list(frames))
+        for key, ohlc in frames.items():
+            swings = smc.swing_highs_lows(ohlc, swing_length=5)
+            expected = {
+                "fvg": smc.fvg(ohlc, join_consecutive=True),
+                "swings": swings,
+                "bos_choch": smc.bos_choch(ohlc, swings),
+                "ob": smc.ob(ohlc, swings),
+                "previous_high_low": smc.previous_high_low(ohlc, time_frame="4h"),
+                "sessions": smc.sessions(ohlc, session="London"),
+            }
+            self.assertEqual(list(results[key].indicators), list(expected))
+            for name, data in expected.items():
+                pd.testing.assert_frame_equal(results[key].indicators[name], data)
+            self.assertGreater(results[key].seconds, 0)
+        self.assertNotEqual(results["utc"].pid, os.getpid())
+        self.assertEqual(smc.batch(frames, ["fvg"], workers=1)["utc"].pid, os.getpid())
+        with self.assertRaises(ValueError):
+            smc.batch(frames, ["fvg", "mystery"])
+
+    def test_profiling(self):
+        # every smc call made while a profiler is active is recorded, and only then
+        smc.fvg(df)
+        self.assertIsNone(get_profiler())
+        with profile() as outer:
+            with profile(allocations=True) as inner:
+                self.assertIs(get_profiler(), inner)
+                events = smc.fvg(df, sparse=True)
+                swing_highs_lows_data = smc.swing_highs_lows(df, swing_length=5)
+            smc.fvg(df)
+        self.assertIsNone(get_profiler())
+        smc.ob(df, swing_highs_lows_data)
+
+        stats = inner.stats()
+        self.assertEqual(set(stats), {"fvg", "swing_highs_lows"})
+        self.assertEqual(stats["fvg"]["calls"], 1)
+        self.assertEqual(stats["fvg"]["bars"], len(df))
+        self.assertEqual(stats["fvg"]["events"], len(events))
+        self.assertGreater(stats["fvg"]["max_allocated_mib"], 0)
+        self.assertLessEqual(stats["fvg"]["p50_seconds"], stats["fvg"]["p99_seconds"])
+        self.assertEqual(
+            stats["swing_highs_lows"]["events"],
+            swing_highs_lows_data["HighLow"].notna().sum(),
+        )
+        # the calls of the inner profiler are also counted by the outer one
+        stats = outer.stats()
+        self.assertEqual(stats["fvg"]["calls"], 2)
+        self.assertEqual(stats["fvg"]["events"], 2 * len(events))
+        self.assertNotIn("ob", stats)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "profile.json")
+            outer.dump(path)
+            with open(path) as f:
+                self.assertEqual(json.load(f)["fvg"]["bars"], 2 * len(df))
+        self.assertIn("swing_highs_lows", outer.summary())
+
+    def test_first_crossing(self):
+        # the sparse table query must find the same candle as scanning forward
+        values = df["Close"].values[:500].copy()
+        values[::7] = np.nan
+        starts = np.arange(0, 520, 3)
+        levels = values[np.minimum(starts, 499)] + np.linspace(-0.002, 0.002, len(starts))
+        for side, compare in [(">", np.greater), (">=", np.greater_equal), ("<", np.less), ("<=", np.less_equal)]:
+            expected = [
+                next((j for j in range(start, len(values)) if compare(values[j], level)), len(values))
+                for start, level in zip(starts, levels)
+            ]
+            result = _first_crossing(_crossing_table(values, side), starts, levels, side)
+            self.assertEqual(result.tolist(), expected)
+
+    def test_frame_engine(self):
+        # the incremental frame engine must match recomputing every window exactly
+        sys.path.append(os.path.abspath(os.path.join(BASE_DIR, "..", "scripts")))
+        from export_smc_frames import build_frames_full
+
+        start_time = time.time()
+        window_df = df.iloc[:160].rename(columns=str.lower)
+        frames = list(FrameEngine(window_df, 100, timeframe="15").frames())
+        print("frame engine test time: ", time.time() - start_time)
+        expected = build_frames_full(window_df, 100, "15")
+        self.assertEqual(len(frames), 60)
+        self.assertEqual(
+            json.dumps(frames, separators=(",", ":")),
+            json.dumps(expected, separators=(",", ":")),
+        )
+
+        # also with missing prices, which resample and sessions skip in their own way
+        window_df = df.iloc[3000:3300].rename(columns=str.lower)
+        rng = np.random.default_rng(0)
+        for column in ("open", "high", "low", "close"):
+            window_df.loc[window_df.index[rng.random(len(window_df)) < 0.03], column] = np.nan
+        frames = list(FrameEngine(window_df, 100, timeframe="15").frames())
+        expected = build_frames_full(window_df, 100, "15")
+        self.assertEqual(
+            json.dumps(frames, separators=(",", ":")),
+            json.dumps(expected, separators=(",", ":")),
+        )
+
+    def test_frame_format(self):
+        # the compact container must decode to the same frames as the JSON export
+        window_df = df.iloc[:400].rename(columns=str.lower)
+        ewo = [None] * 35 + [float(i) for i in range(365)]
+        meta = {"symbol": test_instrument, "timeframe": "15", "windowSize": 100, "barCount": 300}
+        engine = FrameEngine(window_df, 100, timeframe="15", extras={"ewo": ewo})
+        data = encode_frames(engine, meta)
+        decoded_meta, frames = decode_frames(data)
+        self.assertEqual(decoded_meta, meta)
+        expected = list(FrameEngine(window_df, 100, timeframe="15", extras={"ewo": ewo}).frames())
+        self.assertEqual(
+            json.dumps(list(frames), separators=(",", ":")),
+            json.dumps(expected, separators=(",", ":")),
+        )
+        self.assertLess(len(data) * 10, len(json.dumps(expected)))
+        with self.assertRaises(ValueError):
+            decode_frames(b"JSON" + data[4:])
+
+    def test_frame_json(self):
+        # the streamed JSON must be byte for byte the json.dumps of the frame dicts
+        window_df = df.iloc[:400].rename(columns=str.lower)
+        ewo = [None] * 35 + [float(i) for i in range(365)]
+        meta = {"symbol": test_instrument, "timeframe": "15", "windowSize": 100, "barCount": 300}
+        engine = FrameEngine(window_df, 100, timeframe="15", extras={"ewo": ewo})
+        chunks = list(iter_frames_json(engine, meta))
+        self.assertEqual(len(chunks), 302)
+        expected = list(FrameEngine(window_df, 100, timeframe="15", extras={"ewo": ewo}).frames())
+        self.assertEqual(
+            b"".join(chunks).decode(),
+            json.dumps({"meta": meta, "frames": expected}, separators=(",", ":")),
+        )
+
+        values = np.array([1.5, np.nan, -0.0, np.inf, 1e21])
+        self.assertEqual(json_tokens(values), ["1.5", "null", "-0.0", "Infinity", "1e+21"])
+        self.assertEqual(json_tokens(np.array([3, -1])), ["3", "-1"])
+        self.assertEqual(json_tokens(["a\"b", None, True, 2]), ['"a\\"b"', "null", "true", "2"])
+        swing_highs_lows = smc.swing_highs_lows(window_df, swing_length=5)
+        self.assertEqual(
+            json_lists(swing_highs_lows),
+            nan_to_none(swing_highs_lows.to_dict(orient="list")),
+        )
+
+    def test_stream(self):
+        # feeding the candles one at a time must give the same indicators as the batch functions
+        start_time = time.time()
+        stream_df = df.iloc[:3000].rename(columns=str.lower)
+        liquidity_range = (stream_df["high"].max() - stream_df["low"].min()) * 0.01
+        stream = SMCStream(swing_length=5, join_consecutive=True, liquidity_range=liquidity_range, time_frame="4h")
+        events = stream.extend(stream_df.iloc[:1700])
+        self.assertTrue({"fvg", "fvg_mitigated", "swing", "ob", "liquidity"} <= {e.kind for e in events})
+        for end in (1700, 3000):
+            stream.extend(stream_df.iloc[len(stream) : end])
+            snapshot = stream.snapshot()
+            ohlc = stream_df.iloc[:end]
+            swing_highs_lows = smc.swing_highs_lows(ohlc, swing_length=5)
+            expected = {
+                "fvg": smc.fvg(ohlc, join_consecutive=True),
+                "swing_highs_lows": swing_highs_lows,
+                "bos_choch": smc.bos_choch(ohlc, swing_highs_lows),
+                "ob": smc.ob(ohlc, swing_highs_lows),
+                "previous_high_low": smc.previous_high_low(ohlc, time_frame="4h"),
+                "sessions": smc.sessions_multi(ohlc),
+            }
+            if end == len(stream_df):
+                expected["liquidity"] = smc.liquidity(ohlc, swing_highs_lows, range_percent=0.01)
+            for name, result in expected.items():
+                pd.testing.assert_frame_equal(snapshot[name], result.reset_index(drop=True))
+        print("stream test time: ", time.time() - start_time)
+
+        # candles with missing prices: buckets without one of them are no period, as with resample().dropna()
+        stream_df = df.iloc[2000:2600].rename(columns=str.lower)
+        rng = np.random.default_rng(0)
+        for column in ("open", "high", "low", "close"):
+            stream_df.loc[stream_df.index[rng.random(len(stream_df)) < 0.05], column] = np.nan
+        for time_frame in ("4h", "1h"):
+            stream = SMCStream(swing_length=5, join_consecutive=True, time_frame=time_frame)
+            stream.extend(stream_df)
+            snapshot = stream.snapshot()
+            swing_highs_lows = smc.swing_highs_lows(stream_df, swing_length=5)
+            expected = {
+                "fvg": smc.fvg(stream_df, join_consecutive=True),
+                "swing_highs_lows": swing_highs_lows,
+                "bos_choch": smc.bos_choch(stream_df, swing_highs_lows),
+                "ob": smc.ob(stream_df, swing_highs_lows),
+                "previous_high_low": smc.previous_high_low(stream_df, time_frame=time_frame),
+                "sessions": smc.sessions_multi(stream_df),
+            }
+            for name, result in expected.items():
+                pd.testing.assert_frame_equal(snapshot[name], result.reset_index(drop=True))
+
+
+class StubPostgREST(BaseHTTPRequestHandler):
+    # serves market_candles_ewo rows with PostgREST filters, limit/offset and count=exact,
+    # capping pages at max_rows like Supabase does
+    protocol_version = "HTTP/1.1"
+    rows = []
+    max_rows = 300
+    requests = []
+    connections = set()
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qsl(url.query)
+        StubPostgREST.requests.append(query)
+        StubPostgREST.connections.add(self.client_address)
+        rows = StubPostgREST.rows
+        limit, offset = StubPostgREST.max_rows, 0
+        for key, value in query:
+            op, _, operand = value.partition(".")
+            if key == "limit":
+                limit = min(limit, int(value))
+            elif key == "offset":
+                offset = int(value)
+            elif key in ("symbol", "timeframe") and op == "eq":
+                rows = [r for r in rows if r[key] == operand]
+            elif key == "timestamp" and op in ("gte", "lte"):
+                # compare the date and time, ignoring the offset like a timestamptz against UTC
+                rows = [r for r in rows if (r[key][:19] >= operand[:19]) == (op == "gte") or r[key][:19] == operand[:19]]
+        page = rows[offset : offset + limit]
+        body = json.dumps(page).encode()
+        total = len(rows) if "count=exact" in self.headers.get("Prefer", "") else "*"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Content-Range", f"{offset}-{offset + len(page) - 1}/{total}")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestLoadSupabase(unittest.TestCase):
+    # the Supabase loader against a local stub of the REST API
+
+    @classmethod
+    def setUpClass(cls):
+        times = pd.date_range("2020-01-01", periods=2500, freq="D", tz="UTC")
+        cls.rows = [
+            {
+                "symbol": "TEST",
+                "timeframe": "1D",
+                "timestamp": t.isoformat(),
+                "open": 100.0 + i,
+                "high": 101.0 + i,
+                "low": 99.0 + i,
+                "close": 100.5 + i,
+                "volume": i,
+                "ewo": None if i < 35 else i / 10,
+                "sma_5": None if i < 5 else float(i),
+                "sma_35": None if i < 35 else float(i),
+            }
+            for i, t in enumerate(times)
+        ]
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubPostgREST)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.env = mock.patch.dict(
+            os.environ,
+            {
+                "NEXT_PUBLIC_SUPABASE_MARKET_URL": f"http://127.0.0.1:{cls.server.server_port}",
+                "NEXT_PUBLIC_SUPABASE_MARKET_ANON_KEY": "test",
+            },
+        )
+        cls.env.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.env.stop()
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        StubPostgREST.rows = [dict(r) for r in self.rows]
+        StubPostgREST.requests = []
+        StubPostgREST.connections = set()
+
+    def test_load_candles_ewo(self):
+        # the whole history is returned, paged past the server's row cap over reused connections
+        df, ewo, sma5, sma35, timestamps = load_supabase.load_candles_ewo("TEST", "1D")
+        self.assertEqual(len(df), 2500)
+        self.assertEqual(timestamps, [r["timestamp"] for r in StubPostgREST.rows])
+        self.assertEqual(list(df.columns), ["open", "high", "low", "close", "volume"])
+        np.testing.assert_array_equal(df["close"].values, np.arange(2500) + 100.5)
+        self.assertTrue(df.index.is_monotonic_increasing)
+        self.assertEqual(ewo, [r["ewo"] for r in StubPostgREST.rows])
+        self.assertEqual(sma5, [r["sma_5"] for r in StubPostgREST.rows])
+        self.assertEqual(len(StubPostgREST.requests), 9)
+        self.assertLessEqual(len(StubPostgREST.connections), load_supabase.FETCH_WORKERS + 1)
+
+    def test_load_candles_ewo_dates(self):
+        df, _, _, _, timestamps = load_supabase.load_candles_ewo(
+            "TEST", "1D", from_date="2021-01-01", to_date="2021-12-31"
+        )
+        self.assertEqual(len(df), 365)
+        self.assertEqual(str(df.index[0].date()), "2021-01-01")
+        self.assertEqual(len(timestamps), 365)
+
+    def test_light_imports(self):
+        # the loader is imported by every exporter process before any indicator runs, so it must
+        # not pull in the indicator stack; its time against the budget is checked by
+        # python -m benchmarks.imports
+        from benchmarks.imports import LIGHT, cold_import
+
+        for module in LIGHT:
+            self.assertEqual(cold_import(module, repeat=1)["heavy"], [])
+
+    def test_load_candles_ewo_empty(self):
+        df, ewo, _, _, timestamps = load_supabase.load_candles_ewo("NONE", "1D")
+        self.assertEqual(len(df), 0)
+        self.assertIsNone(ewo)
+        self.assertIsNone(timestamps)
+
+    def test_export_daemon(self):
+        sys.path.append(os.path.abspath(os.path.join(BASE_DIR, "..", "scripts")))
+        from export_smc_frames import export_data, load_timeframe
+        from smc_daemon import ExportService, serve
+
+        gate = threading.Event()
+        loads, loading, overlapped = [], [], []
+
+        def load(*args):
+            gate.wait()
+            loads.append(args[:2])
+            loading.append(args[:2])
+            overlapped.append(loading.count(args[:2]) > 1)
+            try:
+                time.sleep(0.05)
+                return load_timeframe(*args)
+            finally:
+                loading.remove(args[:2])
+
+        with tempfile.TemporaryDirectory() as path:
+            service = ExportService(data_dir=path, workers=0, load=load)
+            server = serve(service, port=0)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            url = f"http://127.0.0.1:{server.server_address[1]}"
+
+            def post(body, wait=True):
+                request = urllib.request.Request(
+                    f"{url}/jobs{'?wait=1' if wait else ''}", data=json.dumps(body).encode(), method="POST"
+                )
+                with urllib.request.urlopen(request) as response:
+                    return response.status, json.loads(response.read())["jobs"]
+
+            try:
+                # a request for a timeframe that is being exported joins that job
+                body = {"symbol": "TEST", "timeframe": "1D", "last": 300, "window": 50, "saveToDb": False}
+                status, (queued,) = post(body, wait=False)
+                self.assertEqual(status, 202)
+                self.assertEqual(post(body, wait=False)[1][0]["id"], queued["id"])
+                gate.set()
+                status, (job,) = post(body)
+                self.assertEqual((status, job["id"], job["status"], job["frames"]), (200, queued["id"], "done", 250))
+                self.assertEqual(loads, [("TEST", "1D")])
+
+                df, ewo, sma5, sma35, timestamps = load_timeframe("TEST", "1D", None, None, 300)
+                out = os.path.join(path, "expected.json")
+                export_data(df, "TEST", "1D", 50, "incremental", out, timestamp_str_list=timestamps,
+                            ewo_list=ewo, sma5_list=sma5, sma35_list=sma35)
+                with open(out, "rb") as f, open(os.path.join(path, "smc_frames.json"), "rb") as g:
+                    self.assertEqual(f.read(), g.read())
+
+                # unchanged candles are not exported again
+                (job,) = post(body)[1]
+                self.assertEqual((job["status"], job["frames"]), ("done", 250))
+                self.assertIn("unchanged", job["result"])
+                with urllib.request.urlopen(f"{url}/jobs/{job['id']}") as response:
+                    self.assertEqual(json.loads(response.read())["status"], "done")
+
+                # a bar corrected before the last one is exported again
+                StubPostgREST.rows[-100]["close"] += 0.25
+                (job,) = post(body)[1]
+                self.assertEqual((job["status"], job["frames"]), ("done", 250))
+                self.assertIn("exported", job["result"])
+
+                # jobs of one timeframe that differ only in last load it one at a time
+                with tempfile.TemporaryDirectory() as cache_path:
+                    service.cache = CandleCache(cache_path)
+                    gate.clear()
+                    first, second = post(body, wait=False)[1][0], post({**body, "last": 400}, wait=False)[1][0]
+                    self.assertNotEqual(first["id"], second["id"])
+                    gate.set()
+                    for job, frames in ((first, 250), (second, 350)):
+                        service.job(job["id"]).done.wait()
+                        self.assertEqual((service.job(job["id"]).status, service.job(job["id"]).frames), ("done", frames))
+                    self.assertNotIn(True, overlapped)
+                    service.cache = None
+
+                (job,) = post({**body, "symbol": "NONE"})[1]
+                self.assertEqual(job["status"], "failed")
+            finally:
+                server.shutdown()
+                server.server_close()
+                service.close()
+
+    def test_append_to_db(self):
+        sys.path.append(os.path.abspath(os.path.join(BASE_DIR, "..", "scripts")))
+        from export_smc_frames import append_to_db, build_frames
+
+        # an in-memory smc_results row, appended to like the append_smc_frames SQL function does
+        row, sent = {}, []
+
+        def upsert(symbol, timeframe, meta, frames):
+            row.update(meta=meta, frames=json.loads(json.dumps(frames)))
+            sent.append(len(frames))
+
+        def tail(symbol, timeframe):
+            return (row["meta"], row["frames"][row["meta"]["barCount"] - 1]) if row else None
+
+        def append(symbol, timeframe, meta, frames, after):
+            self.assertEqual(row["frames"][-1]["timestamp"], after)
+            merged = (row["frames"] + json.loads(json.dumps(frames)))[-meta["barCount"]:]
+            for i, frame in enumerate(merged):
+                frame["index"] = i
+            row.update(meta=meta, frames=merged)
+            sent.append(len(frames))
+            return {"count": len(merged), "last": merged[-1]["timestamp"]}
+
+        patches = [
+            mock.patch.object(load_supabase, "upsert_smc_results", upsert),
+            mock.patch.object(load_supabase, "fetch_smc_results_tail", tail),
+            mock.patch.object(load_supabase, "append_smc_results", append),
+        ]
+        for patch in patches:
+            patch.start()
+        self.addCleanup(lambda: [patch.stop() for patch in patches])
+
+        def expected(bars):
+            return json.loads(json.dumps(list(build_frames(bars, 50, "23"))))
+
+        # no stored row: every frame is sent
+        self.assertEqual(append_to_db(df.iloc[:300], "TEST", "23", 50), 250)
+        # three new bars: only their frames are computed and sent, the oldest ones dropped
+        self.assertEqual(append_to_db(df.iloc[3:303], "TEST", "23", 50), 3)
+        self.assertEqual(row["frames"], expected(df.iloc[3:303]))
+        self.assertEqual(append_to_db(df.iloc[3:303], "TEST", "23", 50), 0)
+        # more history than stored, or a stored frame that does not match: everything again
+        self.assertEqual(append_to_db(df.iloc[:303], "TEST", "23", 50), 253)
+        row["frames"][-1]["fvg"]["FVG"][0] = 9.0
+        self.assertEqual(append_to_db(df.iloc[:304], "TEST", "23", 50), 254)
+        self.assertEqual(row["frames"], expected(df.iloc[:304]))
+        # no append function in the database
+        missing = urllib.error.HTTPError("rpc/append_smc_frames", 404, "Not Found", {}, None)
+        with mock.patch.object(load_supabase, "append_smc_results", side_effect=missing):
+            self.assertEqual(append_to_db(df.iloc[:305], "TEST", "23", 50), 255)
+        self.assertEqual(sent, [250, 3, 253, 254, 255])
+
+    def test_candle_cache(self):
+        with tempfile.TemporaryDirectory() as path:
+            cache = CandleCache(path)
+            expected = load_supabase.load_candles_ewo("TEST", "1D")
+            cached = load_supabase.load_candles_ewo("TEST", "1D", cache=cache)
+            pd.testing.assert_frame_equal(cached[0], expected[0])
+            self.assertEqual(cached[1:], expected[1:])
+
+            # a warm cache only asks for the bars from its last one on
+            StubPostgREST.requests = []
+            StubPostgREST.rows[-1]["close"] = 1.0
+            StubPostgREST.rows.append(dict(StubPostgREST.rows[-1], timestamp="2026-11-05T00:00:00+00:00", close=2.0))
+            df, ewo, _, _, timestamps = load_supabase.load_candles_ewo("TEST", "1D", cache=cache)
+            self.assertEqual(len(StubPostgREST.requests), 1)
+            self.assertEqual(len(df), 2501)
+            self.assertEqual(list(df["close"].iloc[-2:]), [1.0, 2.0])
+            self.assertEqual(timestamps[-1], "2026-11-05T00:00:00+00:00")
+            self.assertEqual(len(ewo), 2501)
+
+            # dates are applied to the cached rows
+            cached = load_supabase.load_candles_ewo("TEST", "1D", from_date="2021-01-01", to_date="2021-12-31", cache=cache)
+            expected = load_supabase.load_candles_ewo("TEST", "1D", from_date="2021-01-01", to_date="2021-12-31")
+            pd.testing.assert_frame_equal(cached[0], expected[0])
+            self.assertEqual(cached[1:], expected[1:])
+
+            StubPostgREST.requests = []
+            load_supabase.load_candles_ewo("TEST", "1D", cache=CandleCache(path, refresh_after=3600))
+            self.assertEqual(StubPostgREST.requests, [])
+
+            self.assertEqual(cache.invalidate(symbol="TEST"), 1)
+            self.assertEqual(cache.invalidate(symbol="TEST"), 0)
+            load_supabase.load_candles_ewo("TEST", "1D", cache=cache)
+            self.assertEqual(len(StubPostgREST.requests), 9)
+
+            entry = os.path.join(path, "market_candles_ewo", "TEST", "1D")
+            os.utime(os.path.join(entry, "meta.json"), (0, 0))
+            self.assertEqual(CandleCache(path, max_age=3600).evict(), 1)
+            self.assertFalse(os.path.exists(entry))
+
+    def test_candle_cache_concurrent_loads(self):
+        def fetch(since):
+            # every refresh brings the last bar again and 50 new ones
+            start = 0 if since is None else since
+            key = np.arange(start, start + (1000 if since is None else 51), dtype=np.int64)
+            time.sleep(0.001)
+            return {"time": key, "close": key * 0.5}
+
+        with tempfile.TemporaryDirectory() as path:
+            shared = CandleCache(path)
+            errors, loaded = [], []
+
+            def worker(i):
+                # half the threads share one cache, the others open their own as another process would
+                cache = shared if i % 2 else CandleCache(path)
+                try:
+                    for _ in range(10):
+                        columns = cache.load("candles", "TEST", "1D", fetch, "time")
+                        np.testing.assert_array_equal(columns["time"], np.arange(len(columns["time"])))
+                        np.testing.assert_array_equal(columns["close"], columns["time"] * 0.5)
+                        loaded.append(len(columns["time"]))
+                except Exception as error:
+                    errors.append(error)
+
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(errors, [])
+            # one full load, then 50 new bars for each of the other 79 loads
+            self.assertEqual(max(loaded), 1000 + 79 * 50)
+            entry = os.path.join(path, "candles", "TEST", "1D")
+            self.assertEqual(sorted(os.listdir(entry)), ["close.npy", "meta.json", "time.npy"])
+
+
+class TestNumPyBackend(TestSmartMoneyConcepts):
+    # run every test above again with the pure NumPy kernels
+
+    @classmethod
+    def setUpClass(cls):
+        cls.previous_backend = get_backend()
+        set_backend("numpy")
+
+    @classmethod
+    def tearDownClass(cls):
+        set_backend(cls.previous_backend)
+
+
+@unittest.skipIf(_numba_kernels is None, "numba is not installed")
+class TestNumbaBackend(TestSmartMoneyConcepts):
+    # run every test above again with the numba kernels
+
+    @classmethod
+    def setUpClass(cls):
+        cls.previous_backend = get_backend()
+        set_backend("numba")
+
+    @classmethod
+    def tearDownClass(cls):
+        set_backend(cls.previous_backend)
+
 
 if __name__ == "__main__":
     unittest.main()